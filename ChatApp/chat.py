@@ -2,7 +2,7 @@
 チャットアプリのオブジェクト指向プログラミング実装例
 """
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 import random
 
 
@@ -72,41 +72,157 @@ class Message:
         return self._timestamp.strftime("%H:%M:%S")
 
 
+class SearchIndex:
+    """メッセージ検索用の転置インデックス（文字 n-gram）
+    
+    小文字にした本文の1文字と連続する2文字（bigram）ごとに、それを含むメッセージの番号の集合
+    （ポスティングリスト）を持つ。検索ではキーワードの bigram のポスティングリストの
+    共通部分を候補にし、3文字以上のキーワードは本文に本当に含まれるかを確かめる。
+    候補は小さい集合から絞り込むので、メッセージが増えても検索の時間はほとんど変わらない。
+    """
+    
+    def __init__(self):
+        self._next_key = 0
+        # メッセージIDと番号、番号とメッセージ（番号は追加した順）
+        self._keys: Dict[str, int] = {}
+        self._messages: Dict[int, Message] = {}
+        self._postings: Dict[str, Set[int]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._messages)
+    
+    def add(self, message: Message) -> None:
+        """メッセージを索引に追加"""
+        key = self._next_key
+        self._next_key += 1
+        self._keys[message.get_id()] = key
+        self._messages[key] = message
+        postings = self._postings
+        for gram in self._grams(message.get_content().lower()):
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = {key}
+            else:
+                posting.add(key)
+    
+    def remove(self, message_id: str) -> bool:
+        """メッセージを索引から削除"""
+        key = self._keys.pop(message_id, None)
+        if key is None:
+            return False
+        message = self._messages.pop(key)
+        postings = self._postings
+        for gram in self._grams(message.get_content().lower()):
+            posting = postings[gram]
+            posting.discard(key)
+            if not posting:
+                del postings[gram]
+        return True
+    
+    def search(self, keyword: str) -> List[Message]:
+        """キーワードを含むメッセージを追加した順に取得（大文字・小文字は区別しない）"""
+        keyword = keyword.lower()
+        if not keyword:
+            return list(self._messages.values())
+        if len(keyword) <= 2:
+            grams = {keyword}
+        else:
+            grams = {a + b for a, b in zip(keyword, keyword[1:])}
+        
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        messages = [self._messages[key] for key in sorted(candidates)]
+        if len(keyword) <= 2:
+            # 1文字・2文字のキーワードはポスティングリストだけで決まる
+            return messages
+        return [msg for msg in messages if keyword in msg.get_content().lower()]
+    
+    def clear(self) -> None:
+        """索引を空にする"""
+        self._keys.clear()
+        self._messages.clear()
+        self._postings.clear()
+    
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        """文字列に含まれる1文字と連続する2文字の集合"""
+        grams = set(text)
+        grams.update(a + b for a, b in zip(text, text[1:]))
+        return grams
+
+
 class MessageHistory:
-    """メッセージ履歴クラス"""
+    """メッセージ履歴クラス
+    
+    メッセージは追加した順にリストの枠（スロット）に入れ、メッセージIDから枠の番号を引ける
+    辞書を持つ。削除は枠を None（削除済みの印）にするだけで、削除済みの枠が
+    COMPACT_MIN 以上かつ全体の半分を超えたら、まとめて詰める。
+    """
+    
+    COMPACT_MIN = 1024
     
     def __init__(self):
-        self._messages: List[Message] = []
+        self._messages: List[Optional[Message]] = []
+        self._slots: Dict[str, int] = {}
+        self._deleted = 0
+        self._index = SearchIndex()
     
     def add_message(self, message: Message) -> None:
         """メッセージを追加"""
+        self._slots[message.get_id()] = len(self._messages)
         self._messages.append(message)
+        self._index.add(message)
+    
+    def get_message(self, message_id: str) -> Optional[Message]:
+        """メッセージIDでメッセージを取得（なければ None）"""
+        slot = self._slots.get(message_id)
+        return self._messages[slot] if slot is not None else None
     
     def get_messages(self) -> List[Message]:
         """すべてのメッセージを取得"""
-        return self._messages.copy()
+        if not self._deleted:
+            return self._messages.copy()
+        return [msg for msg in self._messages if msg is not None]
     
     def get_messages_by_user(self, user: User) -> List[Message]:
         """特定ユーザーのメッセージを取得"""
         return [msg for msg in self._messages 
-                if msg.get_sender().get_id() == user.get_id()]
+                if msg is not None and msg.get_sender().get_id() == user.get_id()]
     
     def search_messages(self, keyword: str) -> List[Message]:
-        """キーワードでメッセージを検索"""
-        return [msg for msg in self._messages 
-                if keyword.lower() in msg.get_content().lower()]
+        """キーワードでメッセージを検索（転置インデックスを使う）"""
+        return self._index.search(keyword)
     
     def delete_message(self, message_id: str) -> bool:
-        """メッセージを削除"""
-        for i, msg in enumerate(self._messages):
-            if msg.get_id() == message_id:
-                self._messages.pop(i)
-                return True
-        return False
+        """メッセージを削除（枠に削除済みの印を付け、増えたら詰める）"""
+        slot = self._slots.pop(message_id, None)
+        if slot is None:
+            return False
+        self._messages[slot] = None
+        self._deleted += 1
+        self._index.remove(message_id)
+        if self._deleted >= self.COMPACT_MIN and self._deleted * 2 > len(self._messages):
+            self._compact()
+        return True
     
     def clear(self) -> None:
         """すべてのメッセージを削除"""
         self._messages.clear()
+        self._slots.clear()
+        self._deleted = 0
+        self._index.clear()
+    
+    def _compact(self) -> None:
+        """削除済みの枠を詰めて、枠の番号を振り直す"""
+        self._messages = [msg for msg in self._messages if msg is not None]
+        self._slots = {msg.get_id(): slot for slot, msg in enumerate(self._messages)}
+        self._deleted = 0
 
 
 class ChatRoom:
@@ -139,6 +255,14 @@ class ChatRoom:
         """メッセージ一覧を取得"""
         return self._history.get_messages()
     
+    def get_message(self, message_id: str) -> Optional[Message]:
+        """メッセージIDでメッセージを取得"""
+        return self._history.get_message(message_id)
+    
+    def delete_message(self, message_id: str) -> bool:
+        """メッセージを削除"""
+        return self._history.delete_message(message_id)
+    
     def get_users(self) -> List[User]:
         """ユーザー一覧を取得"""
         return self._users.copy()
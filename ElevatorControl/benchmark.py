@@ -0,0 +1,161 @@
+"""
+エレベーターのスケジューラーの比較（同じ交通量で待ち時間などを計測）
+
+交通パターンごとに乗客の列を1つ作り、各スケジューラーで同じ列をシミュレーションする。
+待ち時間・所要時間（平均・95パーセンタイル・最大）、1時間あたりの輸送人数、
+1秒あたりの判断回数を表示し、回帰の確認用に JSON に書き出せる。
+
+使い方:
+    python benchmark.py --floors 20 --cars 4 --rate 1200 --output results.json
+    python benchmark.py --floors 20 --cars 4 --rate 1200 --compare results.json
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import platform
+import time
+
+from elevator import Elevator, ElevatorController, LookScheduler, ScanScheduler
+from destination import DestinationDispatcher
+from group import DispatchCost, GroupController
+from simulation import Simulation
+from traffic import PATTERNS, TrafficGenerator
+
+
+# 比較するスケジューラー
+SCHEDULERS = {"look": LookScheduler, "scan": ScanScheduler}
+# 群管理の方式（乗り場呼び / 行先階予約）
+DISPATCHES = ["conventional", "destination"]
+
+
+def percentile(sorted_values: List[float], rate: float) -> float:
+    """昇順に並んだ値の百分位数（最も近い順位の値）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(rate * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """平均・95パーセンタイル・最大"""
+    values = sorted(values)
+    if not values:
+        return {"mean": 0.0, "p95": 0.0, "max": 0.0}
+    return {"mean": round(sum(values) / len(values), 3),
+            "p95": round(percentile(values, 0.95), 3),
+            "max": round(values[-1], 3)}
+
+
+def run_one(generator: TrafficGenerator, scheduler: str, cars: int, hours: float,
+            rate: float, seed: int, floor_time: float = 0.5, door_time: float = 1.0,
+            dispatch: str = "conventional", capacity: Optional[int] = None,
+            transfer_time: float = 0.0) -> Dict[str, Any]:
+    """1つのスケジューラーで、交通パターンの乗客の列をシミュレーション
+    
+    dispatch が "destination" なら行先階予約（DestinationDispatcher）で割り当てる。
+    """
+    controllers = []
+    for _ in range(cars):
+        elevator = Elevator(max_floor=generator.get_max_floor(), verbose=False)
+        controllers.append(ElevatorController(elevator, verbose=False,
+                                              scheduler=SCHEDULERS[scheduler]()))
+    if dispatch == "destination":
+        controller = DestinationDispatcher(controllers, capacity, floor_time, door_time)
+    elif cars == 1:
+        controller = controllers[0]
+    else:
+        controller = GroupController(controllers, DispatchCost(floor_time, door_time))
+    simulation = Simulation(controller, floor_time=floor_time, door_time=door_time,
+                            capacity=capacity, transfer_time=transfer_time)
+    passengers = generator.generate(hours, rate, seed)
+    for passenger in passengers:
+        simulation.add_passenger(passenger)
+    
+    start = time.perf_counter()
+    simulation.run()
+    elapsed = time.perf_counter() - start
+    
+    delivered = simulation.get_delivered_passengers()
+    duration = simulation.get_time()
+    decisions = simulation.get_decision_count()
+    return {
+        "passengers": len(passengers),
+        "delivered": len(delivered),
+        "wait": summarize([p.get_wait_time() for p in delivered]),
+        "journey": summarize([p.get_journey_time() for p in delivered]),
+        "throughput_per_hour": round(len(delivered) / duration * 3600, 1) if duration else 0.0,
+        "decisions": decisions,
+        "decisions_per_second": round(decisions / elapsed, 1),
+        "seconds": round(elapsed, 6),
+    }
+
+
+def run_benchmark(floors: int, cars: int, hours: float, rate: float, seed: int = 0,
+                  patterns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """交通パターンとスケジューラーのすべての組み合わせを計測"""
+    results = {}
+    for pattern in patterns or sorted(PATTERNS):
+        generator = TrafficGenerator(floors, pattern)
+        for scheduler in SCHEDULERS:
+            results[f"{pattern}/{scheduler}"] = run_one(generator, scheduler, cars, hours, rate, seed)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "floors": floors,
+        "cars": cars,
+        "hours": hours,
+        "rate": rate,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def print_benchmark(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    """計測結果を表示（比較対象があれば平均待ち時間と判断の速さの比も表示）"""
+    print(f"{report['floors']}階, {report['cars']}台, {report['rate']:,.0f}人/時 × {report['hours']}時間 "
+          f"(Python {report['python']}, {report['implementation']})")
+    print(f"{'':18s} {'待ち 平均':>9} {'p95':>7} {'最大':>7} {'所要 平均':>9} {'p95':>7} "
+          f"{'輸送 人/時':>10} {'判断/秒':>10}")
+    for name, result in report["results"].items():
+        wait, journey = result["wait"], result["journey"]
+        line = (f"{name:18s} {wait['mean']:9.1f} {wait['p95']:7.1f} {wait['max']:7.1f} "
+                f"{journey['mean']:9.1f} {journey['p95']:7.1f} "
+                f"{result['throughput_per_hour']:10,.0f} {result['decisions_per_second']:10,.0f}")
+        if baseline and name in baseline.get("results", {}):
+            old = baseline["results"][name]
+            ratios = [f"判断 {result['decisions_per_second'] / old['decisions_per_second']:.2f} 倍"]
+            if old["wait"]["mean"]:
+                ratios.insert(0, f"待ち {wait['mean'] / old['wait']['mean']:.2f} 倍")
+            line += "  " + ", ".join(ratios)
+        print(line)
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="エレベーターのスケジューラーの比較")
+    parser.add_argument("--floors", type=int, default=20, help="最上階")
+    parser.add_argument("--cars", type=int, default=4, help="エレベーターの台数")
+    parser.add_argument("--hours", type=float, default=1, help="シミュレーションする時間")
+    parser.add_argument("--rate", type=float, default=1200, help="1時間あたりの乗客数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    parser.add_argument("--pattern", action="append", choices=sorted(PATTERNS),
+                        help="交通パターン（複数指定可。省略時はすべて）")
+    parser.add_argument("--output", default=None, help="結果を書き出すJSONファイル")
+    parser.add_argument("--compare", default=None, help="比較対象のJSONファイル")
+    args = parser.parse_args()
+    
+    report = run_benchmark(args.floors, args.cars, args.hours, args.rate, args.seed, args.pattern)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_benchmark(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+行先階予約方式（デスティネーション・ディスパッチ）の群管理
+
+乗客は乗り場で目的階を入力し、その場で号機を割り当てられる。割り当ては
+「乗り場に着くまでの予想時間」に「新しく止まる階が増える分の遅れ」を加えたコストで選ぶので、
+同じ目的階の乗客は同じ号機にまとまりやすい。号機ごとに、割り当て済みでまだ降りていない
+乗客の数を数え、定員に達した号機には割り当てない（すべて満員なら最もコストの小さい号機）。
+乗り込むときの定員はシミュレーション側で守り、乗り切れなかった乗客は同じ号機を待つ。
+
+使い方:
+    python destination.py --cars 4 --floors 20 --rate 1400 --capacity 12
+"""
+from typing import Dict, List, Optional, Sequence
+import argparse
+import time
+
+from elevator import Direction, Elevator, ElevatorController, Passenger, Request
+from group import DispatchCost, GroupController, route_to
+from simulation import Simulation
+from traffic import PATTERNS, TrafficGenerator
+
+
+class DestinationDispatcher(GroupController):
+    """乗客ごとに号機を割り当てる群管理システム（目的階の近い乗客をまとめる）"""
+    
+    def __init__(self, controllers: Sequence[ElevatorController], capacity: Optional[int] = 12,
+                 floor_time: float = 0.5, door_time: float = 1.0, stop_penalty: float = 10.0):
+        """
+        Args:
+            controllers: エレベーターごとの制御システム
+            capacity: 1台の定員（None なら制限なし）
+            floor_time: 1階分の移動にかかる秒数
+            door_time: 1回の停止にかかる秒数
+            stop_penalty: 新しく止まる階が1つ増えるごとに加えるコスト（乗っている人の遅れ）
+        """
+        super().__init__(controllers)
+        self._capacity = capacity
+        self._floor_time = floor_time
+        self._door_time = door_time
+        self._stop_penalty = stop_penalty
+        # 号機ごとの、割り当て済みでまだ降りていない乗客と、その目的階ごとの人数
+        self._passengers: List[List[Passenger]] = [[] for _ in self._controllers]
+        self._targets: List[Dict[int, int]] = [{} for _ in self._controllers]
+    
+    def get_capacity(self) -> Optional[int]:
+        """1台の定員を取得"""
+        return self._capacity
+    
+    def get_committed(self, car: int) -> int:
+        """割り当て済みでまだ降りていない乗客の数を取得"""
+        return len(self._passengers[car])
+    
+    def assign_passenger(self, passenger: Passenger) -> Optional[int]:
+        """乗客に号機を割り当て、出発階の呼び出しをその号機に追加する"""
+        origin = passenger.get_origin()
+        destination = passenger.get_destination()
+        direction = passenger.get_direction()
+        best_car = None
+        best_cost = 0.0
+        best_full = True
+        for car in range(len(self._controllers)):
+            full = self._capacity is not None and len(self._passengers[car]) >= self._capacity
+            if full and not best_full:
+                continue
+            cost = self._passenger_cost(car, origin, destination, direction)
+            if best_car is None or (best_full and not full) or cost < best_cost:
+                best_car, best_cost, best_full = car, cost, full
+        
+        self._passengers[best_car].append(passenger)
+        targets = self._targets[best_car]
+        targets[destination] = targets.get(destination, 0) + 1
+        self._assign(Request(origin, direction), best_car)
+        return best_car
+    
+    def complete_floor(self, car: int, floor: int,
+                       direction: Optional[Direction] = None) -> List[Request]:
+        """号機が指定階でドアを開けた（この階で降りる乗客を数から除く）"""
+        served = super().complete_floor(car, floor, direction)
+        alighted = 0
+        remaining = []
+        for passenger in self._passengers[car]:
+            # 乗っていて、この階が目的階の乗客は降りる
+            if passenger.get_destination() == floor and passenger.get_wait_time() is not None:
+                alighted += 1
+            else:
+                remaining.append(passenger)
+        if alighted:
+            self._passengers[car] = remaining
+            targets = self._targets[car]
+            targets[floor] -= alighted
+            if not targets[floor]:
+                del targets[floor]
+        return served
+    
+    def _passenger_cost(self, car: int, origin: int, destination: int,
+                        direction: Direction) -> float:
+        """号機が乗客を迎えに行くコスト（到着予想時間と、止まる階が増える分の遅れ）"""
+        status = self.get_status(car)
+        distance, stops = route_to(status, origin, direction)
+        cost = distance * self._floor_time + stops * self._door_time
+        planned = self._targets[car]
+        if origin not in planned and not self._controllers[car].has_request_at(origin):
+            cost += self._stop_penalty
+        if destination not in planned and not self._controllers[car].has_request_at(destination):
+            cost += self._stop_penalty
+        return cost
+
+
+def main():
+    """メイン関数（同じ乗客の列で、乗り場呼びの群管理と行先階予約を比べる）"""
+    parser = argparse.ArgumentParser(description="行先階予約方式の群管理")
+    parser.add_argument("--cars", type=int, default=4, help="エレベーターの台数")
+    parser.add_argument("--floors", type=int, default=20, help="最上階")
+    parser.add_argument("--capacity", type=int, default=12, help="1台の定員")
+    parser.add_argument("--pattern", choices=sorted(PATTERNS), default="up_peak", help="交通パターン")
+    parser.add_argument("--hours", type=float, default=1, help="シミュレーションする時間")
+    parser.add_argument("--rate", type=float, default=1400, help="1時間あたりの乗客数")
+    parser.add_argument("--floor-time", type=float, default=1.5, help="1階分の移動にかかる秒数")
+    parser.add_argument("--door-time", type=float, default=4.0, help="ドアの開閉にかかる秒数")
+    parser.add_argument("--transfer-time", type=float, default=1.0, help="乗客1人の乗り降りにかかる秒数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    args = parser.parse_args()
+    
+    generator = TrafficGenerator(args.floors, args.pattern)
+    print(f"{args.pattern}, {args.floors}階, {args.cars}台, 定員 {args.capacity}人, "
+          f"{args.rate:,.0f}人/時 × {args.hours}時間")
+    for name in ("乗り場呼び", "行先階予約"):
+        controllers = [ElevatorController(Elevator(args.floors, verbose=False), verbose=False)
+                       for _ in range(args.cars)]
+        if name == "乗り場呼び":
+            group = GroupController(controllers, DispatchCost(args.floor_time, args.door_time))
+        else:
+            group = DestinationDispatcher(controllers, args.capacity, args.floor_time, args.door_time)
+        simulation = Simulation(group, args.floor_time, args.door_time, capacity=args.capacity,
+                                transfer_time=args.transfer_time)
+        for passenger in generator.generate(args.hours, args.rate, args.seed):
+            simulation.add_passenger(passenger)
+        start = time.perf_counter()
+        simulation.run()
+        elapsed = time.perf_counter() - start
+        
+        delivered = simulation.get_delivered_passengers()
+        waits = [p.get_wait_time() for p in delivered]
+        journeys = [p.get_journey_time() for p in delivered]
+        print(f"{name}: 平均待ち時間 {sum(waits) / len(waits):6.1f}秒, "
+              f"平均所要時間 {sum(journeys) / len(journeys):6.1f}秒, "
+              f"輸送 {len(delivered) / simulation.get_time() * 3600:7,.0f}人/時 "
+              f"（{len(delivered)}人, 終了 {simulation.get_time() / 60:.1f}分, {elapsed * 1000:.0f}ms）")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 """
 エレベーター制御のオブジェクト指向プログラミング実装例
 """
+from bisect import bisect_left, bisect_right, insort
 from enum import Enum
-from typing import List
+from typing import Container, Dict, List, Optional, Tuple
 import time
 
 
@@ -16,15 +17,17 @@ class Direction(Enum):
 class Elevator:
     """エレベータークラス"""
     
-    def __init__(self, max_floor: int = 10):
+    def __init__(self, max_floor: int = 10, verbose: bool = True):
         """
         Args:
             max_floor: 最上階
+            verbose: 移動やドアの開閉を表示するかどうか
         """
         self._current_floor = 1
         self._direction = Direction.IDLE
         self._door_open = False
         self._max_floor = max_floor
+        self._verbose = verbose
     
     def move_to_floor(self, target_floor: int) -> None:
         """指定階に移動"""
@@ -39,28 +42,45 @@ class Elevator:
         
         # 移動
         while self._current_floor != target_floor:
-            if self._direction == Direction.UP:
-                self._current_floor += 1
-            else:
-                self._current_floor -= 1
-            
-            print(f"  {self._current_floor}階通過...")
+            self.step()
             time.sleep(0.5)
         
+        self.stop()
+    
+    def step(self) -> None:
+        """現在の方向に1階だけ移動（待ち時間なし）"""
+        if self._direction == Direction.UP:
+            self._current_floor += 1
+        elif self._direction == Direction.DOWN:
+            self._current_floor -= 1
+        else:
+            return
+        if self._verbose:
+            print(f"  {self._current_floor}階通過...")
+    
+    def stop(self) -> None:
+        """現在階で停止"""
         self._direction = Direction.IDLE
-        print(f"  {self._current_floor}階に到着！")
+        if self._verbose:
+            print(f"  {self._current_floor}階に到着！")
+    
+    def set_direction(self, direction: Direction) -> None:
+        """移動方向を設定"""
+        self._direction = direction
     
     def open_door(self) -> None:
         """ドアを開く"""
         if not self._door_open:
             self._door_open = True
-            print("  ドアが開きました。")
+            if self._verbose:
+                print("  ドアが開きました。")
     
     def close_door(self) -> None:
         """ドアを閉じる"""
         if self._door_open:
             self._door_open = False
-            print("  ドアが閉まりました。")
+            if self._verbose:
+                print("  ドアが閉まりました。")
     
     def get_current_floor(self) -> int:
         """現在階を取得"""
@@ -73,6 +93,10 @@ class Elevator:
     def is_door_open(self) -> bool:
         """ドアが開いているかチェック"""
         return self._door_open
+    
+    def get_max_floor(self) -> int:
+        """最上階を取得"""
+        return self._max_floor
 
 
 class Request:
@@ -96,26 +120,281 @@ class Request:
         return self._direction
 
 
+class Passenger:
+    """乗客（出発階で呼び出し、目的階で降りる）"""
+    
+    def __init__(self, origin: int, destination: int, arrival_time: float = 0.0):
+        """
+        Args:
+            origin: 出発階
+            destination: 目的階
+            arrival_time: 乗り場に着いた時刻（秒）
+        """
+        self._origin = origin
+        self._destination = destination
+        self._arrival_time = arrival_time
+        self._board_time: Optional[float] = None
+        self._alight_time: Optional[float] = None
+    
+    def get_origin(self) -> int:
+        """出発階を取得"""
+        return self._origin
+    
+    def get_destination(self) -> int:
+        """目的階を取得"""
+        return self._destination
+    
+    def get_direction(self) -> Direction:
+        """行き先の方向を取得"""
+        return Direction.UP if self._destination > self._origin else Direction.DOWN
+    
+    def get_arrival_time(self) -> float:
+        """乗り場に着いた時刻を取得"""
+        return self._arrival_time
+    
+    def board(self, at: float) -> None:
+        """エレベーターに乗った"""
+        self._board_time = at
+    
+    def alight(self, at: float) -> None:
+        """目的階で降りた"""
+        self._alight_time = at
+    
+    def get_wait_time(self) -> Optional[float]:
+        """待ち時間（乗り場に着いてから乗るまで。まだ乗っていなければNone）"""
+        if self._board_time is None:
+            return None
+        return self._board_time - self._arrival_time
+    
+    def get_journey_time(self) -> Optional[float]:
+        """所要時間（乗り場に着いてから降りるまで。まだ降りていなければNone）"""
+        if self._alight_time is None:
+            return None
+        return self._alight_time - self._arrival_time
+
+
+class RequestIndex:
+    """未処理のリクエストの索引
+    
+    (階, 方向) ごとに1件を持ち、リクエストのある階を昇順のリストで管理する。
+    上りで止まる階（UP と IDLE）と下りで止まる階（DOWN と IDLE）も別々に持つので、
+    次に止まる階は bisect で O(log n) で探せる。
+    """
+    
+    def __init__(self):
+        self._requests: Dict[Tuple[int, Direction], Request] = {}
+        self._floors: List[int] = []
+        self._up_floors: List[int] = []
+        self._down_floors: List[int] = []
+    
+    def __len__(self) -> int:
+        return len(self._requests)
+    
+    def add(self, request: Request) -> bool:
+        """リクエストを追加（同じ階・同じ方向のリクエストが既にあれば False）"""
+        floor = request.get_floor()
+        direction = request.get_direction()
+        requests = self._requests
+        if (floor, direction) in requests:
+            return False
+        
+        if not self.has_floor(floor):
+            insort(self._floors, floor)
+        if direction != Direction.DOWN and not self._stops_up(floor):
+            insort(self._up_floors, floor)
+        if direction != Direction.UP and not self._stops_down(floor):
+            insort(self._down_floors, floor)
+        requests[(floor, direction)] = request
+        return True
+    
+    def remove(self, request: Request) -> bool:
+        """リクエストを取り除く（同じオブジェクトが登録されていなければ False）"""
+        floor = request.get_floor()
+        key = (floor, request.get_direction())
+        if self._requests.get(key) is not request:
+            return False
+        del self._requests[key]
+        self._update_floor(floor)
+        return True
+    
+    def pop_floor(self, floor: int, direction: Direction = Direction.IDLE) -> List[Request]:
+        """指定階の行き先呼び（IDLE）と、指定方向の乗り場呼びを取り除いて返す
+        
+        反対方向の乗り場呼びは残す（その方向に向かうときに止まる）。
+        """
+        served = []
+        request = self._requests.pop((floor, Direction.IDLE), None)
+        if request is not None:
+            served.append(request)
+        if direction != Direction.IDLE:
+            request = self._requests.pop((floor, direction), None)
+            if request is not None:
+                served.append(request)
+        if served:
+            self._update_floor(floor)
+        return served
+    
+    def has_call(self, floor: int, direction: Direction) -> bool:
+        """指定階・指定方向のリクエストがあるかどうか"""
+        return (floor, direction) in self._requests
+    
+    def has_beyond(self, floor: int, direction: Direction) -> bool:
+        """指定階より進行方向の先にリクエストがあるかどうか"""
+        floors = self._floors
+        if direction == Direction.UP:
+            return bisect_right(floors, floor) < len(floors)
+        return bisect_left(floors, floor) > 0
+    
+    def has_floor(self, floor: int) -> bool:
+        """指定階のリクエストがあるかどうか"""
+        requests = self._requests
+        return ((floor, Direction.IDLE) in requests or (floor, Direction.UP) in requests
+                or (floor, Direction.DOWN) in requests)
+    
+    def get_floors(self) -> List[int]:
+        """リクエストのある階の昇順リストを取得（変更しないこと）"""
+        return self._floors
+    
+    def get_up_floors(self) -> List[int]:
+        """上りで止まる階の昇順リストを取得（変更しないこと）"""
+        return self._up_floors
+    
+    def get_down_floors(self) -> List[int]:
+        """下りで止まる階の昇順リストを取得（変更しないこと）"""
+        return self._down_floors
+    
+    def _update_floor(self, floor: int) -> None:
+        """リクエストを取り除いた階を、残りのリクエストに合わせて昇順リストから外す"""
+        if not self._stops_up(floor):
+            _discard(self._up_floors, floor)
+        if not self._stops_down(floor):
+            _discard(self._down_floors, floor)
+        if not self.has_floor(floor):
+            _discard(self._floors, floor)
+    
+    def _stops_up(self, floor: int) -> bool:
+        requests = self._requests
+        return (floor, Direction.IDLE) in requests or (floor, Direction.UP) in requests
+    
+    def _stops_down(self, floor: int) -> bool:
+        requests = self._requests
+        return (floor, Direction.IDLE) in requests or (floor, Direction.DOWN) in requests
+
+
+def _discard(floors: List[int], floor: int) -> None:
+    """昇順リストから階を取り除く（なければ何もしない）"""
+    i = bisect_left(floors, floor)
+    if i < len(floors) and floors[i] == floor:
+        del floors[i]
+
+
+class LookScheduler:
+    """LOOK 方式: 進行方向の最後のリクエストで折り返す
+    
+    上りでは UP と IDLE のリクエストの階に止まり、DOWN のリクエストは
+    それより上に止まる階がなければ最も上のものを折り返し点にする（下りも同様）。
+    """
+    
+    def next_floor(self, index: RequestIndex, floor: int, direction: Direction,
+                   max_floor: int) -> Optional[int]:
+        """次に止まる階を取得（現在階も含む。リクエストがなければ None）"""
+        floors = index.get_floors()
+        if not floors:
+            return None
+        if direction == Direction.IDLE:
+            return _nearest(floors, floor)
+        ahead = self._ahead(index, floor, direction)
+        if ahead is not None:
+            return ahead
+        ahead = self._turn(index, floor, direction, max_floor)
+        if ahead is not None:
+            return ahead
+        reverse = Direction.DOWN if direction == Direction.UP else Direction.UP
+        ahead = self._ahead(index, floor, reverse)
+        if ahead is None:
+            ahead = self._turn(index, floor, reverse, max_floor)
+        return ahead if ahead is not None else _nearest(floors, floor)
+    
+    def _ahead(self, index: RequestIndex, floor: int, direction: Direction) -> Optional[int]:
+        """進行方向にある止まる階か、なければ折り返し点"""
+        if direction == Direction.UP:
+            up = index.get_up_floors()
+            i = bisect_left(up, floor)
+            if i < len(up):
+                return up[i]
+            down = index.get_down_floors()
+            if down and down[-1] >= floor:
+                return down[-1]
+        else:
+            down = index.get_down_floors()
+            i = bisect_right(down, floor)
+            if i > 0:
+                return down[i - 1]
+            up = index.get_up_floors()
+            if up and up[0] <= floor:
+                return up[0]
+        return None
+    
+    def _turn(self, index: RequestIndex, floor: int, direction: Direction,
+              max_floor: int) -> Optional[int]:
+        """進行方向にリクエストがないときに、折り返す前に向かう階（LOOK はその場で折り返す）"""
+        return None
+
+
+class ScanScheduler(LookScheduler):
+    """SCAN 方式: 進行方向にリクエストがなくても端の階まで行ってから折り返す"""
+    
+    def _ahead(self, index: RequestIndex, floor: int, direction: Direction) -> Optional[int]:
+        """進行方向にある止まる階（反対方向のリクエストは折り返した後で止まる）"""
+        if direction == Direction.UP:
+            up = index.get_up_floors()
+            i = bisect_left(up, floor)
+            return up[i] if i < len(up) else None
+        down = index.get_down_floors()
+        i = bisect_right(down, floor)
+        return down[i - 1] if i > 0 else None
+    
+    def _turn(self, index: RequestIndex, floor: int, direction: Direction,
+              max_floor: int) -> Optional[int]:
+        """端の階（既に端にいれば None で折り返す）"""
+        end = max_floor if direction == Direction.UP else 1
+        return end if floor != end else None
+
+
+def _nearest(floors: List[int], floor: int) -> int:
+    """昇順リストから最も近い階を取得（同じ距離なら下の階）"""
+    i = bisect_left(floors, floor)
+    if i == len(floors):
+        return floors[-1]
+    if i == 0 or floors[i] - floor < floor - floors[i - 1]:
+        return floors[i]
+    return floors[i - 1]
+
+
 class ElevatorController:
     """エレベーター制御システム"""
     
-    def __init__(self, elevator: Elevator):
+    def __init__(self, elevator: Elevator, verbose: bool = True, scheduler=None):
         """
         Args:
             elevator: 制御対象のエレベーター
+            verbose: リクエストの受付や行き先を表示するかどうか
+            scheduler: 次に止まる階を決める方式（省略時は LookScheduler()）
         """
         self._elevator = elevator
-        self._requests: List[Request] = []
-    
-    def add_request(self, request: Request) -> None:
-        """リクエストを追加"""
-        # 重複チェック
-        for r in self._requests:
-            if r.get_floor() == request.get_floor():
-                return
-        
-        self._requests.append(request)
-        print(f"\nリクエスト追加: {request.get_floor()}階")
+        self._requests = RequestIndex()
+        self._verbose = verbose
+        self._scheduler = scheduler if scheduler is not None else LookScheduler()
+        # 最後に動いた方向（止まっている間も、次はこの方向を優先する）
+        self._sweep = Direction.IDLE
+    
+    def add_request(self, request: Request) -> bool:
+        """リクエストを追加（同じ階・同じ方向のリクエストが既にあれば追加せず False を返す）"""
+        if not self._requests.add(request):
+            return False
+        if self._verbose:
+            print(f"\nリクエスト追加: {request.get_floor()}階")
+        return True
     
     def process_requests(self) -> None:
         """リクエストを処理"""
@@ -123,42 +402,87 @@ class ElevatorController:
             next_floor = self._get_next_floor()
             
             if next_floor is not None:
-                print(f"\n{next_floor}階に向かいます...")
+                if self._verbose:
+                    print(f"\n{next_floor}階に向かいます...")
                 self._elevator.move_to_floor(next_floor)
                 self._elevator.open_door()
                 time.sleep(1)
                 self._elevator.close_door()
                 
                 # 処理済みリクエストを削除
-                self._requests = [r for r in self._requests 
-                                 if r.get_floor() != next_floor]
+                self.complete_floor(next_floor)
     
-    def _get_next_floor(self) -> int:
-        """次に向かう階を決定"""
-        if not self._requests:
-            return None
+    def has_requests(self) -> bool:
+        """未処理のリクエストがあるかどうか"""
+        return bool(self._requests)
+    
+    def remove_request(self, request: Request) -> bool:
+        """リクエストを取り消す（他のエレベーターに割り当て直すときなどに使う）"""
+        return self._requests.remove(request)
+    
+    def get_request_floors(self) -> List[int]:
+        """リクエストのある階を昇順で取得"""
+        return list(self._requests.get_floors())
+    
+    def has_request_at(self, floor: int) -> bool:
+        """指定階のリクエストがあるかどうか"""
+        return self._requests.has_floor(floor)
+    
+    def get_service_direction(self, floor: int,
+                              calls: Optional[Container[Tuple[int, Direction]]] = None) -> Direction:
+        """指定階でドアを開けたときに受け持つ方向を取得（その方向の乗り場呼びだけを処理する）
         
-        current_floor = self._elevator.get_current_floor()
-        direction = self._elevator.get_direction()
+        進行方向（止まっている間は最後に動いた方向）の先に止まる階があれば進行方向。
+        なければ（折り返すか止まっているなら）進行方向、反対方向の順に、この階に
+        呼び出しのある方向。どちらもなければ IDLE（どちらの方向の乗客でもよい）。
         
-        # 同じ方向のリクエストを優先
-        if direction == Direction.UP:
-            # 現在階より上で最も近い階
-            upper_floors = [r.get_floor() for r in self._requests 
-                          if r.get_floor() > current_floor]
-            if upper_floors:
-                return min(upper_floors)
-        elif direction == Direction.DOWN:
-            # 現在階より下で最も近い階
-            lower_floors = [r.get_floor() for r in self._requests 
-                          if r.get_floor() < current_floor]
-            if lower_floors:
-                return max(lower_floors)
+        Args:
+            floor: ドアを開ける階
+            calls: このエレベーターのリクエストのほかに確かめる (階, 方向)（群管理の呼び出しなど）
+        """
+        requests = self._requests
+        sweep = self._elevator.get_direction()
+        if sweep == Direction.IDLE:
+            sweep = self._sweep
+        if sweep == Direction.IDLE:
+            order = (Direction.UP, Direction.DOWN)
+        else:
+            if requests.has_beyond(floor, sweep):
+                return sweep
+            order = (sweep, Direction.DOWN if sweep == Direction.UP else Direction.UP)
+        for direction in order:
+            if requests.has_call(floor, direction) or (calls is not None and (floor, direction) in calls):
+                return direction
+        return Direction.IDLE
+    
+    def complete_floor(self, floor: int, direction: Optional[Direction] = None) -> List[Request]:
+        """指定階の行き先呼びと、受け持つ方向の乗り場呼びを処理済みにし、取り除いたリクエストを返す
         
-        # 最も近い階を選択
-        closest = min(self._requests, 
-                     key=lambda r: abs(r.get_floor() - current_floor))
-        return closest.get_floor()
+        direction を省略すると get_service_direction で決める。UP / DOWN なら、
+        次はその方向に進む。
+        """
+        if direction is None:
+            direction = self.get_service_direction(floor)
+        if direction != Direction.IDLE:
+            self._sweep = direction
+        return self._requests.pop_floor(floor, direction)
+    
+    def get_next_floor(self) -> Optional[int]:
+        """次に止まる階を取得（現在階のこともある。リクエストがなければNone）"""
+        return self._get_next_floor()
+    
+    def _get_next_floor(self) -> Optional[int]:
+        """次に止まる階を決定"""
+        elevator = self._elevator
+        current_floor = elevator.get_current_floor()
+        direction = elevator.get_direction()
+        if direction == Direction.IDLE:
+            direction = self._sweep
+        next_floor = self._scheduler.next_floor(self._requests, current_floor, direction,
+                                                elevator.get_max_floor())
+        if next_floor is not None and next_floor != current_floor:
+            self._sweep = Direction.UP if next_floor > current_floor else Direction.DOWN
+        return next_floor
     
     def get_elevator(self) -> Elevator:
         """エレベーターを取得"""
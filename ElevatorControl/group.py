@@ -0,0 +1,559 @@
+"""
+複数台のエレベーターの群管理（乗り場呼びの割り当て）
+
+乗り場からの呼び出しを、コスト関数の値が最も小さいエレベーターに割り当てる。
+コスト関数は到着予想時間・受け持ちの多さ・進行方向との相性を組み合わせたもので、
+差し替えられる。エレベーターが1階進むたびに、そのエレベーターから見たコストを
+計算し直し、十分に早く着けるなら呼び出しを付け替える。
+コスト関数が decrease_bound を持っていれば、付け替えられなかった呼び出しごとに
+コストの余裕を覚えておき、動いてコストが下がりうる量がそれを超えるまでは計算しない。
+
+使い方:
+    python group.py --cars 8 --floors 40 --calls 500
+    python group.py --cars 12 --floors 300 --calls 1000
+"""
+from bisect import bisect_left, bisect_right
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import argparse
+import random
+import time
+
+from elevator import Direction, Elevator, ElevatorController, Passenger, Request
+from simulation import Simulation, random_requests
+
+
+class CarStatus:
+    """コスト計算に使うエレベーター1台分の状態"""
+    
+    __slots__ = ("floor", "direction", "stops")
+    
+    def __init__(self, floor: int, direction: Direction, stops: List[int]):
+        """
+        Args:
+            floor: 現在階
+            direction: 移動方向
+            stops: 停止予定の階（昇順）
+        """
+        self.floor = floor
+        self.direction = direction
+        self.stops = stops
+
+
+def route_to(status: CarStatus, floor: int, direction: Direction) -> Tuple[int, int]:
+    """現在の予定どおりに動いたとき、呼び出し階に着くまでの（移動階数, 途中の停止回数）
+    
+    進行方向の最後の停止階で折り返す動き（LOOK）を想定する。
+    呼び出しの方向が UP / DOWN なら、その方向に進みながら着くまでを数える。
+    """
+    here = status.floor
+    stops = status.stops
+    low = min(stops[0], here) if stops else here
+    high = max(stops[-1], here) if stops else here
+    
+    if status.direction == Direction.UP:
+        if floor >= here and direction != Direction.DOWN:
+            return floor - here, bisect_left(stops, floor) - bisect_right(stops, here)
+        top = max(high, floor)
+        if direction != Direction.UP:
+            return (top - here) + (top - floor), len(stops)
+        bottom = min(low, floor)
+        return (top - here) + (top - bottom) + (floor - bottom), len(stops)
+    
+    if status.direction == Direction.DOWN:
+        if floor <= here and direction != Direction.UP:
+            return here - floor, bisect_left(stops, here) - bisect_right(stops, floor)
+        bottom = min(low, floor)
+        if direction != Direction.DOWN:
+            return (here - bottom) + (floor - bottom), len(stops)
+        top = max(high, floor)
+        return (here - bottom) + (top - bottom) + (top - floor), len(stops)
+    
+    return abs(floor - here), 0
+
+
+def status_changes(previous: CarStatus, status: CarStatus) -> Optional[Tuple[int, int, int]]:
+    """前の状態から今の状態までの（進んだ階数, 通り過ぎたか取り消した停止予定の数,
+    折り返す階が縮んだ階数）
+    
+    停止予定が増えただけなら、どの呼び出しにも近くはならない。
+    方向が変わったか、進行方向と逆に動いたなら None。
+    """
+    if previous.direction != status.direction:
+        return None
+    moved = status.floor - previous.floor
+    if status.direction == Direction.DOWN:
+        moved = -moved
+    elif status.direction == Direction.IDLE:
+        moved = abs(moved)
+    if moved < 0:
+        return None
+    passed = 0
+    if moved:
+        low, high = sorted((previous.floor, status.floor))
+        passed = bisect_right(previous.stops, high) - bisect_left(previous.stops, low)
+    if previous.stops == status.stops:
+        removed = 0
+    else:
+        removed = len(set(previous.stops).difference(status.stops))
+    if not removed:
+        return moved, passed, 0
+    old_high = max(previous.stops[-1], previous.floor)
+    old_low = min(previous.stops[0], previous.floor)
+    new_high = max(status.stops[-1], status.floor) if status.stops else status.floor
+    new_low = min(status.stops[0], status.floor) if status.stops else status.floor
+    return moved, passed + removed, max(0, old_high - new_high) + max(0, new_low - old_low)
+
+
+class EtaCost:
+    """到着予想時間（秒）"""
+    
+    def __init__(self, floor_time: float = 0.5, door_time: float = 1.0):
+        """
+        Args:
+            floor_time: 1階分の移動にかかる秒数
+            door_time: 1回の停止にかかる秒数
+        """
+        self._floor_time = floor_time
+        self._door_time = door_time
+    
+    def __call__(self, status: CarStatus, floor: int, direction: Direction) -> float:
+        distance, stops = route_to(status, floor, direction)
+        return distance * self._floor_time + stops * self._door_time
+    
+    def decrease_bound(self, previous: CarStatus, status: CarStatus) -> Optional[float]:
+        """前の状態から今の状態になって、どの呼び出しのコストも下がりうる最大の量（分からなければ None）
+        
+        1階進むと移動階数は1まで、停止予定を1つ通り過ぎるか取り消すと途中の停止回数は1まで、
+        折り返す階が1階縮むと移動階数は2まで減る。
+        """
+        changes = status_changes(previous, status)
+        if changes is None:
+            return None
+        moved, stops, shrunk = changes
+        return (moved + 2 * shrunk) * self._floor_time + stops * self._door_time
+
+
+class LoadCost:
+    """受け持っている停止予定の多さ"""
+    
+    def __init__(self, weight: float = 1.0):
+        """
+        Args:
+            weight: 停止予定1つあたりのコスト
+        """
+        self._weight = weight
+    
+    def __call__(self, status: CarStatus, floor: int, direction: Direction) -> float:
+        return len(status.stops) * self._weight
+    
+    def decrease_bound(self, previous: CarStatus, status: CarStatus) -> Optional[float]:
+        """取り消した停止予定の分だけ下がる"""
+        if status_changes(previous, status) is None:
+            return None
+        removed = len(set(previous.stops).difference(status.stops))
+        return removed * self._weight
+
+
+class DirectionCost:
+    """呼び出しが進行方向の先にない（折り返しが必要な）場合のペナルティ"""
+    
+    def __init__(self, penalty: float = 5.0):
+        """
+        Args:
+            penalty: 折り返しが必要な場合のコスト
+        """
+        self._penalty = penalty
+    
+    def __call__(self, status: CarStatus, floor: int, direction: Direction) -> float:
+        if status.direction == Direction.UP:
+            on_the_way = floor >= status.floor and direction != Direction.DOWN
+        elif status.direction == Direction.DOWN:
+            on_the_way = floor <= status.floor and direction != Direction.UP
+        else:
+            return 0.0
+        return 0.0 if on_the_way else self._penalty
+    
+    def decrease_bound(self, previous: CarStatus, status: CarStatus) -> Optional[float]:
+        """方向が同じなら、進むにつれて呼び出しが後ろになることはあっても前にはならない"""
+        return 0.0 if status_changes(previous, status) is not None else None
+
+
+class CombinedCost:
+    """複数のコスト関数の和"""
+    
+    def __init__(self, *costs):
+        """
+        Args:
+            costs: (CarStatus, 階, 方向) を受け取って数値を返すコスト関数
+        """
+        self._costs = costs
+    
+    def __call__(self, status: CarStatus, floor: int, direction: Direction) -> float:
+        total = 0.0
+        for cost in self._costs:
+            total += cost(status, floor, direction)
+        return total
+    
+    def decrease_bound(self, previous: CarStatus, status: CarStatus) -> Optional[float]:
+        """各コスト関数の和（1つでも分からないものがあれば None）"""
+        total = 0.0
+        for cost in self._costs:
+            decrease = _decrease_bound(cost, previous, status)
+            if decrease is None:
+                return None
+            total += decrease
+        return total
+
+
+class DispatchCost:
+    """到着予想時間・受け持ちの多さ・進行方向を組み合わせた既定のコスト関数
+    
+    CombinedCost(EtaCost(), LoadCost(), DirectionCost()) と同じ値を、
+    1回の呼び出しで計算する（割り当ての見直しで何度も呼ばれるため）。
+    """
+    
+    def __init__(self, floor_time: float = 0.5, door_time: float = 1.0,
+                 load_weight: float = 1.0, direction_penalty: float = 5.0):
+        """
+        Args:
+            floor_time: 1階分の移動にかかる秒数
+            door_time: 1回の停止にかかる秒数
+            load_weight: 停止予定1つあたりのコスト
+            direction_penalty: 折り返しが必要な場合のコスト
+        """
+        self._floor_time = floor_time
+        self._door_time = door_time
+        self._load_weight = load_weight
+        self._direction_penalty = direction_penalty
+    
+    def __call__(self, status: CarStatus, floor: int, direction: Direction) -> float:
+        distance, stops = route_to(status, floor, direction)
+        value = (distance * self._floor_time + stops * self._door_time
+                 + len(status.stops) * self._load_weight)
+        if status.direction == Direction.UP:
+            if floor < status.floor or direction == Direction.DOWN:
+                value += self._direction_penalty
+        elif status.direction == Direction.DOWN:
+            if floor > status.floor or direction == Direction.UP:
+                value += self._direction_penalty
+        return value
+    
+    def decrease_bound(self, previous: CarStatus, status: CarStatus) -> Optional[float]:
+        """EtaCost と LoadCost の和（方向のペナルティは、方向が同じなら下がらない）"""
+        changes = status_changes(previous, status)
+        if changes is None:
+            return None
+        moved, stops, shrunk = changes
+        removed = len(set(previous.stops).difference(status.stops)) if stops else 0
+        return ((moved + 2 * shrunk) * self._floor_time + stops * self._door_time
+                + removed * self._load_weight)
+    
+    def bind(self, status: CarStatus) -> Callable[[int, Direction], float]:
+        """状態を固定したコスト関数を作る（値は __call__ と同じ）
+        
+        見直しでは同じ状態のまま保留中の呼び出しすべてのコストを計算するので、
+        折り返す階や停止予定の数など、状態だけで決まる値を先に計算しておく。
+        """
+        here = status.floor
+        stops = status.stops
+        moving = status.direction
+        floor_time = self._floor_time
+        load = len(status.stops) * self._load_weight
+        if moving == Direction.IDLE:
+            def cost(floor: int, direction: Direction) -> float:
+                return (floor - here if floor >= here else here - floor) * floor_time + load
+            return cost
+        
+        low = min(stops[0], here) if stops else here
+        high = max(stops[-1], here) if stops else here
+        # 折り返す呼び出しは、停止予定をすべて回ってからになる
+        behind = len(stops) * self._door_time + load + self._direction_penalty
+        door_time = self._door_time
+        if moving == Direction.UP:
+            passed = bisect_right(stops, here)
+            
+            def cost(floor: int, direction: Direction) -> float:
+                if floor >= here and direction != Direction.DOWN:
+                    return ((floor - here) * floor_time
+                            + (bisect_left(stops, floor) - passed) * door_time + load)
+                top = high if high > floor else floor
+                if direction != Direction.UP:
+                    return ((top - here) + (top - floor)) * floor_time + behind
+                bottom = low if low < floor else floor
+                return ((top - here) + (top - bottom) + (floor - bottom)) * floor_time + behind
+            return cost
+        
+        passed = bisect_left(stops, here)
+        
+        def cost(floor: int, direction: Direction) -> float:
+            if floor <= here and direction != Direction.UP:
+                return ((here - floor) * floor_time
+                        + (passed - bisect_right(stops, floor)) * door_time + load)
+            bottom = low if low < floor else floor
+            if direction != Direction.DOWN:
+                return ((here - bottom) + (floor - bottom)) * floor_time + behind
+            top = high if high > floor else floor
+            return ((here - bottom) + (top - bottom) + (top - floor)) * floor_time + behind
+        return cost
+
+
+def _bind(cost, status: CarStatus) -> Callable[[int, Direction], float]:
+    """コスト関数の bind（持っていなければ状態を渡すだけの関数）"""
+    bind = getattr(cost, "bind", None)
+    return bind(status) if bind is not None else partial(cost, status)
+
+
+def _decrease_bound(cost, previous: CarStatus, status: CarStatus) -> Optional[float]:
+    """コスト関数の decrease_bound（持っていなければ None）"""
+    decrease_bound = getattr(cost, "decrease_bound", None)
+    return decrease_bound(previous, status) if decrease_bound is not None else None
+
+
+class GroupController:
+    """複数台のエレベーターに乗り場呼びを割り当てる群管理システム"""
+    
+    def __init__(self, controllers: Sequence[ElevatorController], cost=None,
+                 hysteresis: float = 2.0):
+        """
+        Args:
+            controllers: エレベーターごとの制御システム
+            cost: (CarStatus, 階, 方向) を受け取るコスト関数（省略時は DispatchCost()）
+            hysteresis: 割り当てを付け替えるのに必要なコストの改善幅
+        """
+        self._controllers = list(controllers)
+        self._cost = cost if cost is not None else DispatchCost()
+        self._hysteresis = hysteresis
+        # (階, 方向) → [リクエスト, 割り当てたエレベーター, そのエレベーターから見たコスト,
+        #              {他のエレベーター: (状態の番号, 付け替えられない限度)}]
+        # 他のエレベーターは、状態の番号が同じで、コストが下がりうる量の合計と
+        # 割り当てたエレベーターのコストの和が限度以下なら、付け替えられないので計算しない
+        self._calls: Dict[Tuple[int, Direction], list] = {}
+        self._statuses: List[Optional[CarStatus]] = [None] * len(self._controllers)
+        # エレベーターごとの、前回の見直しのときの状態と、コストがどれだけ下がったか
+        # 分からなくなった回数（状態の番号）と、その後にコストが下がりうる量の合計
+        self._tracks: List[Optional[CarStatus]] = [None] * len(self._controllers)
+        self._epochs = [0] * len(self._controllers)
+        self._drifts = [0.0] * len(self._controllers)
+        self._reassignments = 0
+        self._reassign_handler: Optional[Callable[[Request, int], None]] = None
+    
+    def set_reassign_handler(self, handler: Optional[Callable[[Request, int], None]]) -> None:
+        """update で呼び出しを付け替えたときに (リクエスト, 新しい号機) で呼ぶ関数を設定"""
+        self._reassign_handler = handler
+    
+    def get_controllers(self) -> List[ElevatorController]:
+        """エレベーターごとの制御システムを取得"""
+        return list(self._controllers)
+    
+    def get_status(self, car: int) -> CarStatus:
+        """エレベーターの状態を取得（変化があるまで使い回す）"""
+        status = self._statuses[car]
+        if status is None:
+            controller = self._controllers[car]
+            elevator = controller.get_elevator()
+            status = CarStatus(elevator.get_current_floor(), elevator.get_direction(),
+                               controller.get_request_floors())
+            self._statuses[car] = status
+        return status
+    
+    def add_request(self, request: Request) -> int:
+        """乗り場呼びを最もコストの小さいエレベーターに割り当て、その番号を返す"""
+        key = (request.get_floor(), request.get_direction())
+        call = self._calls.get(key)
+        if call is not None:
+            return call[1]
+        
+        floor, direction = key
+        cost = self._cost
+        best_car = 0
+        best_cost = float("inf")
+        for car in range(len(self._controllers)):
+            value = cost(self.get_status(car), floor, direction)
+            if value < best_cost:
+                best_car, best_cost = car, value
+        self._calls[key] = [request, best_car, best_cost, {}]
+        self._assign(request, best_car)
+        return best_car
+    
+    def assign_passenger(self, passenger: Passenger) -> Optional[int]:
+        """乗客ごとに号機を割り当てる方式なら、割り当てた番号を返す
+        
+        通常の群管理では割り当てずに None を返し、乗り場呼び（add_request）で迎えに行く。
+        """
+        return None
+    
+    def update(self, car: int) -> bool:
+        """エレベーターが動いたか止まった後に割り当てを見直し、呼び出しを引き取ったかを返す
+        
+        動いたエレベーターから見たコストだけを計算し直す。他のエレベーターの
+        コストは、それぞれが動いたときに更新される。他のエレベーターの呼び出しは、
+        前回付け替えられなかったときから十分に動いていなければ計算しない。
+        """
+        self._statuses[car] = None
+        status = self.get_status(car)
+        self._track(car, status)
+        cost = self._cost
+        evaluate = _bind(cost, status)
+        hysteresis = self._hysteresis
+        epoch = self._epochs[car]
+        drift = self._drifts[car]
+        moved = 0
+        for (floor, direction), call in self._calls.items():
+            old_car = call[1]
+            if old_car == car:
+                call[2] = evaluate(floor, direction)
+                continue
+            checked = call[3].get(car)
+            if checked is not None and checked[0] == epoch and drift + call[2] <= checked[1]:
+                continue
+            value = evaluate(floor, direction)
+            # 今のコストから下がりうる量を引いても、割り当てたエレベーターのコストより
+            # hysteresis 以上小さくならないうちは付け替えられない
+            if value + hysteresis >= call[2]:
+                call[3][car] = (epoch, drift + value + hysteresis)
+                continue
+            # 記録してあるコストは古いことがあるので、今の状態で比べ直す
+            current = cost(self.get_status(old_car), floor, direction)
+            call[2] = current
+            if value + hysteresis >= current:
+                call[3][car] = (epoch, drift + value + hysteresis)
+                continue
+            self._controllers[old_car].remove_request(call[0])
+            self._assign(call[0], car)
+            self._statuses[old_car] = None
+            self._statuses[car] = None
+            status = self.get_status(car)
+            self._track(car, status)
+            evaluate = _bind(cost, status)
+            epoch = self._epochs[car]
+            drift = self._drifts[car]
+            call[1] = car
+            call[2] = value
+            call[3].clear()
+            moved += 1
+            if self._reassign_handler is not None:
+                self._reassign_handler(call[0], car)
+        self._reassignments += moved
+        return moved > 0
+    
+    def get_service_direction(self, car: int, floor: int) -> Direction:
+        """エレベーターが指定階でドアを開けたときに受け持つ方向を取得（他の号機の呼び出しも見る）"""
+        return self._controllers[car].get_service_direction(floor, self._calls)
+    
+    def complete_floor(self, car: int, floor: int,
+                       direction: Optional[Direction] = None) -> List[Request]:
+        """エレベーターが指定階でドアを開けた（行き先呼びと、受け持つ方向の呼び出しを処理済みにする）"""
+        if direction is None:
+            direction = self.get_service_direction(car, floor)
+        served = self._controllers[car].complete_floor(floor, direction)
+        self._statuses[car] = None
+        # 受け持つ方向の呼び出しだけを取り消す（反対方向は割り当てた号機が迎えに行く）
+        keys = [(floor, Direction.IDLE)]
+        if direction != Direction.IDLE:
+            keys.append((floor, direction))
+        for key in keys:
+            call = self._calls.pop(key, None)
+            if call is not None and call[1] != car:
+                self._controllers[call[1]].remove_request(call[0])
+                self._statuses[call[1]] = None
+        return served
+    
+    def _track(self, car: int, status: CarStatus) -> None:
+        """前回の見直しから、コストが下がりうる量を足す（分からなければ状態の番号を進める）"""
+        previous = self._tracks[car]
+        self._tracks[car] = status
+        decrease = _decrease_bound(self._cost, previous, status) if previous is not None else None
+        if decrease is None:
+            self._epochs[car] += 1
+        else:
+            self._drifts[car] += decrease
+    
+    
+    def get_pending_count(self) -> int:
+        """割り当て済みでまだ処理されていない呼び出しの数を取得"""
+        return len(self._calls)
+    
+    def get_reassignment_count(self) -> int:
+        """割り当てを付け替えた回数を取得"""
+        return self._reassignments
+    
+    def _assign(self, request: Request, car: int) -> None:
+        """エレベーターにリクエストを渡す"""
+        self._controllers[car].add_request(request)
+        self._statuses[car] = None
+
+
+def main():
+    """メイン関数（割り当ての速度と、台数ごとの待ち時間を表示）"""
+    parser = argparse.ArgumentParser(description="エレベーターの群管理")
+    parser.add_argument("--cars", type=int, default=8, help="エレベーターの台数")
+    parser.add_argument("--floors", type=int, default=40, help="最上階")
+    parser.add_argument("--calls", type=int, default=500, help="同時に保留する呼び出しの数")
+    parser.add_argument("--rate", type=float, default=1500, help="シミュレーションの1時間あたりの呼び出し数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    args = parser.parse_args()
+    
+    # 保留中の呼び出しが多い状態での、1件あたりの割り当てと見直しの時間
+    rng = random.Random(args.seed)
+    controllers = []
+    for _ in range(args.cars):
+        elevator = Elevator(max_floor=args.floors, verbose=False)
+        elevator.set_direction(rng.choice([Direction.UP, Direction.DOWN, Direction.IDLE]))
+        controllers.append(ElevatorController(elevator, verbose=False))
+    group = GroupController(controllers)
+    directions = [Direction.UP, Direction.DOWN]
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        group.add_request(Request(rng.randint(1, args.floors), rng.choice(directions)))
+    per_call = (time.perf_counter() - start) / args.calls
+    start = time.perf_counter()
+    for car in range(args.cars):
+        group.update(car)
+    per_update = (time.perf_counter() - start) / args.cars
+    print(f"{args.cars}台, 保留中の呼び出し {group.get_pending_count()}件")
+    print(f"割り当て: {per_call * 1e6:.1f}µs/件, 1台分の見直し: {per_update * 1e6:.1f}µs")
+    
+    # 1階ずつ動きながら呼び出しを処理するときの見直し（前回の見直しで覚えた余裕が使える）
+    elapsed = 0.0
+    updates = 0
+    pending = 0
+    for _ in range(20):
+        for car, controller in enumerate(controllers):
+            elevator = controller.get_elevator()
+            floor = elevator.get_current_floor()
+            target = controller.get_next_floor()
+            if target is None:
+                continue
+            if target == floor:
+                group.complete_floor(car, floor)
+            else:
+                elevator.set_direction(Direction.UP if target > floor else Direction.DOWN)
+                elevator.step()
+            pending += group.get_pending_count()
+            start = time.perf_counter()
+            group.update(car)
+            elapsed += time.perf_counter() - start
+            updates += 1
+    if updates:
+        print(f"動きながらの見直し: {elapsed / updates * 1e6:.1f}µs"
+              f"（{updates}回, 保留中の呼び出し 平均{pending / updates:.0f}件）")
+    
+    # 同じ呼び出しを台数を変えてシミュレーション
+    requests = random_requests(1, args.rate, args.floors, args.seed)
+    for cars in sorted({1, args.cars // 2, args.cars}):
+        controllers = [ElevatorController(Elevator(args.floors, verbose=False), verbose=False)
+                       for _ in range(cars)]
+        simulation = Simulation(controllers[0] if cars == 1 else GroupController(controllers))
+        for at, request in requests:
+            simulation.add_request(at, Request(request.get_floor()))
+        start = time.perf_counter()
+        simulation.run()
+        elapsed = time.perf_counter() - start
+        waits = simulation.get_wait_times()
+        print(f"{cars:2d}台: 平均待ち時間 {sum(waits) / len(waits):6.1f}秒, 最大 {max(waits):6.1f}秒 "
+              f"（{len(waits)}件, {elapsed * 1000:.0f}ms）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+NumPy による多数のエレベーターの一括シミュレーション（モンテカルロ法）
+
+1台だけのエレベーターを多数（インスタンスごとに別々の乱数の呼び出し）同時に動かし、
+待ち時間の分布を見積もる。状態は現在階・方向・ドアの残り時間・呼び出しのある階の
+ビットマスク（uint64, ビット番号 = 階）の配列で持ち、1刻みずつまとめて進める。
+
+1刻みは1階分の移動時間で、1刻みの中では
+    1. 呼び出しの発生（インスタンスごとにポアソン分布の件数）
+    2. ドアが開いているインスタンスは、その階の呼び出しを処理してドアの残り時間を減らす
+    3. ドアが閉まっているインスタンスは、現在階に呼び出しがあればドアを開け、
+       なければ次の階を決めて1階進む
+の順に処理する。次の階は ElevatorController の規則と同じく、進行方向に呼び出しがあれば
+その方向で最も近い階、なければ最も近い階（同じ距離なら下の階）とする。
+方向は止まっている間も覚えておく。
+
+待ち時間は、呼び出しとドアを開けた記録を後でまとめて突き合わせて求める
+（呼び出しごとに、同じインスタンス・同じ階で、発生以後に最初にドアを開けた刻み）。
+
+使い方:
+    python montecarlo.py --instances 10000 --floors 20 --hours 1 --rate 120
+"""
+from typing import Any, Dict, List, Tuple
+import argparse
+import time
+
+import numpy as np
+
+
+ONE = np.uint64(1)
+UP = 1
+DOWN = -1
+IDLE = 0
+
+
+def lowest_bit(masks: np.ndarray) -> np.ndarray:
+    """0 でない各要素の最下位の1のビット番号"""
+    lowest = masks & (~masks + ONE)
+    return np.log2(lowest.astype(np.float64)).astype(np.int64)
+
+
+def highest_bit(masks: np.ndarray) -> np.ndarray:
+    """0 でない各要素の最上位の1のビット番号"""
+    bits = np.floor(np.log2(masks.astype(np.float64))).astype(np.int64)
+    # float64 への変換で 2 のべき乗に切り上がった場合を直す
+    too_high = (masks >> bits.astype(np.uint64)) == 0
+    return bits - too_high
+
+
+class BatchElevators:
+    """多数の1台だけのエレベーターを配列で表し、一括で進めるクラス"""
+    
+    def __init__(self, instances: int, max_floor: int, door_ticks: int = 2):
+        """
+        Args:
+            instances: インスタンス（エレベーター）の数
+            max_floor: 最上階（ビットマスクに収まるよう62まで）
+            door_ticks: ドアを開けている刻み数（開けた刻みを含む、1以上）
+        """
+        if not 2 <= max_floor <= 62:
+            raise ValueError("最上階は 2 から 62 です")
+        if door_ticks < 1:
+            raise ValueError("ドアを開けている刻み数は 1 以上です")
+        self._instances = instances
+        self._max_floor = max_floor
+        self._door_ticks = door_ticks
+        self._floor = np.ones(instances, dtype=np.int64)
+        self._direction = np.zeros(instances, dtype=np.int64)
+        self._door = np.zeros(instances, dtype=np.int64)
+        self._pending = np.zeros(instances, dtype=np.uint64)
+        self._tick = 0
+        # 呼び出し（インスタンス, 階, 刻み）と、ドアを開けていた記録（インスタンス, 階, 刻み）
+        self._calls: List[Tuple[np.ndarray, np.ndarray, int]] = []
+        self._services: List[Tuple[np.ndarray, np.ndarray, int]] = []
+    
+    def get_tick(self) -> int:
+        """進めた刻み数を取得"""
+        return self._tick
+    
+    def get_floors(self) -> np.ndarray:
+        """各インスタンスの現在階を取得"""
+        return self._floor.copy()
+    
+    def get_busy_count(self) -> int:
+        """呼び出しが残っているか、ドアを開けているインスタンスの数を取得"""
+        return int(((self._pending != 0) | (self._door > 0)).sum())
+    
+    def add_calls(self, instances: np.ndarray, floors: np.ndarray) -> None:
+        """呼び出しを追加（同じインスタンス・同じ階が重なってもよい）"""
+        if len(instances) == 0:
+            return
+        np.bitwise_or.at(self._pending, instances, ONE << floors.astype(np.uint64))
+        self._calls.append((instances, floors, self._tick))
+    
+    def step(self) -> None:
+        """1刻み進める"""
+        floor = self._floor
+        door = self._door
+        pending = self._pending
+        floor_bits = ONE << floor.astype(np.uint64)
+        
+        # ドアを開けているインスタンス: その階の呼び出しはすぐ乗れる
+        opened = door > 0
+        # ドアが閉まっていて現在階に呼び出しがあれば、ドアを開ける
+        closed = ~opened
+        arrive = closed & ((pending & floor_bits) != 0)
+        door[arrive] = self._door_ticks - 1
+        serving = opened | arrive
+        served = np.flatnonzero(serving & ((pending & floor_bits) != 0))
+        if len(served):
+            self._services.append((served, floor[served], self._tick))
+        pending[serving] &= ~floor_bits[serving]
+        door[opened] -= 1
+        
+        # ドアが閉まっていて呼び出しが残っているインスタンスは次の階へ1階進む
+        moving = np.flatnonzero(closed & ~arrive & (pending != 0))
+        if len(moving):
+            current = floor[moving]
+            masks = pending[moving]
+            direction = self._direction[moving]
+            above = masks & ~((ONE << (current + 1).astype(np.uint64)) - ONE)
+            below = masks & ((ONE << current.astype(np.uint64)) - ONE)
+            has_above = above != 0
+            has_below = below != 0
+            nearest_above = np.where(has_above, lowest_bit(np.where(has_above, above, ONE)), 0)
+            nearest_below = np.where(has_below, highest_bit(np.where(has_below, below, ONE)), 0)
+            # 進行方向に呼び出しがなければ最も近い階（同じ距離なら下）
+            nearest_up = has_above & (~has_below | (nearest_above - current < current - nearest_below))
+            go_up = np.where((direction == UP) & has_above, True,
+                             np.where((direction == DOWN) & has_below, False, nearest_up))
+            step = np.where(go_up, UP, DOWN)
+            self._direction[moving] = step
+            floor[moving] = current + step
+        
+        self._tick += 1
+    
+    def wait_times(self) -> Tuple[np.ndarray, int]:
+        """迎えに行った呼び出しの待ち時間（刻み数）と、まだ迎えに行っていない呼び出しの数"""
+        if not self._calls:
+            return np.zeros(0, dtype=np.int64), 0
+        span = self._tick + 1
+        
+        def combine(records):
+            instances = np.concatenate([r[0] for r in records]).astype(np.int64)
+            floors = np.concatenate([r[1] for r in records]).astype(np.int64)
+            ticks = np.concatenate([np.full(len(r[0]), r[2], dtype=np.int64) for r in records])
+            return (instances * (self._max_floor + 1) + floors) * span + ticks, ticks
+        
+        calls, call_ticks = combine(self._calls)
+        if not self._services:
+            return np.zeros(0, dtype=np.int64), len(calls)
+        services, _ = combine(self._services)
+        services.sort()
+        # 同じインスタンス・同じ階で、呼び出し以後に最初にドアを開けていた記録を探す
+        index = np.searchsorted(services, calls)
+        found = index < len(services)
+        matched = np.where(found, services[np.minimum(index, len(services) - 1)], -1)
+        found &= matched // span == calls // span
+        return matched[found] % span - call_ticks[found], int((~found).sum())
+
+
+def run_batch(instances: int, max_floor: int, hours: float, rate: float,
+              floor_time: float = 0.5, door_ticks: int = 2, seed: int = 0) -> Dict[str, Any]:
+    """多数のインスタンスを動かし、待ち時間の分布を集計する
+    
+    呼び出しは各インスタンスで1時間あたり rate 件（ポアソン分布）、階は一様に選ぶ。
+    """
+    rng = np.random.default_rng(seed)
+    batch = BatchElevators(instances, max_floor, door_ticks)
+    ticks = int(hours * 3600 / floor_time)
+    per_tick = rate / 3600 * floor_time
+    all_instances = np.arange(instances)
+    
+    start = time.perf_counter()
+    for _ in range(ticks):
+        counts = rng.poisson(per_tick, instances)
+        called = np.repeat(all_instances, counts)
+        batch.add_calls(called, rng.integers(1, max_floor + 1, len(called)))
+        batch.step()
+    # 残った呼び出しをすべて迎えに行くまで進める（新しい呼び出しは発生させない）
+    limit = ticks + 4 * max_floor * (door_ticks + 1)
+    while batch.get_tick() < limit and batch.get_busy_count():
+        batch.step()
+    elapsed = time.perf_counter() - start
+    
+    waits, unserved = batch.wait_times()
+    seconds = waits * floor_time
+    values = np.sort(seconds)
+    return {
+        "instances": instances,
+        "floors": max_floor,
+        "ticks": batch.get_tick(),
+        "calls": len(values) + unserved,
+        "unserved": unserved,
+        "mean": round(float(values.mean()), 3) if len(values) else 0.0,
+        "p50": round(float(np.percentile(values, 50)), 3) if len(values) else 0.0,
+        "p95": round(float(np.percentile(values, 95)), 3) if len(values) else 0.0,
+        "p99": round(float(np.percentile(values, 99)), 3) if len(values) else 0.0,
+        "max": round(float(values[-1]), 3) if len(values) else 0.0,
+        "seconds": round(elapsed, 3),
+        "instance_ticks_per_second": round(instances * batch.get_tick() / elapsed),
+    }
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="NumPy による多数のエレベーターの一括シミュレーション")
+    parser.add_argument("--instances", type=int, default=10000, help="同時に動かすエレベーターの数")
+    parser.add_argument("--floors", type=int, default=20, help="最上階（62まで）")
+    parser.add_argument("--hours", type=float, default=1, help="シミュレーションする時間")
+    parser.add_argument("--rate", type=float, default=120, help="1台・1時間あたりの呼び出し数")
+    parser.add_argument("--floor-time", type=float, default=0.5, help="1階分の移動にかかる秒数（1刻み）")
+    parser.add_argument("--door-ticks", type=int, default=2, help="ドアを開けている刻み数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    args = parser.parse_args()
+    
+    report = run_batch(args.instances, args.floors, args.hours, args.rate,
+                       args.floor_time, args.door_ticks, args.seed)
+    print(f"{report['instances']:,}台 × {report['ticks']:,}刻み: {report['seconds']}秒 "
+          f"({report['instance_ticks_per_second']:,} 台・刻み/秒)")
+    print(f"呼び出し {report['calls']:,}件 (未処理 {report['unserved']}件)")
+    print(f"待ち時間: 平均 {report['mean']}秒, p50 {report['p50']}秒, p95 {report['p95']}秒, "
+          f"p99 {report['p99']}秒, 最大 {report['max']}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+エレベーターのリアルタイム制御（asyncio による複数台の同時運転）
+
+エレベーター1台ごとにタスクを動かし、呼び出しは asyncio.Queue で受け取る。
+乗り場呼びはいったん共通のキューに入り、割り当て役のタスクがコスト関数で号機を選んで
+その号機のキューに渡す。号機のタスクは1階進むごと（とドアが閉まった後）にキューを
+読み出して予定に加えるので、移動中に来た呼び出しにも次の階の境目で対応できる。
+ElevatorController.process_requests のように移動中に受け付けが止まることはない。
+
+外部からは1行1コマンドのテキストプロトコルで呼び出しを送れる。
+
+クライアント → サーバー:
+    CALL <階> <up|down>     乗り場呼び
+    CAR <号機> <階>         かご呼び（行き先ボタン）
+    STATUS                  各号機の状態を送ってもらう
+    STATS                   集計をJSONで送ってもらう
+    QUIT                    接続を終える
+サーバー → クライアント:
+    OK
+    STATUS <号機>:<現在階>:<UP|DOWN|IDLE>:<予定の数> ...
+    STATS <JSON>
+    ERR <理由>
+
+使い方:
+    python realtime.py serve --cars 4 --floors 20 --speed 10
+    python realtime.py loadtest --clients 50 --calls 1000 --floors 20
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmark import percentile
+from elevator import Direction, Elevator, ElevatorController, Request
+from group import CarStatus, DispatchCost
+
+
+DIRECTION_NAMES = {"up": Direction.UP, "down": Direction.DOWN}
+
+
+class CarTask:
+    """エレベーター1台を動かすタスク"""
+    
+    def __init__(self, controller: ElevatorController, floor_time: float, door_time: float):
+        """
+        Args:
+            controller: このエレベーターの制御システム
+            floor_time: 1階分の移動にかかる秒数（実時間）
+            door_time: ドアを開けている秒数（実時間）
+        """
+        self._controller = controller
+        self._elevator = controller.get_elevator()
+        self._floor_time = floor_time
+        self._door_time = door_time
+        self._queue: "asyncio.Queue[Tuple[Request, float]]" = asyncio.Queue()
+        # キューに入っていてまだ予定に加わっていない呼び出しの、階ごとの数
+        self._queued: Dict[int, int] = {}
+        # (階, 方向) ごとの、まだ迎えに行っていない呼び出しの受付時刻（かご呼びの方向は IDLE）
+        self._waiting: Dict[Tuple[int, Direction], List[float]] = {}
+        self._load = 0
+        self._served = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+    
+    def submit(self, request: Request, at: float) -> None:
+        """呼び出しをこの号機のキューに入れる（次の階の境目で予定に加わる）"""
+        floor = request.get_floor()
+        self._queued[floor] = self._queued.get(floor, 0) + 1
+        self._waiting.setdefault((floor, request.get_direction()), []).append(at)
+        self._load += 1
+        self._queue.put_nowait((request, at))
+    
+    def is_waiting(self, floor: int, direction: Direction) -> bool:
+        """指定階・指定方向の呼び出しを、まだ迎えに行っていないかどうか"""
+        return (floor, direction) in self._waiting
+    
+    def get_load(self) -> int:
+        """まだ迎えに行っていない呼び出しの数を取得"""
+        return self._load
+    
+    def get_status(self) -> CarStatus:
+        """コスト計算に使う状態を取得（キューに入っていてまだ予定に加わっていない呼び出しも含む）"""
+        stops = self._controller.get_request_floors()
+        if self._queued:
+            stops = sorted(set(stops).union(self._queued))
+        return CarStatus(self._elevator.get_current_floor(), self._elevator.get_direction(), stops)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """現在階・方向・予定の数と、迎えに行った呼び出しの待ち時間を取得"""
+        return {
+            "floor": self._elevator.get_current_floor(),
+            "direction": self._elevator.get_direction().name,
+            "pending": len(self._controller.get_request_floors()) + self._queue.qsize(),
+            "served": self._served,
+            "mean_wait": round(self._total_wait / self._served, 3) if self._served else 0.0,
+            "max_wait": round(self._max_wait, 3),
+        }
+    
+    async def run(self) -> None:
+        """止められるまでエレベーターを動かす"""
+        controller = self._controller
+        elevator = self._elevator
+        while True:
+            self._merge()
+            next_floor = controller.get_next_floor()
+            if next_floor is None:
+                # 呼び出しが来るまで止まって待つ
+                elevator.stop()
+                request, at = await self._queue.get()
+                self._add(request, at)
+                continue
+            
+            current = elevator.get_current_floor()
+            if next_floor == current:
+                elevator.stop()
+                elevator.open_door()
+                # 受け持つ方向の呼び出しだけを処理する（反対方向は折り返してから迎えに来る）
+                direction = controller.get_service_direction(current)
+                controller.complete_floor(current, direction)
+                self._record_wait(current, direction)
+                await asyncio.sleep(self._door_time)
+                elevator.close_door()
+                continue
+            
+            elevator.set_direction(Direction.UP if next_floor > current else Direction.DOWN)
+            await asyncio.sleep(self._floor_time)
+            elevator.step()
+    
+    def _merge(self) -> None:
+        """キューにたまった呼び出しを予定に加える"""
+        queue = self._queue
+        while not queue.empty():
+            request, at = queue.get_nowait()
+            self._add(request, at)
+    
+    def _add(self, request: Request, at: float) -> None:
+        floor = request.get_floor()
+        if self._queued[floor] == 1:
+            del self._queued[floor]
+        else:
+            self._queued[floor] -= 1
+        self._controller.add_request(request)
+    
+    def _record_wait(self, floor: int, direction: Direction) -> None:
+        """かご呼びと、受け持つ方向の乗り場呼びの待ち時間を記録"""
+        now = time.perf_counter()
+        keys = [(floor, Direction.IDLE)]
+        if direction != Direction.IDLE:
+            keys.append((floor, direction))
+        for key in keys:
+            for at in self._waiting.pop(key, ()):
+                wait = now - at
+                self._load -= 1
+                self._served += 1
+                self._total_wait += wait
+                if wait > self._max_wait:
+                    self._max_wait = wait
+
+
+class RealtimeController:
+    """複数台のエレベーターを実時間で動かし、ソケットから呼び出しを受け付ける制御システム"""
+    
+    def __init__(self, cars: int = 4, max_floor: int = 20, floor_time: float = 0.5,
+                 door_time: float = 1.0, speed: float = 1.0, cost=None):
+        """
+        Args:
+            cars: エレベーターの台数
+            max_floor: 最上階
+            floor_time: 1階分の移動にかかる秒数
+            door_time: ドアを開けている秒数
+            speed: 早送りの倍率（実際に待つ時間は floor_time / speed など）
+            cost: 乗り場呼びの割り当てに使うコスト関数（省略時は DispatchCost()）
+        """
+        self._max_floor = max_floor
+        self._cars = [
+            CarTask(ElevatorController(Elevator(max_floor, verbose=False), verbose=False),
+                    floor_time / speed, door_time / speed)
+            for _ in range(cars)]
+        self._cost = cost if cost is not None else DispatchCost(floor_time, door_time)
+        self._hall_calls: "asyncio.Queue[Tuple[Request, float]]" = asyncio.Queue()
+        # (階, 方向) ごとの、乗り場呼びを割り当てた号機
+        self._assigned: Dict[Tuple[int, Direction], CarTask] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._calls = 0
+        self._connections = 0
+    
+    def get_max_floor(self) -> int:
+        """最上階を取得"""
+        return self._max_floor
+    
+    def get_car_count(self) -> int:
+        """エレベーターの台数を取得"""
+        return len(self._cars)
+    
+    def call(self, floor: int, direction: Direction) -> None:
+        """乗り場呼びを受け付ける（号機の割り当ては割り当て役のタスクが行う）"""
+        if floor == 1 and direction == Direction.DOWN:
+            raise ValueError("1階から下には行けません")
+        if floor == self._max_floor and direction == Direction.UP:
+            raise ValueError("最上階から上には行けません")
+        self._calls += 1
+        self._hall_calls.put_nowait((Request(floor, direction), time.perf_counter()))
+    
+    def car_call(self, car: int, floor: int) -> None:
+        """かご呼びを受け付ける"""
+        self._calls += 1
+        self._cars[car].submit(Request(floor), time.perf_counter())
+    
+    def get_status_line(self) -> str:
+        """STATUS 行を作る"""
+        parts = []
+        for number, car in enumerate(self._cars):
+            stats = car.get_stats()
+            parts.append(f"{number}:{stats['floor']}:{stats['direction']}:{stats['pending']}")
+        return "STATUS " + " ".join(parts)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """受け付けた呼び出しの数と、号機ごとの集計を取得"""
+        cars = [car.get_stats() for car in self._cars]
+        served = sum(stats["served"] for stats in cars)
+        total_wait = sum(stats["mean_wait"] * stats["served"] for stats in cars)
+        return {
+            "connections": self._connections,
+            "calls": self._calls,
+            "queued_hall_calls": self._hall_calls.qsize(),
+            "served": served,
+            "mean_wait": round(total_wait / served, 3) if served else 0.0,
+            "max_wait": max((stats["max_wait"] for stats in cars), default=0.0),
+            "cars": cars,
+        }
+    
+    async def start(self) -> None:
+        """号機ごとのタスクと、乗り場呼びの割り当て役のタスクを起動"""
+        self._tasks = [asyncio.create_task(car.run()) for car in self._cars]
+        self._tasks.append(asyncio.create_task(self._assign_hall_calls()))
+    
+    async def stop(self) -> None:
+        """すべてのタスクを止める"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def _assign_hall_calls(self) -> None:
+        """乗り場呼びをコストの最も小さい号機のキューに渡す
+        
+        同じ階・同じ方向の呼び出しをまだ迎えに行っていない号機があれば、その号機に渡す。
+        コストが同じなら、迎えに行っていない呼び出しの少ない号機を選ぶ。
+        """
+        cost = self._cost
+        assigned = self._assigned
+        while True:
+            request, at = await self._hall_calls.get()
+            floor, direction = request.get_floor(), request.get_direction()
+            key = (floor, direction)
+            car = assigned.get(key)
+            if car is None or not car.is_waiting(floor, direction):
+                car = min(self._cars, key=lambda candidate: (
+                    cost(candidate.get_status(), floor, direction), candidate.get_load()))
+                assigned[key] = car
+            car.submit(request, at)
+    
+    def handle(self, line: str) -> Optional[str]:
+        """1行のコマンドを処理して返事を返す（接続を終えるときは None）"""
+        parts = line.split()
+        if not parts:
+            return "ERR 空のコマンドです"
+        command = parts[0].upper()
+        try:
+            if command == "CALL" and len(parts) == 3:
+                direction = DIRECTION_NAMES.get(parts[2].lower())
+                if direction is None:
+                    return "ERR 方向は up か down です"
+                self.call(self._parse_floor(parts[1]), direction)
+                return "OK"
+            if command == "CAR" and len(parts) == 3:
+                car = int(parts[1])
+                if not 0 <= car < len(self._cars):
+                    return f"ERR 号機は 0 から {len(self._cars) - 1} です"
+                self.car_call(car, self._parse_floor(parts[2]))
+                return "OK"
+        except ValueError as e:
+            return f"ERR {e}"
+        if command == "STATUS":
+            return self.get_status_line()
+        if command == "STATS":
+            return "STATS " + json.dumps(self.get_stats(), ensure_ascii=False)
+        if command == "QUIT":
+            return None
+        return f"ERR 不明なコマンドです: {line.strip()}"
+    
+    def _parse_floor(self, text: str) -> int:
+        floor = int(text)
+        if not 1 <= floor <= self._max_floor:
+            raise ValueError(f"階は 1 から {self._max_floor} です")
+        return floor
+    
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        """1つの接続を処理"""
+        self._connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = self.handle(line.decode(errors="replace"))
+                if reply is None:
+                    break
+                writer.write((reply + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+    
+    async def serve(self, host: str = "127.0.0.1", port: int = 8766,
+                    ready: Optional[asyncio.Event] = None) -> None:
+        """エレベーターを動かし始め、止められるまで接続を受け付ける"""
+        await self.start()
+        server = await asyncio.start_server(self._handle_client, host, port, backlog=4096)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+async def _inject_client(host: str, port: int, calls: int, window: int, max_floor: int,
+                         rng: random.Random, latencies: List[float]) -> int:
+    """乗り場呼びを window 件ずつまとめて送り、返事までの時間を latencies に加える"""
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = 0
+    try:
+        while sent < calls:
+            count = min(window, calls - sent)
+            lines = []
+            for _ in range(count):
+                floor = rng.randint(1, max_floor)
+                if floor == 1:
+                    direction = "up"
+                elif floor == max_floor:
+                    direction = "down"
+                else:
+                    direction = rng.choice(("up", "down"))
+                lines.append(f"CALL {floor} {direction}\n")
+            start = time.perf_counter()
+            writer.write("".join(lines).encode())
+            await writer.drain()
+            for _ in range(count):
+                reply = (await reader.readline()).decode()
+                if not reply:
+                    raise ConnectionError("サーバーとの接続が切れました")
+                if not reply.startswith("OK"):
+                    raise RuntimeError(reply.strip())
+            latencies.extend([time.perf_counter() - start] * count)
+            sent += count
+        writer.write(b"QUIT\n")
+        await writer.drain()
+    finally:
+        writer.close()
+    return sent
+
+
+async def _request_stats(host: str, port: int) -> Dict[str, Any]:
+    """サーバーの集計を取得"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(b"STATS\nQUIT\n")
+        await writer.drain()
+        line = (await reader.readline()).decode()
+    finally:
+        writer.close()
+    return json.loads(line.partition(" ")[2])
+
+
+async def run_load_test(host: str, port: int, clients: int, calls: int, window: int = 16,
+                        max_floor: int = 20, seed: int = 0) -> Dict[str, Any]:
+    """多数のクライアントから乗り場呼びを送り、受け付けの速さと応答時間を集計する"""
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    start = time.perf_counter()
+    sent = await asyncio.gather(*[
+        _inject_client(host, port, calls, window, max_floor,
+                       random.Random(rng.getrandbits(32)), latencies)
+        for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    
+    values = sorted(latencies)
+    return {
+        "clients": clients,
+        "calls": sum(sent),
+        "elapsed": round(elapsed, 3),
+        "calls_per_second": round(sum(sent) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        "server": await _request_stats(host, port),
+    }
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="エレベーターのリアルタイム制御")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    serve = subparsers.add_parser("serve", help="エレベーターを動かして呼び出しを受け付ける")
+    serve.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    serve.add_argument("--port", type=int, default=8766, help="待ち受けるポート")
+    serve.add_argument("--cars", type=int, default=4, help="エレベーターの台数")
+    serve.add_argument("--floors", type=int, default=20, help="最上階")
+    serve.add_argument("--floor-time", type=float, default=0.5, help="1階分の移動にかかる秒数")
+    serve.add_argument("--door-time", type=float, default=1.0, help="ドアを開けている秒数")
+    serve.add_argument("--speed", type=float, default=1.0, help="早送りの倍率")
+    
+    loadtest = subparsers.add_parser("loadtest", help="乗り場呼びを大量に送る")
+    loadtest.add_argument("--host", default="127.0.0.1", help="サーバーのアドレス")
+    loadtest.add_argument("--port", type=int, default=8766, help="サーバーのポート")
+    loadtest.add_argument("--clients", type=int, default=20, help="同時に接続するクライアント数")
+    loadtest.add_argument("--calls", type=int, default=500, help="クライアントごとの呼び出し数")
+    loadtest.add_argument("--window", type=int, default=16, help="返事を待たずに送る呼び出しの数")
+    loadtest.add_argument("--floors", type=int, default=20, help="最上階")
+    loadtest.add_argument("--seed", type=int, default=0, help="乱数の種")
+    loadtest.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    
+    args = parser.parse_args()
+    
+    if args.command == "serve":
+        async def serve():
+            controller = RealtimeController(args.cars, args.floors, args.floor_time,
+                                            args.door_time, args.speed)
+            await controller.serve(args.host, args.port)
+        
+        print(f"{args.host}:{args.port} で待ち受けています。")
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        return
+    
+    report = asyncio.run(run_load_test(args.host, args.port, args.clients, args.calls,
+                                       args.window, args.floors, args.seed))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        server = report["server"]
+        print(f"{report['clients']}クライアント, {report['calls']}件, {report['elapsed']}秒 "
+              f"({report['calls_per_second']:,.0f} 件/秒)")
+        print(f"応答時間: p50 {report['p50_ms']}ms, p99 {report['p99_ms']}ms, "
+              f"最大 {report['max_ms']}ms")
+        print(f"サーバー: 受付 {server['calls']}件, 迎えに行った呼び出し {server['served']}件, "
+              f"平均待ち時間 {server['mean_wait']}秒")
+
+
+if __name__ == "__main__":
+    main()
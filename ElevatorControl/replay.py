@@ -0,0 +1,225 @@
+"""
+記録された呼び出しログ（トレース）の再生
+
+実際の建物で記録した呼び出しを、ファイルから1件ずつ読みながらシミュレーションに流す。
+読み込み・時間の圧縮・並べ替え・リクエストへの変換はジェネレーターをつないだ
+パイプラインで、シミュレーションは次の1件だけをヒープに置いて、その時刻になったら
+続きを読む（Simulation.add_stream）。ファイル全体を読み込む手順がないので、
+何GBもある1か月分のトレースでも、使うメモリは件数によらずほぼ一定になる。
+
+トレースの1件は (時刻, 階, 方向, 目的階) で、方向は 1 が上・-1 が下・0 が指定なし、
+目的階は 0 なら不明（乗り場呼びだけ）。目的階があれば乗客として再生する。
+
+ファイルの形式（拡張子が .csv なら CSV、それ以外はバイナリ）:
+    CSV: 見出し行 "time,floor,direction,destination" の後に1行1件
+         （direction は up / down / 空、destination は空でもよい）
+    バイナリ: 先頭8バイトの MAGIC の後に、RECORD（リトルエンディアンの
+         float64 の時刻, int16 の階, int16 の目的階, int8 の方向、13バイト）が続く
+
+使い方:
+    python replay.py generate --floors 20 --pattern lunch --days 30 --rate 1200 --output month.trace
+    python replay.py run month.trace --floors 20 --cars 4 --compress 10 --max-gap 60
+"""
+from typing import Iterable, Iterator, Optional, Tuple, Union
+import argparse
+import csv
+import heapq
+import struct
+import time
+
+from elevator import Direction, Elevator, ElevatorController, Passenger, Request
+from group import DispatchCost, GroupController
+from simulation import Simulation
+from telemetry import Telemetry
+from traffic import PATTERNS, TrafficGenerator
+
+
+# トレースの1件: (時刻, 階, 方向, 目的階)
+TraceRecord = Tuple[float, int, int, int]
+
+# バイナリ形式の先頭と1件の形
+MAGIC = b"ELVTRC1\n"
+RECORD = struct.Struct("<dhhb")
+# バイナリ形式を一度に読む件数
+CHUNK_RECORDS = 8192
+
+DIRECTIONS = {1: Direction.UP, -1: Direction.DOWN, 0: Direction.IDLE}
+CSV_DIRECTIONS = {"up": 1, "down": -1, "": 0}
+CSV_NAMES = {1: "up", -1: "down", 0: ""}
+
+
+def read_csv_trace(path: str) -> Iterator[TraceRecord]:
+    """CSV 形式のトレースを1件ずつ読む"""
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header != ["time", "floor", "direction", "destination"]:
+            raise ValueError(f"CSV の見出しが正しくありません: {path}")
+        for row in reader:
+            at, floor, direction, destination = row
+            yield float(at), int(floor), CSV_DIRECTIONS[direction], int(destination or 0)
+
+
+def read_binary_trace(path: str) -> Iterator[TraceRecord]:
+    """バイナリ形式のトレースを、CHUNK_RECORDS 件ずつ読んで1件ずつ返す"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"トレースのファイルではありません: {path}")
+        size = RECORD.size * CHUNK_RECORDS
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            if len(chunk) % RECORD.size:
+                raise ValueError(f"トレースの末尾が途中で切れています: {path}")
+            for at, floor, destination, direction in RECORD.iter_unpack(chunk):
+                yield at, floor, direction, destination
+
+
+def read_trace(path: str) -> Iterator[TraceRecord]:
+    """拡張子で形式を選んでトレースを読む"""
+    if path.endswith(".csv"):
+        return read_csv_trace(path)
+    return read_binary_trace(path)
+
+
+def write_trace(path: str, records: Iterable[TraceRecord]) -> int:
+    """トレースを書き出す（拡張子が .csv なら CSV、それ以外はバイナリ）。書いた件数を返す"""
+    count = 0
+    if path.endswith(".csv"):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "floor", "direction", "destination"])
+            for at, floor, direction, destination in records:
+                writer.writerow([f"{at:.3f}", floor, CSV_NAMES[direction], destination or ""])
+                count += 1
+        return count
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for at, floor, direction, destination in records:
+            f.write(RECORD.pack(at, floor, destination, direction))
+            count += 1
+    return count
+
+
+def compress_time(records: Iterable[TraceRecord], factor: float = 1.0,
+                  max_gap: Optional[float] = None) -> Iterator[TraceRecord]:
+    """時間を圧縮する
+    
+    最初の1件を時刻 0 にそろえ、間隔を factor 分の1にする。max_gap を指定すると、
+    それより長い間隔（夜間など呼び出しのない時間）は max_gap に詰める（圧縮した後の秒数）。
+    """
+    if factor <= 0:
+        raise ValueError("圧縮の倍率は正の数です")
+    previous = None
+    shifted = 0.0
+    for at, floor, direction, destination in records:
+        if previous is not None:
+            gap = (at - previous) / factor
+            if max_gap is not None and gap > max_gap:
+                gap = max_gap
+            shifted += gap
+        previous = at
+        yield shifted, floor, direction, destination
+
+
+def reorder(records: Iterable[TraceRecord], window: int = 1024) -> Iterator[TraceRecord]:
+    """前後の window 件の範囲で入れ替わった記録を、時刻の順に並べ直す"""
+    heap = []
+    sequence = 0
+    for record in records:
+        heapq.heappush(heap, (record[0], sequence, record))
+        sequence += 1
+        if len(heap) > window:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def to_calls(records: Iterable[TraceRecord]) -> Iterator[Tuple[float, Union[Request, Passenger]]]:
+    """記録を (時刻, リクエストか乗客) にする（目的階があれば乗客）"""
+    for at, floor, direction, destination in records:
+        if destination:
+            yield at, Passenger(floor, destination, at)
+        else:
+            yield at, Request(floor, DIRECTIONS[direction])
+
+
+def generate_records(generator: TrafficGenerator, days: int, rate: float,
+                     seed: int = 0) -> Iterator[TraceRecord]:
+    """交通パターンから、1日分ずつ乗客の列を作って記録にする（試験用のトレース）"""
+    for day in range(days):
+        offset = day * 86400.0
+        for passenger in generator.generate(24, rate, seed + day):
+            direction = 1 if passenger.get_direction() == Direction.UP else -1
+            yield (offset + passenger.get_arrival_time(), passenger.get_origin(),
+                   direction, passenger.get_destination())
+
+
+def replay(path: str, floors: int, cars: int, factor: float = 1.0,
+           max_gap: Optional[float] = None, window: int = 0,
+           floor_time: float = 0.5, door_time: float = 1.0) -> Tuple[Simulation, Telemetry]:
+    """トレースを再生する（待ち時間などは Telemetry に集計し、一覧は持たない）"""
+    controllers = [ElevatorController(Elevator(max_floor=floors, verbose=False), verbose=False)
+                   for _ in range(cars)]
+    if cars == 1:
+        controller = controllers[0]
+    else:
+        controller = GroupController(controllers, DispatchCost(floor_time, door_time))
+    telemetry = Telemetry()
+    simulation = Simulation(controller, floor_time=floor_time, door_time=door_time,
+                            telemetry=telemetry, history=False)
+    records = read_trace(path)
+    if window:
+        records = reorder(records, window)
+    simulation.add_stream(to_calls(compress_time(records, factor, max_gap)))
+    simulation.run()
+    return simulation, telemetry
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="記録された呼び出しログの再生")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="交通パターンから試験用のトレースを作る")
+    generate.add_argument("--floors", type=int, default=20, help="最上階")
+    generate.add_argument("--pattern", choices=sorted(PATTERNS), default="lunch", help="交通パターン")
+    generate.add_argument("--days", type=int, default=1, help="日数")
+    generate.add_argument("--rate", type=float, default=1200, help="1時間あたりの乗客数")
+    generate.add_argument("--seed", type=int, default=0, help="乱数の種")
+    generate.add_argument("--output", required=True, help="書き出すファイル（.csv かバイナリ）")
+    run = commands.add_parser("run", help="トレースを再生する")
+    run.add_argument("trace", help="トレースのファイル（.csv かバイナリ）")
+    run.add_argument("--floors", type=int, default=20, help="最上階")
+    run.add_argument("--cars", type=int, default=4, help="エレベーターの台数")
+    run.add_argument("--compress", type=float, default=1.0, help="時間の圧縮の倍率")
+    run.add_argument("--max-gap", type=float, default=None, help="呼び出しの間隔の上限（圧縮後の秒数）")
+    run.add_argument("--window", type=int, default=0, help="時刻の順に並べ直す範囲の件数（0 なら並べ直さない）")
+    run.add_argument("--floor-time", type=float, default=0.5, help="1階分の移動にかかる秒数")
+    run.add_argument("--door-time", type=float, default=1.0, help="ドアを開けている秒数")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    if args.command == "generate":
+        generator = TrafficGenerator(args.floors, args.pattern)
+        count = write_trace(args.output, generate_records(generator, args.days, args.rate, args.seed))
+        print(f"{count:,}件を {args.output} に書き出しました。（{time.perf_counter() - start:.1f}秒）")
+        return
+    
+    simulation, telemetry = replay(args.trace, args.floors, args.cars, args.compress, args.max_gap,
+                                   args.window, args.floor_time, args.door_time)
+    elapsed = time.perf_counter() - start
+    counters = telemetry.get_counters()
+    wait = telemetry.get_histogram("wait")
+    print(f"呼び出し {counters['call']:,}件, 仮想時間 {simulation.get_time() / 3600:,.1f}時間, "
+          f"実時間 {elapsed:.1f}秒 ({counters['call'] / elapsed:,.0f}件/秒)")
+    print(f"待ち時間: 平均 {wait.get_mean():.1f}秒, p50 {wait.percentile(0.5):.1f}秒, "
+          f"p95 {wait.percentile(0.95):.1f}秒, p99 {wait.percentile(0.99):.1f}秒, "
+          f"最大 {wait.get_max():.1f}秒")
+    journey = telemetry.get_histogram("journey")
+    if journey.get_count():
+        print(f"所要時間: 平均 {journey.get_mean():.1f}秒, p95 {journey.percentile(0.95):.1f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""
+エレベーターの離散事象シミュレーション（仮想時間）
+
+time.sleep で待つ代わりに、事象（階への到着・ドアの開閉・リクエストや乗客の発生）を
+発生時刻の順にヒープへ積んで処理する。次に向かう階の判断は
+ElevatorController の get_next_floor / complete_floor をそのまま使う。
+GroupController を渡せば、複数台のエレベーターを同時に動かす。
+乗客（Passenger）を渡すと、乗り場呼びで迎えに行き、乗った後は目的階への
+行き先呼びを乗ったエレベーターに追加して、降りるまでを追跡する。
+ドアを開けたエレベーターは、受け持つ方向（ElevatorController.get_service_direction）の
+乗り場呼びだけを処理し、その方向に行く乗客だけを乗せる。反対方向の乗客は待ち続ける。
+定員を決めた場合、満員で乗れなかった乗客はドアが閉まった後で呼び直す。
+行先階予約（DestinationDispatcher）では、乗客は割り当てられた号機にだけ乗る。
+Telemetry を渡すと、呼び出し・割り当て・乗車・降車の時刻を記録する。
+add_stream に時刻順のイテレーターを渡すと、次の1件だけをヒープに置いて少しずつ読む。
+
+使い方:
+    python simulation.py --hours 24 --rate 120
+    python simulation.py --floors 120 --rate 2000 --scheduler scan
+    python simulation.py --demo --realtime --speed 2
+    python simulation.py --hours 24 --rate 120 --telemetry events.jsonl
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import argparse
+import heapq
+import random
+import time
+
+from elevator import (Direction, Elevator, ElevatorController, LookScheduler, Passenger,
+                      Request, ScanScheduler)
+from telemetry import JsonlSink, Telemetry
+
+
+# 事象の種類
+FLOOR_ARRIVAL = "floor_arrival"
+DOOR_OPEN = "door_open"
+DOOR_CLOSE = "door_close"
+REQUEST_ARRIVAL = "request_arrival"
+PASSENGER_ARRIVAL = "passenger_arrival"
+STREAM_ARRIVAL = "stream_arrival"
+
+# コマンドラインで選べるスケジューラー
+SCHEDULERS = {"look": LookScheduler, "scan": ScanScheduler}
+
+
+class Simulation:
+    """エレベーターを仮想時間で動かすシミュレーション"""
+    
+    def __init__(self, controller, floor_time: float = 0.5,
+                 door_time: float = 1.0, realtime: bool = False, speed: float = 1.0,
+                 capacity: Optional[int] = None, transfer_time: float = 0.0,
+                 telemetry: Optional[Telemetry] = None, history: bool = True):
+        """
+        Args:
+            controller: 制御システム（ElevatorController か、複数台なら GroupController）
+            floor_time: 1階分の移動にかかる秒数
+            door_time: ドアを開けている秒数
+            realtime: 仮想時間に合わせて実際に待つかどうか（デモ用）
+            speed: 実時間で待つときの早送りの倍率
+            capacity: 1台の定員（省略時は制限なし）
+            transfer_time: 乗客1人が乗り降りするごとにドアを開けておく時間を延ばす秒数
+            telemetry: 呼び出しごとの時刻を記録する計測（省略時は記録しない）
+            history: 待ち時間と降りた乗客の一覧を残すかどうか（長い再生では False にして
+                telemetry で集計すると、使うメモリが件数によらなくなる）
+        """
+        if isinstance(controller, ElevatorController):
+            self._group = None
+            self._controllers = [controller]
+        else:
+            self._group = controller
+            self._controllers = controller.get_controllers()
+        self._elevators = [c.get_elevator() for c in self._controllers]
+        self._floor_time = floor_time
+        self._door_time = door_time
+        self._realtime = realtime
+        self._speed = speed
+        self._capacity = capacity
+        self._transfer_time = transfer_time
+        self._telemetry = telemetry
+        self._history = history
+        
+        # (発生時刻, 通し番号, 種類, データ) のヒープ（データはエレベーターの番号かリクエスト）
+        self._events: List[Tuple[float, int, str, Any]] = []
+        self._sequence = 0
+        self._now = 0.0
+        self._event_count = 0
+        self._decision_count = 0
+        # エレベーターごとに、移動中かドアを開けているあいだは True
+        self._busy = [False] * len(self._controllers)
+        # ドアを開けているあいだの、エレベーターごとの受け持つ方向
+        self._serving = [Direction.IDLE] * len(self._controllers)
+        # (階, 方向) ごとの、まだ迎えに行っていないリクエストと発生時刻
+        self._waiting: Dict[Tuple[int, Direction], List[Tuple[float, Request]]] = {}
+        self._wait_times: List[float] = []
+        # (階, 方向) ごとの乗り場で待っている乗客と、エレベーターごとの乗っている乗客
+        self._hall: Dict[Tuple[int, Direction], List[Passenger]] = {}
+        self._riders: List[List[Passenger]] = [[] for _ in self._controllers]
+        # (エレベーターの番号, 階, 方向) ごとの、号機を割り当てられて待っている乗客
+        self._assigned: Dict[Tuple[int, int, Direction], List[Passenger]] = {}
+        self._delivered: List[Passenger] = []
+        self._handlers = {
+            FLOOR_ARRIVAL: self._on_floor_arrival,
+            DOOR_OPEN: self._on_door_open,
+            DOOR_CLOSE: self._on_door_close,
+            REQUEST_ARRIVAL: self._on_request_arrival,
+            PASSENGER_ARRIVAL: self._on_passenger_arrival,
+            STREAM_ARRIVAL: self._on_stream_arrival,
+        }
+        if telemetry is not None and self._group is not None:
+            self._group.set_reassign_handler(self._on_reassign)
+    
+    def schedule(self, at: float, kind: str, data: Any = None) -> None:
+        """事象を指定時刻に予約"""
+        heapq.heappush(self._events, (at, self._sequence, kind, data))
+        self._sequence += 1
+    
+    def add_request(self, at: float, request: Request) -> None:
+        """指定時刻にリクエストが発生するよう予約"""
+        self.schedule(at, REQUEST_ARRIVAL, request)
+    
+    def add_passenger(self, passenger: Passenger) -> None:
+        """乗客が乗り場に着くよう予約"""
+        self.schedule(passenger.get_arrival_time(), PASSENGER_ARRIVAL, passenger)
+    
+    def add_stream(self, calls: Iterable[Tuple[float, Union[Request, Passenger]]]) -> None:
+        """(時刻, リクエストか乗客) を時刻の順に返すイテレーターから、少しずつ読んで発生させる"""
+        self._schedule_next(iter(calls))
+    
+    def run(self, until: Optional[float] = None) -> None:
+        """事象がなくなるか指定時刻を過ぎるまで進める"""
+        events = self._events
+        handlers = self._handlers
+        wall_start = time.perf_counter() - self._now / self._speed
+        while events:
+            if until is not None and events[0][0] > until:
+                self._now = until
+                break
+            at, _, kind, data = heapq.heappop(events)
+            if self._realtime:
+                delay = wall_start + at / self._speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self._now = at
+            self._event_count += 1
+            handlers[kind](data)
+    
+    def get_time(self) -> float:
+        """現在の仮想時刻（秒）を取得"""
+        return self._now
+    
+    def get_event_count(self) -> int:
+        """処理した事象の数を取得"""
+        return self._event_count
+    
+    def get_decision_count(self) -> int:
+        """次に止まる階を判断した回数を取得"""
+        return self._decision_count
+    
+    def get_delivered_passengers(self) -> List[Passenger]:
+        """目的階で降りた乗客の一覧を取得（降りた順）"""
+        return list(self._delivered)
+    
+    def get_wait_times(self) -> List[float]:
+        """迎えに行ったリクエストの待ち時間（発生からドアが開くまでの秒数）の一覧を取得"""
+        return list(self._wait_times)
+    
+    def get_pending_count(self) -> int:
+        """まだ迎えに行っていないリクエストの数を取得"""
+        return sum(len(requests) for requests in self._waiting.values())
+    
+    def _schedule_next(self, calls: Iterator[Tuple[float, Union[Request, Passenger]]]) -> None:
+        """イテレーターの次の1件を予約（なければ何もしない）"""
+        item = next(calls, None)
+        if item is None:
+            return
+        if item[0] < self._now:
+            raise ValueError(f"時刻が逆戻りしています: {item[0]} < {self._now}")
+        self.schedule(item[0], STREAM_ARRIVAL, (item[1], calls))
+    
+    def _on_stream_arrival(self, data: Tuple[Union[Request, Passenger], Iterator]) -> None:
+        """イテレーターから読んだリクエストか乗客の発生（続きの1件を予約する）"""
+        call, calls = data
+        if isinstance(call, Passenger):
+            self._on_passenger_arrival(call)
+        else:
+            self._on_request_arrival(call)
+        self._schedule_next(calls)
+    
+    def _on_request_arrival(self, request: Request) -> None:
+        """リクエストの発生"""
+        floor = request.get_floor()
+        direction = request.get_direction()
+        telemetry = self._telemetry
+        if telemetry is not None:
+            telemetry.call(request, self._now, floor)
+        for car, elevator in enumerate(self._elevators):
+            if (elevator.is_door_open() and elevator.get_current_floor() == floor
+                    and (direction == Direction.IDLE or self._accepts(car, floor, direction))):
+                # ドアが開いていて、同じ方向に行くエレベーターにはその場で乗れる
+                if self._history:
+                    self._wait_times.append(0.0)
+                if telemetry is not None:
+                    telemetry.assign(request, self._now, car)
+                    telemetry.pickup(request, self._now, car, floor, done=True)
+                return
+        self._waiting.setdefault((floor, direction), []).append((self._now, request))
+        car = self._call(request)
+        if telemetry is not None:
+            telemetry.assign(request, self._now, car)
+    
+    def _on_passenger_arrival(self, passenger: Passenger) -> None:
+        """乗客が乗り場に着いた"""
+        floor = passenger.get_origin()
+        direction = passenger.get_direction()
+        telemetry = self._telemetry
+        if telemetry is not None:
+            telemetry.call(passenger, self._now, floor)
+        car = self._group.assign_passenger(passenger) if self._group is not None else None
+        if car is not None:
+            if telemetry is not None:
+                telemetry.assign(passenger, self._now, car)
+            # 割り当てられた号機が来るまで待つ（ドアが開いていても、開け直してから乗る）
+            self._assigned.setdefault((car, floor, direction), []).append(passenger)
+            if not self._busy[car]:
+                self._dispatch(car)
+            return
+        
+        full = False
+        for car, elevator in enumerate(self._elevators):
+            if (elevator.is_door_open() and elevator.get_current_floor() == floor
+                    and self._accepts(car, floor, direction)):
+                if self._has_room(car):
+                    if telemetry is not None:
+                        telemetry.assign(passenger, self._now, car)
+                    self._board(car, passenger)
+                    return
+                full = True
+        self._hall.setdefault((floor, direction), []).append(passenger)
+        if not full:
+            # 同じ方向に行く満員のエレベーターがいるときは、ドアが閉まった後で呼び出す
+            car = self._call(Request(floor, direction))
+            if telemetry is not None:
+                telemetry.assign(passenger, self._now, car)
+    
+    def _on_reassign(self, request: Request, car: int) -> None:
+        """群管理が乗り場呼びを付け替えた（その乗り場で待っているリクエストと乗客の号機が変わる）"""
+        key = (request.get_floor(), request.get_direction())
+        for _, waiting in self._waiting.get(key, ()):
+            self._telemetry.assign(waiting, self._now, car)
+        for passenger in self._hall.get(key, ()):
+            self._telemetry.assign(passenger, self._now, car)
+    
+    def _call(self, request: Request) -> int:
+        """乗り場呼びをエレベーターに割り当て、止まっていれば動かす（割り当てた号機を返す）"""
+        if self._group is None:
+            car = 0
+            self._controllers[0].add_request(request)
+        else:
+            car = self._group.add_request(request)
+        if not self._busy[car]:
+            self._dispatch(car)
+        return car
+    
+    def _accepts(self, car: int, floor: int, direction: Direction) -> bool:
+        """ドアを開けているエレベーターが、指定方向に行く乗客を乗せられるかどうか
+        
+        受け持つ方向が決まっていなければ、その方向を受け持つことにする。
+        """
+        serving = self._serving[car]
+        if serving == Direction.IDLE:
+            self._complete_floor(car, floor, direction)
+            return True
+        return serving == direction
+    
+    def _complete_floor(self, car: int, floor: int, direction: Direction) -> None:
+        """指定階の行き先呼びと、受け持つ方向の乗り場呼びを処理済みにする"""
+        self._serving[car] = direction
+        if self._group is None:
+            self._controllers[car].complete_floor(floor, direction)
+        else:
+            self._group.complete_floor(car, floor, direction)
+    
+    def _service_direction(self, car: int, floor: int) -> Direction:
+        """ドアを開けたエレベーターが受け持つ方向を決める
+        
+        呼び出しから決まらなければ、待っている乗客のうち最も早く着いた人の方向。
+        """
+        if self._group is None:
+            direction = self._controllers[car].get_service_direction(floor)
+        else:
+            direction = self._group.get_service_direction(car, floor)
+        if direction != Direction.IDLE:
+            return direction
+        earliest = None
+        for candidate in (Direction.UP, Direction.DOWN):
+            for queue in (self._assigned.get((car, floor, candidate)),
+                          self._hall.get((floor, candidate))):
+                if queue and (earliest is None or queue[0].get_arrival_time() < earliest):
+                    direction, earliest = candidate, queue[0].get_arrival_time()
+        return direction
+    
+    def _board_all(self, car: int, queues: Dict[Any, List[Passenger]], key: Any) -> None:
+        """待っている乗客を、定員まで先着順に乗せる"""
+        queue = queues.pop(key, None)
+        if not queue:
+            return
+        room = len(queue)
+        if self._capacity is not None:
+            room = max(0, min(room, self._capacity - len(self._riders[car])))
+        for passenger in queue[:room]:
+            self._board(car, passenger)
+        if room < len(queue):
+            queues[key] = queue[room:]
+    
+    def _has_room(self, car: int) -> bool:
+        """定員に余裕があるかどうか"""
+        return self._capacity is None or len(self._riders[car]) < self._capacity
+    
+    def _board(self, car: int, passenger: Passenger) -> None:
+        """乗客を乗せて、目的階の行き先呼びを追加する"""
+        passenger.board(self._now)
+        self._riders[car].append(passenger)
+        self._controllers[car].add_request(Request(passenger.get_destination()))
+        if self._telemetry is not None:
+            self._telemetry.pickup(passenger, self._now, car, passenger.get_origin())
+    
+    def _dispatch(self, car: int) -> None:
+        """停止中のエレベーターを次の階へ向かわせる"""
+        self._decision_count += 1
+        next_floor = self._controllers[car].get_next_floor()
+        if next_floor is None and self._group is not None and self._group.update(car):
+            # 止まったエレベーターが他から呼び出しを引き取った
+            next_floor = self._controllers[car].get_next_floor()
+        if next_floor is None:
+            self._busy[car] = False
+            return
+        self._busy[car] = True
+        elevator = self._elevators[car]
+        current = elevator.get_current_floor()
+        if next_floor == current:
+            self.schedule(self._now, DOOR_OPEN, car)
+            return
+        elevator.set_direction(Direction.UP if next_floor > current else Direction.DOWN)
+        self.schedule(self._now + self._floor_time, FLOOR_ARRIVAL, car)
+    
+    def _on_floor_arrival(self, car: int) -> None:
+        """1階分の移動が終わった（次の階をここで判断し直す）"""
+        elevator = self._elevators[car]
+        controller = self._controllers[car]
+        elevator.step()
+        if self._group is not None:
+            self._group.update(car)
+        current = elevator.get_current_floor()
+        self._decision_count += 1
+        next_floor = controller.get_next_floor()
+        if next_floor == current:
+            elevator.stop()
+            self.schedule(self._now, DOOR_OPEN, car)
+        elif next_floor is None:
+            elevator.stop()
+            self._dispatch(car)
+        else:
+            elevator.set_direction(Direction.UP if next_floor > current else Direction.DOWN)
+            self.schedule(self._now + self._floor_time, FLOOR_ARRIVAL, car)
+    
+    def _on_door_open(self, car: int) -> None:
+        """ドアを開けて、この階のリクエストを処理済みにする"""
+        elevator = self._elevators[car]
+        elevator.open_door()
+        floor = elevator.get_current_floor()
+        direction = self._service_direction(car, floor)
+        self._complete_floor(car, floor, direction)
+        telemetry = self._telemetry
+        for key in ((floor, Direction.IDLE), (floor, direction)):
+            for arrived, request in self._waiting.pop(key, ()):
+                if self._history:
+                    self._wait_times.append(self._now - arrived)
+                if telemetry is not None:
+                    telemetry.pickup(request, self._now, car, floor, done=True)
+            if direction == Direction.IDLE:
+                break
+        
+        riders = self._riders[car]
+        alighted = 0
+        if riders:
+            staying = []
+            for passenger in riders:
+                if passenger.get_destination() == floor:
+                    passenger.alight(self._now)
+                    if self._history:
+                        self._delivered.append(passenger)
+                    if telemetry is not None:
+                        telemetry.dropoff(passenger, self._now, car, floor)
+                else:
+                    staying.append(passenger)
+            alighted = len(riders) - len(staying)
+            self._riders[car] = staying
+        before = len(self._riders[car])
+        if direction != Direction.IDLE:
+            self._board_all(car, self._assigned, (car, floor, direction))
+            self._board_all(car, self._hall, (floor, direction))
+        transfers = alighted + len(self._riders[car]) - before
+        self.schedule(self._now + self._door_time + transfers * self._transfer_time, DOOR_CLOSE, car)
+    
+    def _on_door_close(self, car: int) -> None:
+        """ドアを閉めて、次の階へ向かう（乗り切れなかった乗客がいれば呼び直す）"""
+        elevator = self._elevators[car]
+        elevator.close_door()
+        self._serving[car] = Direction.IDLE
+        self._dispatch(car)
+        floor = elevator.get_current_floor()
+        for direction in (Direction.UP, Direction.DOWN):
+            waiting = self._hall.get((floor, direction))
+            if waiting:
+                called = self._call(Request(floor, direction))
+                if self._telemetry is not None:
+                    # 満員で呼び出しを待っていた乗客は、ここで初めて号機が決まる
+                    for passenger in waiting:
+                        self._telemetry.assign(passenger, self._now, called)
+            if self._assigned.get((car, floor, direction)):
+                # 割り当てられた乗客は同じ号機を待つ
+                self._controllers[car].add_request(Request(floor, direction))
+
+
+def random_requests(hours: float, rate: float, max_floor: int,
+                    seed: int = 0) -> List[Tuple[float, Request]]:
+    """1時間あたり rate 件の割合で、ランダムな階のリクエストを発生させる"""
+    rng = random.Random(seed)
+    requests = []
+    at = rng.expovariate(rate / 3600)
+    while at < hours * 3600:
+        requests.append((at, Request(rng.randint(1, max_floor))))
+        at += rng.expovariate(rate / 3600)
+    return requests
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="エレベーターの離散事象シミュレーション")
+    parser.add_argument("--hours", type=float, default=24, help="シミュレーションする時間")
+    parser.add_argument("--rate", type=float, default=120, help="1時間あたりのリクエスト数")
+    parser.add_argument("--floors", type=int, default=10, help="最上階")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    parser.add_argument("--scheduler", choices=sorted(SCHEDULERS), default="look", help="次に止まる階を決める方式")
+    parser.add_argument("--demo", action="store_true", help="elevator.py と同じ4件のリクエストを表示付きで実行")
+    parser.add_argument("--realtime", action="store_true", help="仮想時間に合わせて実際に待つ")
+    parser.add_argument("--speed", type=float, default=1.0, help="実時間で待つときの早送りの倍率")
+    parser.add_argument("--telemetry", default=None, help="呼び出しごとの事象を書き出すJSONLファイル")
+    args = parser.parse_args()
+    
+    elevator = Elevator(max_floor=args.floors, verbose=args.demo)
+    controller = ElevatorController(elevator, verbose=args.demo,
+                                    scheduler=SCHEDULERS[args.scheduler]())
+    telemetry = Telemetry(JsonlSink(args.telemetry)) if args.telemetry else None
+    simulation = Simulation(controller, realtime=args.realtime, speed=args.speed,
+                            telemetry=telemetry)
+    
+    if args.demo:
+        requests = [(0.0, Request(floor)) for floor in (5, 3, 7, 2)]
+    else:
+        requests = random_requests(args.hours, args.rate, args.floors, args.seed)
+    for at, request in requests:
+        simulation.add_request(at, request)
+    
+    start = time.perf_counter()
+    simulation.run()
+    elapsed = time.perf_counter() - start
+    
+    waits = simulation.get_wait_times()
+    print(f"\n仮想時間: {simulation.get_time():,.1f}秒, 実時間: {elapsed * 1000:,.1f}ms, "
+          f"事象: {simulation.get_event_count():,}件")
+    if waits:
+        print(f"リクエスト: {len(waits)}件, 平均待ち時間: {sum(waits) / len(waits):.1f}秒, "
+              f"最大: {max(waits):.1f}秒")
+    if telemetry is not None:
+        telemetry.close()
+        wait = telemetry.get_histogram("wait")
+        print(f"計測: {telemetry.get_counters()}, 待ち時間 p50 {wait.percentile(0.5):.1f}秒, "
+              f"p95 {wait.percentile(0.95):.1f}秒, p99 {wait.percentile(0.99):.1f}秒 "
+              f"（{args.telemetry} に書き出しました）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+エレベーターのシミュレーションのパラメーター探索（複数プロセスで並列実行）
+
+パラメーターの組み合わせ（グリッド）ごとに独立したシミュレーションを
+ProcessPoolExecutor で実行し、終わった順に CSV か JSONL に1行ずつ書き出す。
+各回の乱数の種はパラメーターの値と --seed から決まるので、実行順や
+プロセス数によらず同じ結果になる。ワーカーにはパラメーターだけを渡し、
+乗客の列はワーカーの中で作るので、プロセス間でやり取りするデータは小さい。
+
+使い方:
+    python sweep.py --param cars=2,4,8 --param scheduler=look,scan --output sweep.csv
+    python sweep.py --param floor_time=0.3,0.5 --param door_time=1,2 --replicates 5 --output sweep.jsonl
+    python sweep.py --param dispatch=conventional,destination --param capacity=12 --param rate=800,1400 \
+        --param pattern=up_peak --param floor_time=1.5 --param door_time=4 --param transfer_time=1
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from typing import Any, Dict, Iterator, List, Optional
+import argparse
+import csv
+import json
+import os
+import time
+import zlib
+
+from benchmark import DISPATCHES, SCHEDULERS, run_one
+from traffic import PATTERNS, TrafficGenerator
+
+
+# パラメーターの既定値（--param で値の一覧に置き換える。capacity の 0 は定員なし）
+DEFAULTS: Dict[str, Any] = {
+    "floors": 20,
+    "cars": 4,
+    "floor_time": 0.5,
+    "door_time": 1.0,
+    "scheduler": "look",
+    "dispatch": "conventional",
+    "capacity": 0,
+    "transfer_time": 0.0,
+    "pattern": "lunch",
+    "hours": 1.0,
+    "rate": 1200.0,
+}
+
+# 書き出す列（パラメーターの後に並ぶ結果）
+METRICS = ["seed", "passengers", "delivered", "wait_mean", "wait_p95", "wait_max",
+           "journey_mean", "journey_p95", "journey_max", "throughput_per_hour",
+           "decisions", "decisions_per_second", "seconds"]
+
+
+def parse_param(text: str) -> Dict[str, List[Any]]:
+    """"名前=値1,値2,..." を既定値と同じ型の値の一覧にする"""
+    name, _, values = text.partition("=")
+    if name not in DEFAULTS or not values:
+        raise ValueError(f"パラメーターが正しくありません: {text}（使える名前: {', '.join(DEFAULTS)}）")
+    kind = type(DEFAULTS[name])
+    result = [kind(value) for value in values.split(",")]
+    if name == "scheduler" and not set(result) <= set(SCHEDULERS):
+        raise ValueError(f"スケジューラーが正しくありません: {values}")
+    if name == "dispatch" and not set(result) <= set(DISPATCHES):
+        raise ValueError(f"群管理の方式が正しくありません: {values}")
+    if name == "pattern" and not set(result) <= set(PATTERNS):
+        raise ValueError(f"交通パターンが正しくありません: {values}")
+    return {name: result}
+
+
+def expand_grid(grid: Dict[str, List[Any]], replicates: int = 1) -> Iterator[Dict[str, Any]]:
+    """パラメーターのすべての組み合わせを返す（指定のないものは既定値）"""
+    names = list(DEFAULTS)
+    values = [grid.get(name, [DEFAULTS[name]]) for name in names]
+    for combination in product(*values):
+        params = dict(zip(names, combination))
+        for replicate in range(replicates):
+            yield dict(params, replicate=replicate)
+
+
+def run_seed(params: Dict[str, Any], base_seed: int) -> int:
+    """パラメーターの値から、その回の乱数の種を決める
+    
+    交通量に関係するパラメーター（階数・パターン・時間・人数・繰り返しの番号）だけを使うので、
+    台数・時間の設定・方式だけが違う回は同じ乗客の列で比べられる。
+    """
+    key = json.dumps([params["floors"], params["pattern"], params["hours"],
+                      params["rate"], params["replicate"], base_seed])
+    return zlib.crc32(key.encode())
+
+
+def run_simulation(params: Dict[str, Any], seed: int) -> Dict[str, Any]:
+    """1回分のシミュレーションを行い、パラメーターと結果を1行にまとめる（ワーカーで実行）"""
+    generator = TrafficGenerator(params["floors"], params["pattern"])
+    result = run_one(generator, params["scheduler"], params["cars"], params["hours"],
+                     params["rate"], seed, params["floor_time"], params["door_time"],
+                     params["dispatch"], params["capacity"] or None, params["transfer_time"])
+    row = dict(params, seed=seed)
+    for name in ("passengers", "delivered", "throughput_per_hour", "decisions",
+                 "decisions_per_second", "seconds"):
+        row[name] = result[name]
+    for name in ("wait", "journey"):
+        for stat, value in result[name].items():
+            row[f"{name}_{stat}"] = value
+    return row
+
+
+class ResultWriter:
+    """結果を1行ずつ書き出すクラス（拡張子が .jsonl なら JSONL、それ以外は CSV）"""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 書き出すファイル
+        """
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._jsonl = path.endswith(".jsonl")
+        self._writer = None
+        if not self._jsonl:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(DEFAULTS) + ["replicate"] + METRICS)
+            self._writer.writeheader()
+    
+    def __enter__(self) -> "ResultWriter":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def write(self, row: Dict[str, Any]) -> None:
+        """1行を書き出す（途中で止めても、それまでの結果が残るようすぐに反映する）"""
+        if self._jsonl:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        else:
+            self._writer.writerow(row)
+        self._file.flush()
+    
+    def close(self) -> None:
+        """ファイルを閉じる"""
+        self._file.close()
+
+
+def run_sweep(runs: List[Dict[str, Any]], base_seed: int = 0, workers: Optional[int] = None,
+              writer: Optional[ResultWriter] = None) -> List[Dict[str, Any]]:
+    """すべての回を並列に実行し、終わった順に書き出す
+    
+    workers が 0 ならこのプロセスで順に実行する（デバッグ用）。
+    """
+    rows = []
+    if workers == 0:
+        for params in runs:
+            rows.append(run_simulation(params, run_seed(params, base_seed)))
+            if writer is not None:
+                writer.write(rows[-1])
+        return rows
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_simulation, params, run_seed(params, base_seed))
+                   for params in runs]
+        for future in as_completed(futures):
+            rows.append(future.result())
+            if writer is not None:
+                writer.write(rows[-1])
+    return rows
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="エレベーターのシミュレーションのパラメーター探索")
+    parser.add_argument("--param", action="append", default=[],
+                        help=f"名前=値1,値2,...（名前: {', '.join(DEFAULTS)}）")
+    parser.add_argument("--replicates", type=int, default=1, help="組み合わせごとの繰り返し回数（乱数の種を変える）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種のもと")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時はCPUの数、0なら並列にしない）")
+    parser.add_argument("--output", default="sweep.csv", help="結果を書き出すファイル（.csv か .jsonl）")
+    args = parser.parse_args()
+    
+    grid: Dict[str, List[Any]] = {}
+    for text in args.param:
+        try:
+            grid.update(parse_param(text))
+        except ValueError as e:
+            parser.error(str(e))
+    runs = list(expand_grid(grid, args.replicates))
+    workers = args.workers if args.workers is not None else os.cpu_count()
+    
+    start = time.perf_counter()
+    with ResultWriter(args.output) as writer:
+        rows = run_sweep(runs, args.seed, workers, writer)
+    elapsed = time.perf_counter() - start
+    print(f"{len(rows)}回のシミュレーションを {args.output} に書き出しました。"
+          f"（{elapsed:.1f}秒, {len(rows) / elapsed:.1f}回/秒, {workers or 1}プロセス）")
+
+
+if __name__ == "__main__":
+    main()
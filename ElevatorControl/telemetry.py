@@ -0,0 +1,299 @@
+"""
+エレベーターの計測（テレメトリ）
+
+リクエスト（乗り場呼びや乗客）ごとに、呼び出し・号機の割り当て・乗車（迎えに来た）・降車の
+時刻を記録し、区間の時間をヒストグラムに、事象の数をカウンターに集計する。
+事象は (種類, 通し番号, 時刻, 号機, 階) のタプルとしてシンク（JSONL ファイルや
+メモリ上のリングバッファ）に流せる。
+
+ヒストグラムは HDR ヒストグラムと同じ考え方で、値を2のべき乗ごとの区間に分け、
+各区間をさらに等分したバケットの数だけを数える。記録は整数演算だけで済み、
+メモリは値の範囲の対数に比例するので、長いシミュレーションでも記録し続けられる
+（相対誤差は 1 / 2^(significant_bits - 1) 以下）。
+
+使い方:
+    telemetry = Telemetry(JsonlSink("events.jsonl"))
+    simulation = Simulation(controller, telemetry=telemetry)
+    simulation.run()
+    telemetry.close()
+    print(telemetry.summary())
+"""
+from collections import deque
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import math
+
+
+# 事象の種類
+CALL = "call"
+ASSIGN = "assign"
+PICKUP = "pickup"
+DROPOFF = "dropoff"
+
+# シンクに流す事象: (種類, 通し番号, 時刻, 号機, 階)（号機・階は分からなければ None）
+Event = Tuple[str, int, float, Optional[int], Optional[int]]
+
+
+class Histogram:
+    """対数で区切ったバケットに値を数えるヒストグラム（HDR ヒストグラム風）"""
+    
+    def __init__(self, unit: float = 0.001, significant_bits: int = 7):
+        """
+        Args:
+            unit: 区別できる最小の値（この値の整数倍に切り捨てて数える）
+            significant_bits: 2のべき乗ごとの区間を分ける細かさ（ビット数）
+        """
+        if unit <= 0:
+            raise ValueError("最小の値は正の数です")
+        if not 2 <= significant_bits <= 16:
+            raise ValueError("細かさは 2 から 16 ビットです")
+        self._unit = unit
+        self._scale = 1.0 / unit
+        self._bits = significant_bits
+        self._half = 1 << (significant_bits - 1)
+        self._counts: List[int] = [0] * (1 << significant_bits)
+        self._count = 0
+        self._total = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+    
+    def record(self, value: float) -> None:
+        """値を1つ記録する（負の値は 0 として数える）"""
+        self._count += 1
+        self._total += value
+        if value < self._min:
+            self._min = value
+        if value > self._max:
+            self._max = value
+        scaled = int(value * self._scale)
+        if scaled < 0:
+            scaled = 0
+        shift = scaled.bit_length() - self._bits
+        if shift <= 0:
+            index = scaled
+        else:
+            index = shift * self._half + (scaled >> shift)
+        counts = self._counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+    
+    def merge(self, other: "Histogram") -> None:
+        """同じ設定のヒストグラムの値を足し合わせる"""
+        if other._unit != self._unit or other._bits != self._bits:
+            raise ValueError("設定の違うヒストグラムは足し合わせられません")
+        if len(other._counts) > len(self._counts):
+            self._counts.extend([0] * (len(other._counts) - len(self._counts)))
+        for index, count in enumerate(other._counts):
+            self._counts[index] += count
+        self._count += other._count
+        self._total += other._total
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+    
+    def get_count(self) -> int:
+        """記録した値の数を取得"""
+        return self._count
+    
+    def get_mean(self) -> float:
+        """平均を取得（丸める前の値で計算する）"""
+        return self._total / self._count if self._count else 0.0
+    
+    def get_min(self) -> float:
+        """最小値を取得"""
+        return self._min if self._count else 0.0
+    
+    def get_max(self) -> float:
+        """最大値を取得"""
+        return self._max if self._count else 0.0
+    
+    def percentile(self, rate: float) -> float:
+        """百分位数（最も近い順位の値が入っているバケットの上端、最大値を超えない）"""
+        if not self._count:
+            return 0.0
+        rank = max(1, math.ceil(rate * self._count))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(self._upper(index) * self._unit, self._max)
+        return self._max
+    
+    def _upper(self, index: int) -> int:
+        """バケットに入る最大の整数値"""
+        if index < (1 << self._bits):
+            return index
+        shift = index // self._half - 1
+        return (((index - shift * self._half) + 1) << shift) - 1
+    
+    def to_dict(self) -> Dict[str, float]:
+        """件数・平均・百分位数・最大を辞書にする"""
+        return {"count": self._count,
+                "mean": round(self.get_mean(), 3),
+                "p50": round(self.percentile(0.5), 3),
+                "p95": round(self.percentile(0.95), 3),
+                "p99": round(self.percentile(0.99), 3),
+                "max": round(self.get_max(), 3)}
+
+
+class RingBufferSink:
+    """直近の事象だけをメモリに残すシンク"""
+    
+    def __init__(self, size: int = 10000):
+        """
+        Args:
+            size: 残す事象の数（古いものから捨てる）
+        """
+        self._events = deque(maxlen=size)
+    
+    def write(self, event: Event) -> None:
+        """事象を1つ書き込む"""
+        self._events.append(event)
+    
+    def get_events(self) -> List[Event]:
+        """残っている事象を古い順に取得"""
+        return list(self._events)
+    
+    def close(self) -> None:
+        """何もしない"""
+
+
+class JsonlSink:
+    """事象を1行に1つの JSON としてファイルに書き出すシンク"""
+    
+    def __init__(self, path: str, buffer_size: int = 1 << 16):
+        """
+        Args:
+            path: 書き出すファイル
+            buffer_size: 書き込みのバッファの大きさ（バイト）
+        """
+        self._file = open(path, "w", encoding="utf-8", buffering=buffer_size)
+    
+    def __enter__(self) -> "JsonlSink":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def write(self, event: Event) -> None:
+        """事象を1行書き出す（json.dumps を使わず、決まった形に整形する）"""
+        kind, request_id, at, car, floor = event
+        self._file.write(f'{{"event": "{kind}", "id": {request_id}, "time": {at:.3f}, '
+                         f'"car": {"null" if car is None else car}, '
+                         f'"floor": {"null" if floor is None else floor}}}\n')
+    
+    def close(self) -> None:
+        """ファイルを閉じる"""
+        self._file.close()
+
+
+class Telemetry:
+    """リクエストごとの時刻を記録し、ヒストグラムとカウンターに集計するクラス
+    
+    リクエストは呼び出しから降車（降車のないリクエストは乗車）まで、渡されたオブジェクトを
+    キーにして持ち、終わったら捨てる。集計する区間は次の4つ。
+        assign: 呼び出しから最初に号機が割り当てられるまで
+        wait: 呼び出しから乗車（ドアが開いた）まで
+        ride: 乗車から降車まで
+        journey: 呼び出しから降車まで
+    """
+    
+    def __init__(self, sink=None, unit: float = 0.001, significant_bits: int = 7):
+        """
+        Args:
+            sink: 事象を流す先（write(event) と close() を持つもの、省略時は流さない）
+            unit: ヒストグラムで区別できる最小の秒数
+            significant_bits: ヒストグラムの細かさ（ビット数）
+        """
+        self._sink = sink
+        self._write = sink.write if sink is not None else None
+        self._histograms = {name: Histogram(unit, significant_bits)
+                            for name in ("assign", "wait", "ride", "journey")}
+        self._assign = self._histograms["assign"].record
+        self._wait = self._histograms["wait"].record
+        self._ride = self._histograms["ride"].record
+        self._journey = self._histograms["journey"].record
+        self._counters: Dict[str, int] = {CALL: 0, ASSIGN: 0, PICKUP: 0, DROPOFF: 0}
+        # リクエストごとの [通し番号, 呼び出し・割り当て・乗車の時刻, 割り当てた号機]
+        self._open: Dict[Hashable, List[Any]] = {}
+        self._next_id = 0
+    
+    def call(self, request: Hashable, at: float, floor: Optional[int] = None) -> None:
+        """呼び出し（乗り場呼びの発生や、乗客が乗り場に着いた）"""
+        self._next_id += 1
+        self._open[request] = [self._next_id, at, None, None, None]
+        self._counters[CALL] += 1
+        if self._write is not None:
+            self._write((CALL, self._next_id, at, None, floor))
+    
+    def assign(self, request: Hashable, at: float, car: int) -> None:
+        """号機の割り当て（2回目以降は、号機が変わったときだけ reassign として数える）"""
+        record = self._open.get(request)
+        if record is None:
+            return
+        if record[2] is not None:
+            if car != record[4]:
+                record[4] = car
+                self.count("reassign")
+            return
+        record[2] = at
+        record[4] = car
+        self._assign(at - record[1])
+        self._counters[ASSIGN] += 1
+        if self._write is not None:
+            self._write((ASSIGN, record[0], at, car, None))
+    
+    def pickup(self, request: Hashable, at: float, car: int, floor: int,
+               done: bool = False) -> None:
+        """乗車（迎えに来たエレベーターのドアが開いた）
+        
+        done が True なら降車のないリクエストとしてここで記録を終える。
+        """
+        record = self._open.pop(request, None) if done else self._open.get(request)
+        if record is None:
+            return
+        record[3] = at
+        self._wait(at - record[1])
+        self._counters[PICKUP] += 1
+        if self._write is not None:
+            self._write((PICKUP, record[0], at, car, floor))
+    
+    def dropoff(self, request: Hashable, at: float, car: int, floor: int) -> None:
+        """降車（記録を終える）"""
+        record = self._open.pop(request, None)
+        if record is None:
+            return
+        if record[3] is not None:
+            self._ride(at - record[3])
+        self._journey(at - record[1])
+        self._counters[DROPOFF] += 1
+        if self._write is not None:
+            self._write((DROPOFF, record[0], at, car, floor))
+    
+    def count(self, name: str, amount: int = 1) -> None:
+        """カウンターを増やす"""
+        self._counters[name] = self._counters.get(name, 0) + amount
+    
+    def get_counters(self) -> Dict[str, int]:
+        """カウンターの値を取得"""
+        return dict(self._counters)
+    
+    def get_histogram(self, name: str) -> Histogram:
+        """区間（assign / wait / ride / journey）のヒストグラムを取得"""
+        return self._histograms[name]
+    
+    def get_open_count(self) -> int:
+        """記録を終えていないリクエストの数を取得"""
+        return len(self._open)
+    
+    def summary(self) -> Dict[str, Any]:
+        """カウンターと各区間の集計を辞書にする"""
+        result: Dict[str, Any] = dict(self._counters)
+        result["open"] = len(self._open)
+        for name, histogram in self._histograms.items():
+            result[name] = histogram.to_dict()
+        return result
+    
+    def close(self) -> None:
+        """シンクを閉じる"""
+        if self._sink is not None:
+            self._sink.close()
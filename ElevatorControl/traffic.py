@@ -0,0 +1,123 @@
+"""
+乗客の交通量の生成（再現可能な乱数による）
+
+乗客はポアソン過程（到着間隔が指数分布）で発生し、出発階と目的階は
+交通パターンに応じて決める。パターンは「ロビーから上の階へ」「上の階から
+ロビーへ」「上の階どうし」の割合で表す。
+
+- up_peak: 出勤時（ほとんどがロビーから上の階へ）
+- down_peak: 退勤時（ほとんどが上の階からロビーへ）
+- lunch: 昼休み（ロビーとの行き来が半々）
+- interfloor: 上の階どうしの移動が中心
+
+上の階の選ばれやすさは floor_weights（階ごとの人数など）で変えられる。
+
+使い方:
+    python traffic.py --pattern up_peak --hours 1 --rate 600 --floors 20
+"""
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import random
+
+from elevator import Passenger
+
+
+# パターンごとの (ロビーから上の階へ, 上の階からロビーへ, 上の階どうし) の割合
+PATTERNS: Dict[str, Tuple[float, float, float]] = {
+    "up_peak": (0.85, 0.05, 0.10),
+    "down_peak": (0.05, 0.85, 0.10),
+    "lunch": (0.40, 0.40, 0.20),
+    "interfloor": (0.10, 0.10, 0.80),
+}
+
+
+class TrafficGenerator:
+    """交通パターンに従って乗客を発生させるクラス"""
+    
+    def __init__(self, max_floor: int, pattern: str = "interfloor",
+                 floor_weights: Optional[Sequence[float]] = None, lobby: int = 1):
+        """
+        Args:
+            max_floor: 最上階
+            pattern: 交通パターンの名前（PATTERNS のキー）
+            floor_weights: ロビー以外の各階（下から順）の選ばれやすさ（省略時は均等）
+            lobby: ロビーの階
+        """
+        if pattern not in PATTERNS:
+            raise ValueError(f"交通パターンが正しくありません: {pattern}")
+        self._floors = [floor for floor in range(1, max_floor + 1) if floor != lobby]
+        if not self._floors:
+            raise ValueError("ロビー以外の階がありません")
+        if floor_weights is None:
+            floor_weights = [1.0] * len(self._floors)
+        elif len(floor_weights) != len(self._floors):
+            raise ValueError(f"floor_weights は {len(self._floors)} 階分が必要です")
+        self._cum_weights = list(accumulate(floor_weights))
+        self._max_floor = max_floor
+        self._pattern = pattern
+        self._lobby = lobby
+    
+    def get_max_floor(self) -> int:
+        """最上階を取得"""
+        return self._max_floor
+    
+    def get_pattern(self) -> str:
+        """交通パターンの名前を取得"""
+        return self._pattern
+    
+    def generate(self, hours: float, rate: float, seed: int = 0) -> List[Passenger]:
+        """1時間あたり rate 人の割合で、hours 時間分の乗客を到着順に発生させる
+        
+        同じ引数と seed からは必ず同じ乗客の列ができる。
+        """
+        rng = random.Random(seed)
+        up, down, _ = PATTERNS[self._pattern]
+        passengers = []
+        lambd = rate / 3600
+        at = rng.expovariate(lambd)
+        while at < hours * 3600:
+            kind = rng.random()
+            if kind < up:
+                origin, destination = self._lobby, self._choose(rng)
+            elif kind < up + down:
+                origin, destination = self._choose(rng), self._lobby
+            else:
+                origin = self._choose(rng)
+                destination = self._choose(rng, origin)
+            passengers.append(Passenger(origin, destination, at))
+            at += rng.expovariate(lambd)
+        return passengers
+    
+    def _choose(self, rng: random.Random, exclude: Optional[int] = None) -> int:
+        """重みに従ってロビー以外の階を選ぶ（exclude の階は選ばない）"""
+        if exclude is not None and len(self._floors) == 1:
+            return self._lobby
+        while True:
+            floor = rng.choices(self._floors, cum_weights=self._cum_weights)[0]
+            if floor != exclude:
+                return floor
+
+
+def main():
+    """メイン関数（発生させた乗客の内訳を表示）"""
+    parser = argparse.ArgumentParser(description="乗客の交通量の生成")
+    parser.add_argument("--pattern", choices=sorted(PATTERNS), default="interfloor", help="交通パターン")
+    parser.add_argument("--hours", type=float, default=1, help="発生させる時間")
+    parser.add_argument("--rate", type=float, default=600, help="1時間あたりの乗客数")
+    parser.add_argument("--floors", type=int, default=20, help="最上階")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    args = parser.parse_args()
+    
+    passengers = TrafficGenerator(args.floors, args.pattern).generate(args.hours, args.rate, args.seed)
+    from_lobby = sum(1 for p in passengers if p.get_origin() == 1)
+    to_lobby = sum(1 for p in passengers if p.get_destination() == 1)
+    print(f"{args.pattern}: {len(passengers)}人 （ロビーから {from_lobby}人, ロビーへ {to_lobby}人, "
+          f"上の階どうし {len(passengers) - from_lobby - to_lobby}人）")
+    for passenger in passengers[:10]:
+        print(f"  {passenger.get_arrival_time():8.1f}秒: {passenger.get_origin():3d}階 → "
+              f"{passenger.get_destination():3d}階")
+
+
+if __name__ == "__main__":
+    main()
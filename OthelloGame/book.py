@@ -0,0 +1,281 @@
+"""
+オセロの定石データベース（オープニングブック）
+
+探索AIで事前に作成した「局面 → 最善手」の表を、ハッシュ値の昇順に並べた
+固定長レコードのバイナリファイルとして保存する。読み込み時は mmap で
+ファイルをそのまま参照し、二分探索で引くため、起動時の解析処理はない。
+
+使い方:
+    python book.py generate --plies 6 --time 0.1 --output opening.book
+    python book.py lookup --book opening.book
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import mmap
+import os
+import struct
+import time
+
+from othello import Board, Disc
+from search import AlphaBetaSearch
+
+
+# ファイル先頭: マジックナンバー, バージョン, レコード長, レコード数
+HEADER = struct.Struct("<4sHHI")
+MAGIC = b"OTBK"
+VERSION = 1
+# 1レコード: 局面のハッシュ値, 最善手（正規化後のマス番号）, 探索の深さ, 評価値
+RECORD = struct.Struct("<QBBh")
+KEY = struct.Struct("<Q")
+
+BOOK_SIZE = 8
+
+# 対称変換に使うビットマスク（8×8専用）
+_BYTE_BITS_1 = 0x5555555555555555
+_BYTE_BITS_2 = 0x3333333333333333
+_BYTE_BITS_4 = 0x0F0F0F0F0F0F0F0F
+_DIAGONAL_1 = 0x5500550055005500
+_DIAGONAL_2 = 0x3333000033330000
+_DIAGONAL_4 = 0x0F0F0F0F00000000
+
+
+def flip_vertical(bits: int) -> int:
+    """上下反転（行の順序を逆にする）"""
+    return int.from_bytes(bits.to_bytes(8, "little"), "big")
+
+
+def mirror_horizontal(bits: int) -> int:
+    """左右反転（各行の中で列の順序を逆にする）"""
+    bits = ((bits >> 1) & _BYTE_BITS_1) | ((bits & _BYTE_BITS_1) << 1)
+    bits = ((bits >> 2) & _BYTE_BITS_2) | ((bits & _BYTE_BITS_2) << 2)
+    return ((bits >> 4) & _BYTE_BITS_4) | ((bits & _BYTE_BITS_4) << 4)
+
+
+def transpose(bits: int) -> int:
+    """対角線で反転（行と列を入れ替える）"""
+    t = _DIAGONAL_4 & (bits ^ (bits << 28))
+    bits ^= t ^ (t >> 28)
+    t = _DIAGONAL_2 & (bits ^ (bits << 14))
+    bits ^= t ^ (t >> 14)
+    t = _DIAGONAL_1 & (bits ^ (bits << 7))
+    bits ^= t ^ (t >> 7)
+    return bits
+
+
+def apply_symmetry(bits: int, symmetry: int) -> int:
+    """8通りの対称変換のうち1つを適用（bit0: 左右, bit1: 上下, bit2: 対角）"""
+    if symmetry & 4:
+        bits = transpose(bits)
+    if symmetry & 2:
+        bits = flip_vertical(bits)
+    if symmetry & 1:
+        bits = mirror_horizontal(bits)
+    return bits
+
+
+def all_symmetries(bits: int) -> List[int]:
+    """8通りの対称変換をすべて適用した結果を、変換番号の順に返す"""
+    variants = []
+    for base in (bits, transpose(bits)):
+        vertical = flip_vertical(base)
+        variants += [base, mirror_horizontal(base), vertical, mirror_horizontal(vertical)]
+    return variants
+
+
+# 変換ごとの「元のマス番号 → 変換後のマス番号」と、その逆引き
+_SQUARE_MAPS = [[apply_symmetry(1 << i, s).bit_length() - 1 for i in range(64)]
+                for s in range(8)]
+_INVERSE_MAPS = [[0] * 64 for _ in range(8)]
+for _s in range(8):
+    for _i, _j in enumerate(_SQUARE_MAPS[_s]):
+        _INVERSE_MAPS[_s][_j] = _i
+
+
+def normalize(black: int, white: int) -> Tuple[int, int, int]:
+    """対称な局面が同じ形になるよう正規化し、(黒, 白, 使った変換) を返す"""
+    best = (black, white)
+    best_symmetry = 0
+    for symmetry, candidate in enumerate(zip(all_symmetries(black), all_symmetries(white))):
+        if candidate < best:
+            best = candidate
+            best_symmetry = symmetry
+    return best[0], best[1], best_symmetry
+
+
+def position_key(board: Board, color: int) -> Tuple[int, int]:
+    """正規化した局面のハッシュ値（手番込み）と、使った変換を返す"""
+    black, white = board.get_bitboards(Disc.BLACK)
+    black, white, symmetry = normalize(black, white)
+    zobrist = board.get_zobrist_keys()
+    key = zobrist.hash_position(black, white)
+    if color == Disc.WHITE:
+        key ^= zobrist.get_side_key()
+    return key, symmetry
+
+
+class OpeningBook:
+    """mmap で開いた定石ファイルを二分探索で引くクラス"""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 定石ファイルのパス
+        """
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            # 空のファイルは mmap できない
+            self._file.close()
+            raise ValueError(f"定石ファイルの形式が正しくありません: {path}") from e
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"定石ファイルの形式が正しくありません: {path}")
+        magic, version, record_size, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"定石ファイルの形式が正しくありません: {path}")
+        if HEADER.size + count * RECORD.size > len(self._map):
+            self.close()
+            raise ValueError(f"定石ファイルが途中で切れています: {path}")
+        self._count = count
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __enter__(self) -> "OpeningBook":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """ファイルを閉じる"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+    
+    def probe(self, key: int) -> Optional[Tuple[int, int, int]]:
+        """ハッシュ値で引き、(正規化後のマス番号, 深さ, 評価値) を返す"""
+        data = self._map
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            mid_key = KEY.unpack_from(data, HEADER.size + mid * RECORD.size)[0]
+            if mid_key < key:
+                low = mid + 1
+            elif mid_key > key:
+                high = mid
+            else:
+                _, square, depth, score = RECORD.unpack_from(
+                    data, HEADER.size + mid * RECORD.size)
+                return square, depth, score
+        return None
+    
+    def lookup(self, board: Board, color: int) -> Optional[Tuple[int, int]]:
+        """定石にある局面なら最善手を返す（なければNone）"""
+        if board.get_size() != BOOK_SIZE:
+            return None
+        key, symmetry = position_key(board, color)
+        entry = self.probe(key)
+        if entry is None:
+            return None
+        index = _INVERSE_MAPS[symmetry][entry[0]]
+        return divmod(index, BOOK_SIZE)
+
+
+def write_book(path: str, entries: Dict[int, Tuple[int, int, int]]) -> None:
+    """{ハッシュ値: (正規化後のマス番号, 深さ, 評価値)} を定石ファイルに書き出す"""
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(entries)))
+        for key in sorted(entries):
+            square, depth, score = entries[key]
+            score = max(-32768, min(32767, score))
+            f.write(RECORD.pack(key, square, min(depth, 255), score))
+    # 書き込み途中のファイルを読まれないよう、最後に置き換える
+    os.replace(temporary, path)
+
+
+def iterate_positions(plies: int) -> Iterator[Tuple[Board, int, int]]:
+    """初期局面から指定手数までに現れる局面を、対称形を除いて列挙する
+    
+    (ボード, 手番, 手数) を浅い順に返す。パスが必要な局面は含めない。
+    """
+    seen = set()
+    frontier: List[Tuple[Board, int]] = [(Board(BOOK_SIZE), Disc.BLACK)]
+    for ply in range(plies):
+        next_frontier = []
+        for board, color in frontier:
+            key, _ = position_key(board, color)
+            if key in seen:
+                continue
+            seen.add(key)
+            moves = board.get_valid_moves(color)
+            if not moves:
+                continue
+            yield board, color, ply
+            opponent = Disc.WHITE if color == Disc.BLACK else Disc.BLACK
+            for row, col in moves:
+                child = board.copy()
+                child.flip_discs(row, col, color)
+                next_frontier.append((child, opponent))
+        frontier = next_frontier
+
+
+def generate_book(path: str, plies: int, time_limit: float, verbose: bool = True) -> int:
+    """探索AIで定石を作成してファイルに保存し、局面数を返す"""
+    search = AlphaBetaSearch(time_limit=time_limit)
+    entries: Dict[int, Tuple[int, int, int]] = {}
+    start = time.perf_counter()
+    
+    for board, color, ply in iterate_positions(plies):
+        result = search.search(board, color)
+        row, col = result.get_move()
+        key, symmetry = position_key(board, color)
+        square = _SQUARE_MAPS[symmetry][row * BOOK_SIZE + col]
+        entries[key] = (square, result.get_depth(), result.get_score())
+        if verbose and len(entries) % 100 == 0:
+            print(f"  {len(entries)}局面（{ply}手目, {time.perf_counter() - start:.0f}秒）")
+    
+    write_book(path, entries)
+    return len(entries)
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="オセロの定石データベース")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    generate = subparsers.add_parser("generate", help="探索AIで定石を作成")
+    generate.add_argument("--plies", type=int, default=6, help="定石に含める手数")
+    generate.add_argument("--time", type=float, default=0.1, help="1局面あたりの探索時間（秒）")
+    generate.add_argument("--output", default="opening.book", help="出力ファイル")
+    
+    lookup = subparsers.add_parser("lookup", help="初期局面の定石手と検索時間を表示")
+    lookup.add_argument("--book", default="opening.book", help="定石ファイル")
+    lookup.add_argument("--repeat", type=int, default=10000, help="時間計測の繰り返し回数")
+    
+    args = parser.parse_args()
+    
+    if args.command == "generate":
+        count = generate_book(args.output, args.plies, args.time)
+        print(f"{args.output} に {count} 局面を保存しました。")
+    else:
+        start = time.perf_counter()
+        with OpeningBook(args.book) as book:
+            opened = time.perf_counter() - start
+            board = Board(BOOK_SIZE)
+            move = book.lookup(board, Disc.BLACK)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                book.lookup(board, Disc.BLACK)
+            per_lookup = (time.perf_counter() - start) / args.repeat
+            print(f"局面数: {len(book)}")
+            print(f"初期局面の定石手: {move}")
+            print(f"読み込み: {opened * 1e6:.1f}µs, 1回の検索: {per_lookup * 1e6:.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
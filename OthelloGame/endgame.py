@@ -0,0 +1,309 @@
+"""
+オセロの終盤完全読み（勝敗読み → 石差読み）
+
+使い方（ソルバーの速度計測）:
+    python endgame.py --empties 12 --positions 10 --json
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import random
+import time
+
+from othello import Board, Disc
+
+
+INFINITY = 1 << 30
+
+
+def popcount(bits: int) -> int:
+    """立っているビットの数を数える"""
+    return bin(bits).count("1")
+
+
+class SolveResult:
+    """完全読みの結果"""
+    
+    def __init__(self, move: Optional[Tuple[int, int]], score: int, exact: bool,
+                 nodes: int, elapsed: float):
+        """
+        Args:
+            move: 最善手（合法手がない場合はNone）
+            score: 手番側から見た最終石差（勝敗読みのみの場合は -1, 0, 1）
+            exact: 石差まで読み切ったかどうか
+            nodes: 探索したノード数
+            elapsed: 探索にかかった秒数
+        """
+        self._move = move
+        self._score = score
+        self._exact = exact
+        self._nodes = nodes
+        self._elapsed = elapsed
+    
+    def get_move(self) -> Optional[Tuple[int, int]]:
+        """最善手を取得"""
+        return self._move
+    
+    def get_score(self) -> int:
+        """手番側から見た最終石差を取得"""
+        return self._score
+    
+    def is_exact(self) -> bool:
+        """石差まで読み切ったかどうか"""
+        return self._exact
+    
+    def get_nodes(self) -> int:
+        """探索したノード数を取得"""
+        return self._nodes
+    
+    def get_elapsed(self) -> float:
+        """探索時間（秒）を取得"""
+        return self._elapsed
+    
+    def get_nodes_per_second(self) -> float:
+        """1秒あたりの探索ノード数を取得"""
+        return self._nodes / self._elapsed if self._elapsed > 0 else 0.0
+
+
+class EndgameSolver:
+    """終盤の完全読みを行うソルバー
+    
+    まず勝ち・負け・引き分けだけを判定する狭い窓で読み、
+    その結果を使って窓を絞りながら最終石差を読み切る。
+    着手順序は、残りマスが多いうちは相手の着手可能数が少ない順（速攻優先）、
+    少なくなったら空きマスが奇数個の領域を優先する（偶数理論）。
+    """
+    
+    def __init__(self, max_empties: int = 12, exact: bool = True,
+                 mobility_ordering_empties: int = 7):
+        """
+        Args:
+            max_empties: 完全読みに切り替える空きマス数
+            exact: 勝敗読みの後に石差まで読むかどうか
+            mobility_ordering_empties: この数より空きマスが多いときに着手可能数で並べ替える
+        """
+        self._max_empties = max_empties
+        self._exact = exact
+        self._mobility_ordering_empties = mobility_ordering_empties
+        self._board: Optional[Board] = None
+        self._quadrants: List[int] = []
+        self._nodes = 0
+        self._total_nodes = 0
+        self._total_elapsed = 0.0
+    
+    def get_max_empties(self) -> int:
+        """完全読みに切り替える空きマス数を取得"""
+        return self._max_empties
+    
+    def can_solve(self, board: Board) -> bool:
+        """空きマスが少なく、完全読みに切り替える局面かどうか"""
+        return board.count_discs(Disc.EMPTY) <= self._max_empties
+    
+    def _prepare(self, board: Board) -> None:
+        """盤面の大きさに応じて、偶数理論で使う4つの領域を準備"""
+        size = board.get_size()
+        if self._board is not None and self._board.get_size() == size:
+            return
+        self._board = Board(size)
+        half = size // 2
+        self._quadrants = [0, 0, 0, 0]
+        for row in range(size):
+            for col in range(size):
+                quadrant = (row >= half) * 2 + (col >= half)
+                self._quadrants[quadrant] |= 1 << (row * size + col)
+    
+    def solve(self, board: Board, color: int) -> SolveResult:
+        """指定色の手番で完全読みを行う"""
+        self._prepare(board)
+        start = time.perf_counter()
+        self._nodes = 0
+        own, opponent = board.get_bitboards(color)
+        empties = board.count_discs(Disc.EMPTY)
+        
+        # 勝敗読み（-1, 0, 1 のどれかを判定）
+        score, move = self._solve_root(own, opponent, empties, -1, 1)
+        exact = False
+        if self._exact and move is not None:
+            if score > 0:
+                score, move = self._solve_root(own, opponent, empties, 0, INFINITY)
+            elif score < 0:
+                score, move = self._solve_root(own, opponent, empties, -INFINITY, 0)
+            exact = True
+        else:
+            # 窓の外の値は石差の下限・上限でしかないので、符号だけを残す
+            score = (score > 0) - (score < 0)
+        
+        elapsed = time.perf_counter() - start
+        self._total_nodes += self._nodes
+        self._total_elapsed += elapsed
+        position = divmod(move.bit_length() - 1, board.get_size()) if move else None
+        return SolveResult(position, score, exact, self._nodes, elapsed)
+    
+    def get_stats(self) -> Dict[str, float]:
+        """これまでの完全読みの累計ノード数と速度を取得"""
+        return {
+            "nodes": self._total_nodes,
+            "elapsed": self._total_elapsed,
+            "nodes_per_second": (self._total_nodes / self._total_elapsed
+                                 if self._total_elapsed > 0 else 0.0),
+        }
+    
+    def _solve_root(self, own: int, opponent: int, empties: int,
+                    alpha: int, beta: int) -> Tuple[int, Optional[int]]:
+        """ルート局面を読み、(評価値, 最善手) を返す"""
+        self._nodes += 1
+        moves = self._board.generate_moves(own, opponent)
+        if not moves:
+            return self._solve(own, opponent, empties, alpha, beta), None
+        
+        best_score = -INFINITY
+        best_move = None
+        for move, flips in self._order_moves(own, opponent, moves, empties):
+            score = -self._solve(opponent & ~flips, own | move | flips, empties - 1,
+                                 -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score, best_move
+    
+    def _solve(self, own: int, opponent: int, empties: int, alpha: int, beta: int) -> int:
+        """手番側から見た最終石差を返す（fail-soft のアルファベータ法）"""
+        self._nodes += 1
+        board = self._board
+        
+        if empties == 1:
+            return self._solve_last(own, opponent)
+        
+        moves = board.generate_moves(own, opponent)
+        if not moves:
+            if not board.generate_moves(opponent, own):
+                return self._final_score(own, opponent, empties)
+            return -self._solve(opponent, own, empties, -beta, -alpha)
+        
+        best_score = -INFINITY
+        for move, flips in self._order_moves(own, opponent, moves, empties):
+            score = -self._solve(opponent & ~flips, own | move | flips, empties - 1,
+                                 -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+    
+    def _solve_last(self, own: int, opponent: int) -> int:
+        """空きマスが残り1つの局面を直接計算"""
+        board = self._board
+        empty = board.get_full_mask() & ~(own | opponent)
+        own_count = popcount(own)
+        opponent_count = popcount(opponent)
+        
+        flips = popcount(board.compute_flips(own, opponent, empty))
+        if flips:
+            return own_count + 1 + flips - (opponent_count - flips)
+        flips = popcount(board.compute_flips(opponent, own, empty))
+        if flips:
+            return own_count - flips - (opponent_count + 1 + flips)
+        return self._final_score(own, opponent, 1)
+    
+    def _final_score(self, own: int, opponent: int, empties: int) -> int:
+        """終局時の石差（空きマスは勝った側に数える）"""
+        score = popcount(own) - popcount(opponent)
+        if score > 0:
+            return score + empties
+        if score < 0:
+            return score - empties
+        return 0
+    
+    def _order_moves(self, own: int, opponent: int, moves: int,
+                     empties: int) -> List[Tuple[int, int]]:
+        """着手を (着手のビット, 反転する石) の組にして、読む順に並べる"""
+        board = self._board
+        ordered = []
+        if empties > self._mobility_ordering_empties:
+            # 速攻優先: 相手の着手可能数が少なくなる手から読む
+            while moves:
+                move = moves & -moves
+                moves ^= move
+                flips = board.compute_flips(own, opponent, move)
+                mobility = popcount(board.generate_moves(opponent & ~flips, own | move | flips))
+                ordered.append((mobility, move, flips))
+            ordered.sort(key=lambda item: item[0])
+            return [(move, flips) for _, move, flips in ordered]
+        
+        # 偶数理論: 空きマスが奇数個の領域にある手を先に読む
+        empty = board.get_full_mask() & ~(own | opponent)
+        odd = 0
+        for quadrant in self._quadrants:
+            if popcount(empty & quadrant) & 1:
+                odd |= quadrant
+        for group in (moves & odd, moves & ~odd):
+            while group:
+                move = group & -group
+                group ^= move
+                ordered.append((move, board.compute_flips(own, opponent, move)))
+        return ordered
+
+
+def random_position(empties: int, seed: int, size: int = 8) -> Tuple[Board, int]:
+    """ランダムな手順で、空きマスが指定数になるまで進めた局面と手番を作る"""
+    rng = random.Random(seed)
+    while True:
+        board = Board(size)
+        color = Disc.BLACK
+        passes = 0
+        while board.count_discs(Disc.EMPTY) > empties and passes < 2:
+            moves = board.get_valid_moves(color)
+            if moves:
+                board.flip_discs(*rng.choice(moves), color)
+                passes = 0
+            else:
+                passes += 1
+            color = Disc.WHITE if color == Disc.BLACK else Disc.BLACK
+        if board.count_discs(Disc.EMPTY) == empties and board.get_valid_moves(color):
+            return board, color
+
+
+def main():
+    """メイン関数（ランダム局面を完全読みして速度を表示）"""
+    parser = argparse.ArgumentParser(description="終盤完全読みソルバーの速度計測")
+    parser.add_argument("--empties", type=int, default=12, help="空きマス数")
+    parser.add_argument("--positions", type=int, default=10, help="局面数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+    
+    solver = EndgameSolver(max_empties=args.empties)
+    results = []
+    for i in range(args.positions):
+        board, color = random_position(args.empties, args.seed + i)
+        result = solver.solve(board, color)
+        results.append({
+            "position": i,
+            "move": result.get_move(),
+            "score": result.get_score(),
+            "nodes": result.get_nodes(),
+            "elapsed": round(result.get_elapsed(), 6),
+            "nodes_per_second": round(result.get_nodes_per_second()),
+        })
+        if not args.json:
+            print(f"局面{i}: 最善手 {result.get_move()} 石差 {result.get_score():+d} "
+                  f"{result.get_nodes()}ノード {result.get_elapsed():.3f}秒 "
+                  f"({result.get_nodes_per_second():,.0f} nps)")
+    
+    stats = solver.get_stats()
+    if args.json:
+        print(json.dumps({"empties": args.empties, "positions": results,
+                          "total": stats}, ensure_ascii=False))
+    else:
+        print(f"合計: {stats['nodes']}ノード {stats['elapsed']:.3f}秒 "
+              f"({stats['nodes_per_second']:,.0f} nps)")
+
+
+if __name__ == "__main__":
+    main()
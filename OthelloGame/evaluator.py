@@ -0,0 +1,234 @@
+"""
+NumPy による局面の一括評価（マスの重み表＋パターン表＋着手可能数）
+
+局面は (N, マス数) の int8 配列（自分の石 1, 相手の石 -1, 空き 0）か、
+自分・相手のビットボードを並べた uint64 配列で渡す。
+
+使い方（評価速度の計測）:
+    python evaluator.py --positions 1000000
+"""
+from typing import Dict, List, Sequence, Tuple
+import argparse
+import random
+import time
+
+import numpy as np
+
+from othello import Board, Disc
+from search import WeightTableEvaluator, square_weight
+
+
+def edge_patterns(size: int) -> List[List[int]]:
+    """4辺それぞれのマス番号の並び（角から角へ）"""
+    last = size - 1
+    return [
+        [col for col in range(size)],
+        [last * size + col for col in range(size)],
+        [row * size for row in range(size)],
+        [row * size + last for row in range(size)],
+    ]
+
+
+def corner_patterns(size: int) -> List[List[int]]:
+    """4隅それぞれの3×3領域のマス番号の並び（角に近い順）"""
+    last = size - 1
+    patterns = []
+    for corner_row, corner_col in [(0, 0), (0, last), (last, 0), (last, last)]:
+        step_row = 1 if corner_row == 0 else -1
+        step_col = 1 if corner_col == 0 else -1
+        patterns.append([(corner_row + i * step_row) * size + corner_col + j * step_col
+                         for i in range(3) for j in range(3)])
+    return patterns
+
+
+class NumpyEvaluator:
+    """多数の局面をまとめて評価する評価関数
+    
+    WeightTableEvaluator と同じマスの重みと着手可能数に、辺と隅の
+    パターン表（3のマス数乗の大きさの表）の値を加える。パターン表は
+    既定ではすべて0なので、そのままなら WeightTableEvaluator と同じ値になる。
+    """
+    
+    # 探索では葉の局面をまとめて渡してもらう
+    PREFERS_BATCH = True
+    
+    def __init__(self, size: int = 8, mobility_weight: int = 10):
+        """
+        Args:
+            size: ボードのサイズ（8以下）
+            mobility_weight: 着手可能数の差に掛ける重み
+        """
+        if size * size > 64:
+            raise ValueError("NumpyEvaluator は 8×8 以下のボードにのみ対応しています")
+        self._size = size
+        self._squares = size * size
+        self._mobility_weight = mobility_weight
+        self._weights = np.array([square_weight(i // size, i % size, size)
+                                  for i in range(self._squares)], dtype=np.int32)
+        
+        board = Board(size)
+        left_shifts, right_shifts = board.get_shift_masks()
+        self._full_mask = np.uint64(board.get_full_mask())
+        self._left_shifts = [(np.uint64(s), np.uint64(m)) for s, m in left_shifts]
+        self._right_shifts = [(np.uint64(s), np.uint64(m)) for s, m in right_shifts]
+        
+        # パターン名 → (各パターンのマス番号の配列, 3のべき乗, 表)
+        self._patterns: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        for name, squares in (("edge", edge_patterns(size)), ("corner", corner_patterns(size))):
+            length = len(squares[0])
+            self._patterns[name] = (np.array(squares, dtype=np.intp),
+                                    3 ** np.arange(length, dtype=np.int32),
+                                    np.zeros(3 ** length, dtype=np.int32))
+    
+    def get_pattern_names(self) -> List[str]:
+        """パターンの名前の一覧を取得"""
+        return list(self._patterns)
+    
+    def get_pattern_table(self, name: str) -> np.ndarray:
+        """パターン表を取得（添字は 空き0・自分1・相手2 の3進数）"""
+        return self._patterns[name][2].copy()
+    
+    def set_pattern_table(self, name: str, table: np.ndarray) -> None:
+        """パターン表を設定"""
+        squares, powers, current = self._patterns[name]
+        if table.shape != current.shape:
+            raise ValueError(f"パターン表の大きさが違います: {table.shape} != {current.shape}")
+        self._patterns[name] = (squares, powers, table.astype(np.int32))
+    
+    def save(self, path: str) -> None:
+        """パターン表をファイルに保存"""
+        np.savez(path, **{name: pattern[2] for name, pattern in self._patterns.items()})
+    
+    def load(self, path: str) -> None:
+        """パターン表をファイルから読み込む"""
+        with np.load(path) as data:
+            for name in self._patterns:
+                if name in data:
+                    self.set_pattern_table(name, data[name])
+    
+    def evaluate(self, own: int, opponent: int) -> int:
+        """1局面を評価（手番側から見た評価値）"""
+        return self.evaluate_batch([own], [opponent])[0]
+    
+    def evaluate_batch(self, owns: Sequence[int], opponents: Sequence[int]) -> List[int]:
+        """ビットボードの列をまとめて評価"""
+        own = np.array(owns, dtype=np.uint64)
+        opponent = np.array(opponents, dtype=np.uint64)
+        return self.evaluate_bitboards(own, opponent).tolist()
+    
+    def evaluate_bitboards(self, own: np.ndarray, opponent: np.ndarray) -> np.ndarray:
+        """uint64 配列のビットボードをまとめて評価"""
+        own_bits = self._unpack(own)
+        opponent_bits = self._unpack(opponent)
+        return self._evaluate(own, opponent, own_bits, opponent_bits)
+    
+    def evaluate_squares(self, squares: np.ndarray) -> np.ndarray:
+        """(N, マス数) の int8 配列（自分1, 相手-1, 空き0）をまとめて評価"""
+        own_bits = (squares == 1).astype(np.uint8)
+        opponent_bits = (squares == -1).astype(np.uint8)
+        return self._evaluate(self._pack(own_bits), self._pack(opponent_bits),
+                              own_bits, opponent_bits)
+    
+    def _evaluate(self, own: np.ndarray, opponent: np.ndarray,
+                  own_bits: np.ndarray, opponent_bits: np.ndarray) -> np.ndarray:
+        """ビットボードと (N, マス数) の0/1配列の両方から評価値を計算"""
+        scores = (own_bits.astype(np.int32) - opponent_bits) @ self._weights
+        
+        states = own_bits + 2 * opponent_bits
+        for squares, powers, table in self._patterns.values():
+            if table.any():
+                indexes = states[:, squares] @ powers
+                scores += table[indexes].sum(axis=1)
+        
+        if self._mobility_weight:
+            own_moves = self._popcount(self._generate_moves(own, opponent))
+            opponent_moves = self._popcount(self._generate_moves(opponent, own))
+            scores += self._mobility_weight * (own_moves - opponent_moves)
+        
+        return scores
+    
+    def _unpack(self, bitboards: np.ndarray) -> np.ndarray:
+        """uint64 配列を (N, マス数) の0/1配列に展開"""
+        as_bytes = bitboards.astype("<u8").view(np.uint8).reshape(-1, 8)
+        return np.unpackbits(as_bytes, axis=1, bitorder="little")[:, :self._squares]
+    
+    def _pack(self, bits: np.ndarray) -> np.ndarray:
+        """(N, マス数) の0/1配列を uint64 配列にまとめる"""
+        padded = np.zeros((bits.shape[0], 64), dtype=np.uint8)
+        padded[:, :self._squares] = bits
+        return np.packbits(padded, axis=1, bitorder="little").view("<u8").ravel()
+    
+    def _popcount(self, bitboards: np.ndarray) -> np.ndarray:
+        """uint64 配列の各要素の立っているビット数"""
+        return self._unpack(bitboards).sum(axis=1, dtype=np.int32)
+    
+    def _generate_moves(self, own: np.ndarray, opponent: np.ndarray) -> np.ndarray:
+        """Board.generate_moves と同じ合法手の計算を配列全体に対して行う"""
+        empty = ~(own | opponent) & self._full_mask
+        moves = np.zeros_like(own)
+        # 挟める相手の石は最大で size - 2 個並ぶ
+        repeat = self._size - 3
+        for shift, mask in self._left_shifts:
+            x = (own << shift) & mask & opponent
+            for _ in range(repeat):
+                x |= (x << shift) & mask & opponent
+            moves |= (x << shift) & mask & empty
+        for shift, mask in self._right_shifts:
+            x = (own >> shift) & mask & opponent
+            for _ in range(repeat):
+                x |= (x >> shift) & mask & opponent
+            moves |= (x >> shift) & mask & empty
+        return moves
+
+
+def sample_positions(count: int, seed: int = 0) -> Tuple[List[int], List[int]]:
+    """ランダムな対局から、手番側から見た (自分, 相手) のビットボードを集める"""
+    rng = random.Random(seed)
+    owns: List[int] = []
+    opponents: List[int] = []
+    while len(owns) < count:
+        board = Board()
+        color = Disc.BLACK
+        moves = board.get_valid_moves(color)
+        while moves and len(owns) < count:
+            board.flip_discs(*rng.choice(moves), color)
+            color = Disc.WHITE if color == Disc.BLACK else Disc.BLACK
+            own, opponent = board.get_bitboards(color)
+            owns.append(own)
+            opponents.append(opponent)
+            moves = board.get_valid_moves(color)
+    return owns, opponents
+
+
+def main():
+    """メイン関数（一括評価の速度を計測）"""
+    parser = argparse.ArgumentParser(description="NumPy 一括評価の速度計測")
+    parser.add_argument("--positions", type=int, default=1000000, help="評価する局面数")
+    parser.add_argument("--samples", type=int, default=2000, help="実際の対局から集める局面数")
+    args = parser.parse_args()
+    
+    owns, opponents = sample_positions(args.samples)
+    evaluator = NumpyEvaluator()
+    
+    # 1局面ずつの評価関数と結果が一致することを確認
+    reference = WeightTableEvaluator(Board())
+    expected = [reference.evaluate(own, opponent) for own, opponent in zip(owns, opponents)]
+    if evaluator.evaluate_batch(owns, opponents) != expected:
+        raise AssertionError("WeightTableEvaluator と評価値が一致しません")
+    
+    own = np.resize(np.array(owns, dtype=np.uint64), args.positions)
+    opponent = np.resize(np.array(opponents, dtype=np.uint64), args.positions)
+    start = time.perf_counter()
+    evaluator.evaluate_bitboards(own, opponent)
+    elapsed = time.perf_counter() - start
+    print(f"{args.positions}局面: {elapsed:.3f}秒 ({args.positions / elapsed:,.0f} 局面/秒)")
+    
+    start = time.perf_counter()
+    for o, p in zip(owns, opponents):
+        reference.evaluate(o, p)
+    elapsed = time.perf_counter() - start
+    print(f"参考（1局面ずつ）: {len(owns) / elapsed:,.0f} 局面/秒")
+
+
+if __name__ == "__main__":
+    main()
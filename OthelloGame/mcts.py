@@ -0,0 +1,269 @@
+"""
+モンテカルロ木探索（UCT）によるオセロのCPUプレイヤー
+
+ランダムプレイアウトは盤面オブジェクトを作らず、自分・相手のビットボード
+（整数2つ）だけを書き換えながら終局まで進める。workers を指定すると、
+複数の葉のプレイアウトをまとめてプロセスプールで並列に実行する。
+"""
+from typing import List, Optional, Tuple
+import math
+import multiprocessing
+import random
+import time
+
+from othello import Board, CPUPlayer, Disc, GameView, OthelloGame, Player
+
+
+def popcount(bits: int) -> int:
+    """立っているビットの数を数える"""
+    return bin(bits).count("1")
+
+
+def random_bit(bits: int, rng: random.Random) -> int:
+    """立っているビットのうち1つをランダムに選ぶ"""
+    for _ in range(rng.randrange(popcount(bits))):
+        bits &= bits - 1
+    return bits & -bits
+
+
+def random_playout(board: Board, own: int, opponent: int, rng: random.Random) -> int:
+    """終局までランダムに打ち、手番側から見た最終石差を返す
+    
+    board は合法手生成にだけ使い、盤面の状態は整数のまま持ち回る。
+    """
+    sign = 1
+    passed = False
+    while True:
+        moves = board.generate_moves(own, opponent)
+        if moves:
+            move = random_bit(moves, rng)
+            flips = board.compute_flips(own, opponent, move)
+            own, opponent = opponent & ~flips, own | move | flips
+            passed = False
+        elif passed:
+            break
+        else:
+            own, opponent = opponent, own
+            passed = True
+        sign = -sign
+    # 最後に手番を渡した回数の分だけ視点を戻す
+    return sign * (popcount(own) - popcount(opponent))
+
+
+# ワーカープロセスごとに1つだけ作る合法手生成用のボード
+_worker_boards = {}
+
+
+def _playout_batch(jobs: List[Tuple[int, int, int, int]]) -> List[int]:
+    """(ボードサイズ, 自分, 相手, 乱数の種) の組をまとめてプレイアウトする（ワーカー用）"""
+    results = []
+    for size, own, opponent, seed in jobs:
+        if size not in _worker_boards:
+            _worker_boards[size] = Board(size)
+        results.append(random_playout(_worker_boards[size], own, opponent, random.Random(seed)))
+    return results
+
+
+class MCTSNode:
+    """探索木のノード（手番側から見たビットボードを持つ）"""
+    
+    __slots__ = ("own", "opponent", "color", "move", "parent", "children",
+                 "untried", "visits", "wins")
+    
+    def __init__(self, own: int, opponent: int, color: int, move: int,
+                 parent: Optional["MCTSNode"], legal_moves: int):
+        """
+        Args:
+            own, opponent: 手番側から見たビットボード
+            color: 手番の色
+            move: このノードに至った手のビット（パスは0）
+            parent: 親ノード
+            legal_moves: 手番側の合法手（パスしかない場合は0）
+        """
+        self.own = own
+        self.opponent = opponent
+        self.color = color
+        self.move = move
+        self.parent = parent
+        self.children: List["MCTSNode"] = []
+        self.untried = legal_moves
+        self.visits = 0
+        # このノードに至る手を打った側（親の手番）から見た報酬の合計
+        self.wins = 0.0
+
+
+class MCTSPlayer(Player):
+    """UCT（Upper Confidence Bound applied to Trees）で手を選ぶCPUプレイヤー"""
+    
+    def __init__(self, color: int, name: str, iterations: Optional[int] = None,
+                 time_limit: Optional[float] = 1.0, exploration: float = 1.4,
+                 workers: int = 0, batch_size: int = 16, seed: Optional[int] = None):
+        """
+        Args:
+            color: プレイヤーの石の色
+            name: プレイヤー名
+            iterations: 1手あたりのプレイアウト回数の上限（Noneなら時間のみで制限）
+            time_limit: 1手あたりの制限時間（秒）。Noneなら回数のみで制限
+            exploration: UCTの探索係数
+            workers: プレイアウトを並列に実行するプロセス数（0なら並列化しない）
+            batch_size: 並列実行時に1度にまとめてプレイアウトする葉の数
+            seed: 乱数の種
+        """
+        super().__init__(color, name)
+        if iterations is None and time_limit is None:
+            raise ValueError("iterations と time_limit の少なくとも一方を指定してください")
+        self._iterations = iterations
+        self._time_limit = time_limit
+        self._exploration = exploration
+        self._workers = workers
+        self._batch_size = batch_size if workers else 1
+        self._rng = random.Random(seed)
+        self._pool = None
+        self._board: Optional[Board] = None
+        self._last_playouts = 0
+        self._last_elapsed = 0.0
+    
+    def get_move(self, board: Board) -> Optional[Tuple[int, int]]:
+        """モンテカルロ木探索で最も多く試した手を選択"""
+        moves = board.get_valid_moves_mask(self._color)
+        if not moves:
+            return None
+        size = board.get_size()
+        if not moves & (moves - 1):
+            return divmod(moves.bit_length() - 1, size)
+        
+        if self._board is None or self._board.get_size() != size:
+            self._board = Board(size)
+        own, opponent = board.get_bitboards(self._color)
+        root = MCTSNode(own, opponent, self._color, 0, None, moves)
+        
+        start = time.perf_counter()
+        deadline = start + self._time_limit if self._time_limit is not None else None
+        # 制限が 0 でも、少なくとも1回はプレイアウトして根の子ノードを作る
+        iterations = max(1, self._iterations) if self._iterations is not None else None
+        playouts = 0
+        while True:
+            if iterations is not None and playouts >= iterations:
+                break
+            if playouts and deadline is not None and time.perf_counter() >= deadline:
+                break
+            count = self._batch_size
+            if iterations is not None:
+                count = min(count, iterations - playouts)
+            leaves = [self._select(root) for _ in range(count)]
+            for leaf, result in zip(leaves, self._playout(leaves)):
+                self._backpropagate(leaf, result)
+            playouts += count
+        
+        self._last_playouts = playouts
+        self._last_elapsed = time.perf_counter() - start
+        best = max(root.children, key=lambda child: child.visits)
+        return divmod(best.move.bit_length() - 1, size)
+    
+    def _select(self, root: MCTSNode) -> MCTSNode:
+        """UCTで葉まで降り、未展開の手があれば1つ展開する
+        
+        通ったノードの訪問回数は先に増やしておく（仮想的な負け）。
+        まとめて複数の葉を選ぶとき、同じ経路ばかり選ばれないようにするため。
+        """
+        node = root
+        node.visits += 1
+        while not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            exploration = self._exploration
+            node = max(node.children, key=lambda child: (
+                child.wins / child.visits
+                + exploration * math.sqrt(log_visits / child.visits)))
+            node.visits += 1
+        
+        if node.untried:
+            move = random_bit(node.untried, self._rng)
+            node.untried ^= move
+            node = self._expand(node, move)
+            node.visits += 1
+        elif not node.children:
+            # パスしかない局面は、パスした子ノードを作る（終局なら葉のまま）
+            opponent_moves = self._board.generate_moves(node.opponent, node.own)
+            if opponent_moves:
+                child = MCTSNode(node.opponent, node.own, self._other(node.color), 0,
+                                 node, opponent_moves)
+                node.children.append(child)
+                node = child
+                node.visits += 1
+        return node
+    
+    def _expand(self, node: MCTSNode, move: int) -> MCTSNode:
+        """node で move を打った子ノードを作る"""
+        flips = self._board.compute_flips(node.own, node.opponent, move)
+        own = node.opponent & ~flips
+        opponent = node.own | move | flips
+        child = MCTSNode(own, opponent, self._other(node.color), move, node,
+                         self._board.generate_moves(own, opponent))
+        node.children.append(child)
+        return child
+    
+    def _playout(self, leaves: List[MCTSNode]) -> List[int]:
+        """葉からプレイアウトし、それぞれの手番側から見た最終石差を返す"""
+        if not self._workers:
+            return [random_playout(self._board, leaf.own, leaf.opponent, self._rng)
+                    for leaf in leaves]
+        
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self._workers)
+        size = self._board.get_size()
+        jobs = [(size, leaf.own, leaf.opponent, self._rng.getrandbits(32)) for leaf in leaves]
+        chunk = max(1, math.ceil(len(jobs) / self._workers))
+        results: List[int] = []
+        for part in self._pool.map(_playout_batch,
+                                   [jobs[i:i + chunk] for i in range(0, len(jobs), chunk)]):
+            results.extend(part)
+        return results
+    
+    def _backpropagate(self, leaf: MCTSNode, result: int) -> None:
+        """プレイアウトの結果を根まで伝える（訪問回数は選択時に加算済み）"""
+        # 葉の手番側から見た報酬（勝ち1, 引き分け0.5, 負け0）
+        reward = 1.0 if result > 0 else 0.5 if result == 0 else 0.0
+        node = leaf
+        while node is not None:
+            # wins はこのノードに至る手を打った側（手番の相手）から見た値
+            node.wins += 1.0 - reward if node.color == leaf.color else reward
+            node = node.parent
+    
+    def _other(self, color: int) -> int:
+        """相手の色を取得"""
+        return Disc.WHITE if color == Disc.BLACK else Disc.BLACK
+    
+    def get_last_stats(self) -> Tuple[int, float]:
+        """直前の探索の（プレイアウト回数, 秒数）を取得"""
+        return self._last_playouts, self._last_elapsed
+    
+    def close(self) -> None:
+        """プレイアウト用のプロセスプールを終了"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def main():
+    """メイン関数"""
+    print("=" * 40)
+    print("モンテカルロ木探索 対 CPU")
+    print("=" * 40)
+    
+    player1 = MCTSPlayer(Disc.BLACK, "MCTS（黒）", time_limit=0.5)
+    player2 = CPUPlayer(Disc.WHITE, "CPU（白）")
+    
+    game = OthelloGame(player1, player2)
+    view = GameView(game)
+    game.play()
+    view.show_result()
+    
+    playouts, elapsed = player1.get_last_stats()
+    if elapsed:
+        print(f"最後の探索: {playouts}回のプレイアウト ({playouts / elapsed:,.0f} 回/秒)")
+    player1.close()
+
+
+if __name__ == "__main__":
+    main()
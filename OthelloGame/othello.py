@@ -2,7 +2,7 @@
 オセロゲームのオブジェクト指向プログラミング実装例
 """
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import random
 
 
@@ -13,8 +13,69 @@ class Disc:
     WHITE = 2
 
 
+class ZobristKeys:
+    """ゾブリストハッシュ用の乱数表（マス×石の色ごとに64ビットの乱数）"""
+    
+    # 同じ大きさのボードは同じ乱数表を共有する
+    _instances: Dict[int, "ZobristKeys"] = {}
+    
+    def __init__(self, size: int, seed: int = 20240101):
+        """
+        Args:
+            size: ボードのサイズ
+            seed: 乱数表を作るときの乱数の種
+        """
+        rng = random.Random(seed + size)
+        squares = size * size
+        self._black = [rng.getrandbits(64) for _ in range(squares)]
+        self._white = [rng.getrandbits(64) for _ in range(squares)]
+        self._flip = [b ^ w for b, w in zip(self._black, self._white)]
+        self._side = rng.getrandbits(64)
+    
+    @classmethod
+    def for_size(cls, size: int) -> "ZobristKeys":
+        """指定サイズのボード用の乱数表を取得"""
+        if size not in cls._instances:
+            cls._instances[size] = cls(size)
+        return cls._instances[size]
+    
+    def get_disc_key(self, index: int, disc: int) -> int:
+        """マス（ビット番号）と石の色に対応する乱数を取得"""
+        if disc == Disc.BLACK:
+            return self._black[index]
+        if disc == Disc.WHITE:
+            return self._white[index]
+        return 0
+    
+    def get_flip_key(self, index: int) -> int:
+        """石を反転したときにハッシュへ排他的論理和する値を取得"""
+        return self._flip[index]
+    
+    def get_side_key(self) -> int:
+        """白番であることを表す乱数を取得"""
+        return self._side
+    
+    def hash_position(self, black: int, white: int) -> int:
+        """ビットボードからハッシュ値を一から計算"""
+        value = 0
+        for bits, keys in ((black, self._black), (white, self._white)):
+            while bits:
+                bit = bits & -bits
+                value ^= keys[bit.bit_length() - 1]
+                bits ^= bit
+        return value
+
+
 class Board:
-    """ゲームボードを管理するクラス"""
+    """ゲームボードを管理するクラス（ビットボード実装）
+    
+    黒石と白石の配置をそれぞれ1つの整数（ビット列）で保持する。
+    (row, col) のマスは row * size + col 番目のビットに対応する。
+    """
+    
+    # 8方向（行の増分, 列の増分）
+    DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1),
+                  (0, 1), (1, -1), (1, 0), (1, 1)]
     
     def __init__(self, size: int = 8):
         """
@@ -22,100 +83,332 @@ class Board:
             size: ボードのサイズ（デフォルト8×8）
         """
         self._size = size
-        self._grid = [[Disc.EMPTY for _ in range(size)] for _ in range(size)]
+        self._full_mask = (1 << (size * size)) - 1
+        self._black = 0
+        self._white = 0
+        # 石の数と合法手のキャッシュ（合法手は -1 なら未計算）
+        self._black_count = 0
+        self._white_count = 0
+        self._black_moves = -1
+        self._white_moves = -1
+        self._zobrist = ZobristKeys.for_size(size)
+        self._hash = 0
+        # 手を戻すための記録と直前のハッシュ値・黒石の数のスタック（make_move / unmake_move で使用）
+        self._undo_stack: List[int] = []
+        self._hash_stack: List[int] = []
+        self._count_stack: List[int] = []
+        self._record_shift = (size * size).bit_length() + 1
+        self._init_shift_masks()
         self._initialize_board()
     
+    def _init_shift_masks(self) -> None:
+        """方向ごとのシフト量と、盤端の回り込みを防ぐマスクを作成"""
+        size = self._size
+        left_column = 0
+        right_column = 0
+        for row in range(size):
+            left_column |= 1 << (row * size)
+            right_column |= 1 << (row * size + size - 1)
+        
+        # 左シフト（インデックスが増える方向）と右シフトに分けて保持
+        self._left_shifts: List[Tuple[int, int]] = []
+        self._right_shifts: List[Tuple[int, int]] = []
+        for dr, dc in self.DIRECTIONS:
+            mask = self._full_mask
+            if dc == 1:
+                mask &= ~left_column
+            elif dc == -1:
+                mask &= ~right_column
+            shift = dr * size + dc
+            if shift > 0:
+                self._left_shifts.append((shift, mask))
+            else:
+                self._right_shifts.append((-shift, mask))
+    
     def _initialize_board(self) -> None:
         """初期配置を設定（中央に黒白2個ずつ）"""
         mid = self._size // 2
-        self._grid[mid - 1][mid - 1] = Disc.WHITE
-        self._grid[mid - 1][mid] = Disc.BLACK
-        self._grid[mid][mid - 1] = Disc.BLACK
-        self._grid[mid][mid] = Disc.WHITE
+        self.set_disc(mid - 1, mid - 1, Disc.WHITE)
+        self.set_disc(mid - 1, mid, Disc.BLACK)
+        self.set_disc(mid, mid - 1, Disc.BLACK)
+        self.set_disc(mid, mid, Disc.WHITE)
+    
+    def _to_bit(self, row: int, col: int) -> int:
+        """位置をビットに変換"""
+        return 1 << (row * self._size + col)
     
     def get_disc(self, row: int, col: int) -> int:
         """指定位置の石を取得"""
-        return self._grid[row][col]
+        bit = self._to_bit(row, col)
+        if self._black & bit:
+            return Disc.BLACK
+        if self._white & bit:
+            return Disc.WHITE
+        return Disc.EMPTY
     
     def set_disc(self, row: int, col: int, disc: int) -> None:
         """指定位置に石を配置"""
-        self._grid[row][col] = disc
+        index = row * self._size + col
+        bit = 1 << index
+        self._hash ^= self._zobrist.get_disc_key(index, self.get_disc(row, col))
+        self._hash ^= self._zobrist.get_disc_key(index, disc)
+        self._black &= ~bit
+        self._white &= ~bit
+        if disc == Disc.BLACK:
+            self._black |= bit
+        elif disc == Disc.WHITE:
+            self._white |= bit
+        self._black_count = bin(self._black).count("1")
+        self._white_count = bin(self._white).count("1")
+        self._black_moves = self._white_moves = -1
+    
+    def set_position(self, black: int, white: int) -> None:
+        """黒石・白石のビットボードで盤面全体を置き換える（手を戻す記録は消える）"""
+        if black & white or (black | white) & ~self._full_mask:
+            raise ValueError("ビットボードが盤面と合いません")
+        self._black = black
+        self._white = white
+        self._hash = self._zobrist.hash_position(black, white)
+        self._black_count = bin(black).count("1")
+        self._white_count = bin(white).count("1")
+        self._black_moves = self._white_moves = -1
+        self._undo_stack.clear()
+        self._hash_stack.clear()
+        self._count_stack.clear()
     
     def is_valid_position(self, row: int, col: int) -> bool:
         """位置がボード内かチェック"""
         return 0 <= row < self._size and 0 <= col < self._size
     
+    def get_bitboards(self, color: int) -> Tuple[int, int]:
+        """指定色から見た（自分の石, 相手の石）のビットボードを取得"""
+        if color == Disc.BLACK:
+            return self._black, self._white
+        return self._white, self._black
+    
+    def generate_moves(self, own: int, opponent: int) -> int:
+        """ビットボードから合法手のビットマスクを計算"""
+        empty = ~(own | opponent) & self._full_mask
+        moves = 0
+        
+        # 自分の石から相手の石が続く方向へ伸ばし、その先の空きマスを合法手とする
+        for shift, mask in self._left_shifts:
+            x = (own << shift) & mask & opponent
+            while x:
+                x = (x << shift) & mask
+                moves |= x & empty
+                x &= opponent
+        for shift, mask in self._right_shifts:
+            x = (own >> shift) & mask & opponent
+            while x:
+                x = (x >> shift) & mask
+                moves |= x & empty
+                x &= opponent
+        
+        return moves
+    
+    def compute_flips(self, own: int, opponent: int, move: int) -> int:
+        """ビットボードから、move（1ビット）に置いたときに反転する石のマスクを計算"""
+        flips = 0
+        
+        for shift, mask in self._left_shifts:
+            line = 0
+            x = (move << shift) & mask
+            while x & opponent:
+                line |= x
+                x = (x << shift) & mask
+            if x & own:
+                flips |= line
+        for shift, mask in self._right_shifts:
+            line = 0
+            x = (move >> shift) & mask
+            while x & opponent:
+                line |= x
+                x = (x >> shift) & mask
+            if x & own:
+                flips |= line
+        
+        return flips
+    
+    def get_valid_moves_mask(self, color: int) -> int:
+        """指定色の合法手をビットマスクで取得
+        
+        結果は盤面が変わるまでキャッシュするので、同じ局面で何度呼んでもよい。
+        """
+        if color == Disc.BLACK:
+            if self._black_moves < 0:
+                self._black_moves = self.generate_moves(self._black, self._white)
+            return self._black_moves
+        if self._white_moves < 0:
+            self._white_moves = self.generate_moves(self._white, self._black)
+        return self._white_moves
+    
+    def has_valid_moves(self, color: int) -> bool:
+        """指定色に合法手があるかどうか"""
+        return self.get_valid_moves_mask(color) != 0
+    
+    def is_game_over(self) -> bool:
+        """両者とも合法手がない（終局）かどうか"""
+        return (not self.get_valid_moves_mask(Disc.BLACK)
+                and not self.get_valid_moves_mask(Disc.WHITE))
+    
+    def mask_to_positions(self, mask: int) -> List[Tuple[int, int]]:
+        """ビットマスクを位置のリストに変換（行優先の順）"""
+        positions = []
+        size = self._size
+        while mask:
+            bit = mask & -mask
+            positions.append(divmod(bit.bit_length() - 1, size))
+            mask ^= bit
+        return positions
+    
     def get_valid_moves(self, color: int) -> List[Tuple[int, int]]:
         """指定色の合法手リストを取得"""
-        valid_moves = []
-        for row in range(self._size):
-            for col in range(self._size):
-                if self._is_valid_move(row, col, color):
-                    valid_moves.append((row, col))
-        return valid_moves
-    
-    def _is_valid_move(self, row: int, col: int, color: int) -> bool:
-        """指定位置に石を置けるかチェック"""
-        if self._grid[row][col] != Disc.EMPTY:
-            return False
-        
-        opponent = Disc.WHITE if color == Disc.BLACK else Disc.BLACK
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), 
-                     (0, 1), (1, -1), (1, 0), (1, 1)]
-        
-        for dr, dc in directions:
-            if self._can_flip_in_direction(row, col, dr, dc, color, opponent):
-                return True
-        
-        return False
+        return self.mask_to_positions(self.get_valid_moves_mask(color))
     
-    def _can_flip_in_direction(self, row: int, col: int, dr: int, dc: int, 
-                               color: int, opponent: int) -> bool:
-        """指定方向に石を反転できるかチェック"""
-        r, c = row + dr, col + dc
-        found_opponent = False
-        
-        while self.is_valid_position(r, c):
-            if self._grid[r][c] == opponent:
-                found_opponent = True
-            elif self._grid[r][c] == color and found_opponent:
-                return True
-            else:
-                break
-            r, c = r + dr, c + dc
-        
-        return False
+    def is_valid_move(self, row: int, col: int, color: int) -> bool:
+        """指定位置に石を置けるかチェック"""
+        return bool(self.get_valid_moves_mask(color) & self._to_bit(row, col))
     
     def flip_discs(self, row: int, col: int, color: int) -> None:
         """石を配置して反転処理を実行"""
-        self._grid[row][col] = color
-        opponent = Disc.WHITE if color == Disc.BLACK else Disc.BLACK
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), 
-                     (0, 1), (1, -1), (1, 0), (1, 1)]
-        
-        for dr, dc in directions:
-            if self._can_flip_in_direction(row, col, dr, dc, color, opponent):
-                self._flip_in_direction(row, col, dr, dc, color, opponent)
+        index = row * self._size + col
+        bit = 1 << index
+        own, opponent = self.get_bitboards(color)
+        flips = self.compute_flips(own, opponent, bit)
+        
+        # ハッシュ値と石の数は置いた石と反転した石の分だけ差分更新する
+        if (own | opponent) & bit:
+            self._hash ^= self._zobrist.get_disc_key(index, self.get_disc(row, col))
+        self._hash ^= self._zobrist.get_disc_key(index, color)
+        self._xor_flip_keys(flips)
+        flipped = bin(flips).count("1")
+        self._add_counts(color, flipped + (0 if own & bit else 1),
+                         -flipped - (1 if opponent & bit else 0))
+        
+        own |= bit | flips
+        opponent &= ~(bit | flips)
+        self._set_bitboards(color, own, opponent)
+    
+    def make_move(self, row: int, col: int, color: int) -> int:
+        """石を置いて反転し、元に戻すための記録を返す
+        
+        記録は反転した石のマスク・置いたマス・色を1つの整数にまとめたもの。
+        盤面のコピーを作らずに unmake_move で元に戻せる。
+        """
+        index = row * self._size + col
+        bit = 1 << index
+        own, opponent = self.get_bitboards(color)
+        if (own | opponent) & bit:
+            raise ValueError("既に石が置かれているマスです")
+        flips = self.compute_flips(own, opponent, bit)
+        
+        self._hash_stack.append(self._hash)
+        self._count_stack.append(self._black_count)
+        self._hash ^= self._zobrist.get_disc_key(index, color)
+        self._xor_flip_keys(flips)
+        # 探索で最も多く呼ばれるので、ビットボードと石の数はここで直接更新する
+        flipped = bin(flips).count("1")
+        if color == Disc.BLACK:
+            self._black, self._white = own | bit | flips, opponent & ~flips
+            self._black_count += flipped + 1
+            self._white_count -= flipped
+        else:
+            self._white, self._black = own | bit | flips, opponent & ~flips
+            self._white_count += flipped + 1
+            self._black_count -= flipped
+        self._black_moves = self._white_moves = -1
+        
+        record = (flips << self._record_shift) | (index << 1) | (color == Disc.WHITE)
+        self._undo_stack.append(record)
+        return record
+    
+    def unmake_move(self, record: Optional[int] = None) -> None:
+        """make_move で打った手を元に戻す（record 省略時は直前の手）"""
+        if not self._undo_stack:
+            raise ValueError("戻す手がありません")
+        if record is not None and record != self._undo_stack[-1]:
+            raise ValueError("直前に打った手の記録ではありません")
+        record = self._undo_stack.pop()
+        
+        flips = record >> self._record_shift
+        index = (record & ((1 << self._record_shift) - 1)) >> 1
+        color = Disc.WHITE if record & 1 else Disc.BLACK
+        bit = 1 << index
+        own, opponent = self.get_bitboards(color)
+        
+        self._hash = self._hash_stack.pop()
+        # 石の総数は1つ減るだけなので、黒の数を戻せば白の数も決まる
+        black_count = self._count_stack.pop()
+        self._white_count += self._black_count - black_count - 1
+        self._black_count = black_count
+        self._set_bitboards(color, own & ~(bit | flips), opponent | flips)
+    
+    def get_undo_depth(self) -> int:
+        """unmake_move で戻せる手の数を取得"""
+        return len(self._undo_stack)
+    
+    def _set_bitboards(self, color: int, own: int, opponent: int) -> None:
+        """指定色から見た（自分の石, 相手の石）でビットボードを更新し、合法手のキャッシュを捨てる"""
+        if color == Disc.BLACK:
+            self._black, self._white = own, opponent
+        else:
+            self._white, self._black = own, opponent
+        self._black_moves = self._white_moves = -1
+    
+    def _add_counts(self, color: int, own_delta: int, opponent_delta: int) -> None:
+        """指定色から見た（自分の石, 相手の石）の数を増減"""
+        if color == Disc.BLACK:
+            self._black_count += own_delta
+            self._white_count += opponent_delta
+        else:
+            self._white_count += own_delta
+            self._black_count += opponent_delta
     
-    def _flip_in_direction(self, row: int, col: int, dr: int, dc: int, 
-                          color: int, opponent: int) -> None:
-        """指定方向の石を反転"""
-        r, c = row + dr, col + dc
-        
-        while self.is_valid_position(r, c) and self._grid[r][c] == opponent:
-            self._grid[r][c] = color
-            r, c = r + dr, c + dc
+    def _xor_flip_keys(self, flips: int) -> None:
+        """反転した石の分だけハッシュ値を更新"""
+        zobrist = self._zobrist
+        while flips:
+            flipped = flips & -flips
+            self._hash ^= zobrist.get_flip_key(flipped.bit_length() - 1)
+            flips ^= flipped
     
     def count_discs(self, color: int) -> int:
-        """指定色の石の数をカウント"""
-        count = 0
-        for row in self._grid:
-            count += row.count(color)
-        return count
+        """指定色の石の数をカウント（差分更新している値を返す）"""
+        if color == Disc.BLACK:
+            return self._black_count
+        if color == Disc.WHITE:
+            return self._white_count
+        return self._size * self._size - self._black_count - self._white_count
     
     def get_size(self) -> int:
         """ボードのサイズを取得"""
         return self._size
+    
+    def get_shift_masks(self) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """合法手生成に使う（左シフト, 右シフト）それぞれの (シフト量, マスク) の一覧を取得"""
+        return list(self._left_shifts), list(self._right_shifts)
+    
+    def get_full_mask(self) -> int:
+        """盤面のすべてのマスのビットが立ったマスクを取得"""
+        return self._full_mask
+    
+    def get_hash(self) -> int:
+        """石の配置のゾブリストハッシュ値を取得（手番は含まない）"""
+        return self._hash
+    
+    def get_zobrist_keys(self) -> ZobristKeys:
+        """ハッシュ計算に使う乱数表を取得"""
+        return self._zobrist
+    
+    def copy(self) -> "Board":
+        """ボードの複製を作成"""
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board._undo_stack = list(self._undo_stack)
+        board._hash_stack = list(self._hash_stack)
+        board._count_stack = list(self._count_stack)
+        return board
 
 
 class Player(ABC):
@@ -172,8 +465,32 @@ class HumanPlayer(Player):
 class CPUPlayer(Player):
     """CPUプレイヤークラス"""
     
+    def __init__(self, color: int, name: str, endgame_solver=None, opening_book=None):
+        """
+        Args:
+            color: プレイヤーの石の色
+            name: プレイヤー名
+            endgame_solver: 終盤の完全読みソルバー（省略時は最後まで簡易評価で打つ）
+            opening_book: 序盤に参照する定石データベース（省略時は参照しない）
+        """
+        super().__init__(color, name)
+        self._endgame_solver = endgame_solver
+        self._opening_book = opening_book
+    
     def get_move(self, board: Board) -> Optional[Tuple[int, int]]:
         """合法手から最適な手を選択"""
+        if self._opening_book is not None:
+            move = self._opening_book.lookup(board, self._color)
+            if move is not None and board.is_valid_move(move[0], move[1], self._color):
+                return move
+        if self._endgame_solver is not None and self._endgame_solver.can_solve(board):
+            move = self._endgame_solver.solve(board, self._color).get_move()
+            if move is not None:
+                return move
+        return self._choose_move(board)
+    
+    def _choose_move(self, board: Board) -> Optional[Tuple[int, int]]:
+        """完全読み以外で手を選択（サブクラスで差し替える）"""
         valid_moves = board.get_valid_moves(self._color)
         
         if not valid_moves:
@@ -222,25 +539,25 @@ class CPUPlayer(Player):
 class OthelloGame:
     """オセロゲーム全体を管理するクラス"""
     
-    def __init__(self, player1: Player, player2: Player):
+    def __init__(self, player1: Player, player2: Player, recorder=None):
         """
         Args:
             player1: プレイヤー1（黒）
             player2: プレイヤー2（白）
+            recorder: 打った手を記録するレコーダー（省略時は記録しない）
         """
         self._board = Board()
         self._player1 = player1
         self._player2 = player2
         self._current_player = player1
+        self._recorder = recorder
     
     def play(self) -> None:
         """ゲームのメインループ"""
         consecutive_passes = 0
         
         while not self.is_game_over():
-            valid_moves = self._board.get_valid_moves(self._current_player.get_color())
-            
-            if not valid_moves:
+            if not self._board.has_valid_moves(self._current_player.get_color()):
                 print(f"\n{self._current_player.get_name()}はパスです。")
                 consecutive_passes += 1
                 self.switch_turn()
@@ -255,15 +572,18 @@ class OthelloGame:
             if move:
                 self.make_move(move[0], move[1])
                 self.switch_turn()
+        
+        if self._recorder is not None:
+            self._recorder.finish(self._board)
     
     def make_move(self, row: int, col: int) -> bool:
         """指定位置に石を置く"""
-        valid_moves = self._board.get_valid_moves(self._current_player.get_color())
-        
-        if (row, col) not in valid_moves:
+        if not self._board.is_valid_move(row, col, self._current_player.get_color()):
             return False
         
         self._board.flip_discs(row, col, self._current_player.get_color())
+        if self._recorder is not None:
+            self._recorder.record_move(self._board, row, col)
         return True
     
     def switch_turn(self) -> None:
@@ -273,9 +593,7 @@ class OthelloGame:
     
     def is_game_over(self) -> bool:
         """ゲーム終了判定"""
-        black_moves = self._board.get_valid_moves(Disc.BLACK)
-        white_moves = self._board.get_valid_moves(Disc.WHITE)
-        return not black_moves and not white_moves
+        return self._board.is_game_over()
     
     def get_winner(self) -> Optional[Player]:
         """勝者を判定"""
@@ -379,9 +697,7 @@ def main():
         white_count = board.count_discs(Disc.WHITE)
         print(f"現在の石数 - 黒: {black_count}個, 白: {white_count}個")
         
-        valid_moves = board.get_valid_moves(current.get_color())
-        
-        if not valid_moves:
+        if not board.has_valid_moves(current.get_color()):
             view.display_message(f"{current.get_name()}はパスです。")
             game.switch_turn()
             continue
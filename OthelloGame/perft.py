@@ -0,0 +1,244 @@
+"""
+オセロの合法手生成の検証（perft）と速度計測
+
+perft は指定した深さまでの末端局面の数を数える。パスは1手として数え、
+両者とも打てなくなった局面はその時点で末端とする。既知の値と一致すれば、
+合法手生成と石の反転が正しく動いていることを確認できる。
+
+使い方:
+    python perft.py perft --depth 8
+    python perft.py bench --output bench.json
+    python perft.py bench --compare bench.json
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from othello import Board, Disc
+
+
+# 初期局面からの末端局面数（深さ1から）
+START_COUNTS = [4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284]
+
+# 検証用の局面（行優先の64文字: X=黒, O=白, -=空き）, 手番, 深さ1からの末端局面数
+TEST_POSITIONS: List[Tuple[str, str, List[int]]] = [
+    ("-O-X------OX-------XO-----XXO----XXXO----XOXO---OO-OOX--O---O---", "X",
+     [11, 133, 1464, 16834, 186331]),
+    ("-------X------X-OXXXXX--OOXXXXX-OOOXXX---OXOXX---XXXX---X--XXO--", "X",
+     [3, 33, 174, 2153, 15548]),
+    ("-XXXXX---OOOOX--XOOXOOOO-OXOOOO-OOXOOX--OOX-OOOOOXXXXXX-X----XXX", "X",
+     [9, 83, 747, 6099, 51172, 367545]),
+    # 途中でパスが現れる局面
+    ("XOOOOO-OXOOOOO-OXOOOOOOOXO-XOOO-OOOOXXOX-OOOOOXX-O-OOXXX---O---X", "O",
+     [3, 27, 88, 729, 2663, 18213]),
+    # 数手で終局する局面
+    ("XOOOO-OXXOOOOOXXXOXXOXOXXOXOXOXXXXXXOOOXXXXOOO-OXXXXXXOOX-XOOOOO", "O",
+     [2, 3, 3, 3, 3, 3, 3]),
+]
+
+
+def opponent_of(color: int) -> int:
+    """相手の色を取得"""
+    return Disc.WHITE if color == Disc.BLACK else Disc.BLACK
+
+
+def parse_position(text: str, side: str) -> Tuple[Board, int]:
+    """64文字の局面表記と手番（X/O）からボードを作る"""
+    board = Board()
+    size = board.get_size()
+    if len(text) != size * size:
+        raise ValueError(f"局面は{size * size}文字で指定してください: {text}")
+    discs = {"X": Disc.BLACK, "O": Disc.WHITE, "-": Disc.EMPTY}
+    for index, char in enumerate(text):
+        board.set_disc(index // size, index % size, discs[char])
+    return board, Disc.BLACK if side == "X" else Disc.WHITE
+
+
+def perft(board: Board, color: int, depth: int) -> int:
+    """指定した深さまでの末端局面の数を数える"""
+    if depth == 0:
+        return 1
+    moves = board.get_valid_moves(color)
+    if not moves:
+        if not board.get_valid_moves_mask(opponent_of(color)):
+            return 1
+        return perft(board, opponent_of(color), depth - 1)
+    
+    total = 0
+    for row, col in moves:
+        record = board.make_move(row, col, color)
+        total += perft(board, opponent_of(color), depth - 1)
+        board.unmake_move(record)
+    return total
+
+
+def run_perft(max_depth: int) -> bool:
+    """初期局面と検証用局面で perft を実行し、既知の値と比べる"""
+    ok = True
+    cases = [(Board(), Disc.BLACK, START_COUNTS, "初期局面")]
+    for i, (text, side, counts) in enumerate(TEST_POSITIONS):
+        board, color = parse_position(text, side)
+        cases.append((board, color, counts, f"検証局面{i + 1}"))
+    
+    for board, color, counts, label in cases:
+        print(label)
+        for depth in range(1, min(max_depth, len(counts)) + 1):
+            start = time.perf_counter()
+            nodes = perft(board, color, depth)
+            elapsed = time.perf_counter() - start
+            status = "OK" if nodes == counts[depth - 1] else f"NG（正しくは {counts[depth - 1]}）"
+            ok = ok and nodes == counts[depth - 1]
+            rate = nodes / elapsed if elapsed > 0 else 0.0
+            print(f"  深さ{depth}: {nodes} {status} {elapsed:.3f}秒 ({rate:,.0f} 局面/秒)")
+    return ok
+
+
+def sample_positions(count: int, seed: int) -> List[Tuple[Board, int]]:
+    """ランダムな対局から、合法手のある局面を集める"""
+    rng = random.Random(seed)
+    positions: List[Tuple[Board, int]] = []
+    while len(positions) < count:
+        board = Board()
+        color = Disc.BLACK
+        moves = board.get_valid_moves(color)
+        while moves and len(positions) < count:
+            positions.append((board.copy(), color))
+            board.flip_discs(*rng.choice(moves), color)
+            color = opponent_of(color)
+            moves = board.get_valid_moves(color)
+    return positions
+
+
+def measure(function, duration: float) -> Tuple[int, float]:
+    """function（処理した件数を返す）を指定秒数くり返し、(件数, 秒数) を返す"""
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < duration:
+        count += function()
+        elapsed = time.perf_counter() - start
+    return count, elapsed
+
+
+def run_benchmark(duration: float, seed: int = 0) -> Dict[str, Any]:
+    """合法手生成・石の反転・自己対局・perft の速度を計測"""
+    positions = sample_positions(1000, seed)
+    moves = [(board, color, board.get_valid_moves(color)) for board, color in positions]
+    results: Dict[str, Any] = {}
+    
+    # Board は合法手をキャッシュするので、ビットボードから直接生成して計る
+    bitboards = [board.get_bitboards(color) for board, color in positions]
+    generator = Board()
+    
+    def generate() -> int:
+        for own, opponent in bitboards:
+            generator.mask_to_positions(generator.generate_moves(own, opponent))
+        return len(bitboards)
+    
+    def flip() -> int:
+        count = 0
+        for board, color, legal in moves:
+            for row, col in legal:
+                board.make_move(row, col, color)
+                board.unmake_move()
+            count += len(legal)
+        return count
+    
+    def flip_copy() -> int:
+        count = 0
+        for board, color, legal in moves:
+            for row, col in legal:
+                board.copy().flip_discs(row, col, color)
+            count += len(legal)
+        return count
+    
+    rng = random.Random(seed)
+    
+    def self_play() -> int:
+        board = Board()
+        color = Disc.BLACK
+        plies = 0
+        passes = 0
+        while passes < 2:
+            legal = board.get_valid_moves(color)
+            if legal:
+                board.flip_discs(*rng.choice(legal), color)
+                passes = 0
+                plies += 1
+            else:
+                passes += 1
+            color = opponent_of(color)
+        return plies
+    
+    def perft_start() -> int:
+        return perft(Board(), Disc.BLACK, 5)
+    
+    for name, function, unit in [
+        ("move_generation", generate, "局面"),
+        ("make_unmake", flip, "手"),
+        ("copy_flip_discs", flip_copy, "手"),
+        ("self_play", self_play, "手"),
+        ("perft", perft_start, "局面"),
+    ]:
+        count, elapsed = measure(function, duration)
+        results[name] = {"count": count, "seconds": round(elapsed, 6),
+                         "per_second": round(count / elapsed, 1), "unit": unit}
+    
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "duration": duration,
+        "results": results,
+    }
+
+
+def print_benchmark(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    """計測結果を表示（比較対象があれば速度の比も表示）"""
+    print(f"Python {report['python']} ({report['implementation']}, {report['machine']})")
+    for name, result in report["results"].items():
+        line = f"  {name:16s} {result['per_second']:>14,.0f} {result['unit']}/秒"
+        if baseline and name in baseline.get("results", {}):
+            ratio = result["per_second"] / baseline["results"][name]["per_second"]
+            line += f"  (比較対象の {ratio:.2f} 倍)"
+        print(line)
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="オセロの合法手生成の検証と速度計測")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    perft_parser = subparsers.add_parser("perft", help="末端局面数を既知の値と比べる")
+    perft_parser.add_argument("--depth", type=int, default=6, help="最大の深さ")
+    
+    bench_parser = subparsers.add_parser("bench", help="速度を計測する")
+    bench_parser.add_argument("--duration", type=float, default=1.0, help="1項目あたりの秒数")
+    bench_parser.add_argument("--output", default=None, help="結果を書き出すJSONファイル")
+    bench_parser.add_argument("--compare", default=None, help="比較対象のJSONファイル")
+    
+    args = parser.parse_args()
+    
+    if args.command == "perft":
+        if not run_perft(args.depth):
+            sys.exit(1)
+        return
+    
+    report = run_benchmark(args.duration)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_benchmark(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
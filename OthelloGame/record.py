@@ -0,0 +1,321 @@
+"""
+オセロの棋譜の記録と読み出し（1手1バイトのバイナリ形式）
+
+棋譜ファイルは追記専用で、先頭のファイルヘッダーの後に対局が順に並ぶ。
+1局は「手数, 黒の石数, 白の石数」の3バイトのヘッダーと、1手1バイトのマス番号
+（row * size + col）からなる。パスは盤面から分かるので記録しない。
+読み出しはジェネレーターで1局ずつ行うので、ファイルの大きさによらず
+少ないメモリで集計できる。
+
+使い方:
+    python record.py generate --games 100000 --output games.rec
+    python record.py stats --archive games.rec --plies 2
+    python record.py show --archive games.rec --index 0
+"""
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+import argparse
+import os
+import random
+import struct
+import time
+
+from othello import Board, Disc
+
+
+# ファイル先頭: マジックナンバー, バージョン, ボードのサイズ
+FILE_HEADER = struct.Struct("<4sHB")
+MAGIC = b"OTGR"
+VERSION = 1
+# 1局のヘッダー: 手数, 黒の石数, 白の石数
+GAME_HEADER = struct.Struct("<BBB")
+
+
+def square_name(index: int, size: int = 8) -> str:
+    """マス番号を "d3" のような表記にする（列は a から、行は 1 から）"""
+    row, col = divmod(index, size)
+    return f"{chr(ord('a') + col)}{row + 1}"
+
+
+class GameRecord:
+    """1局分の棋譜"""
+    
+    __slots__ = ("_moves", "_black", "_white")
+    
+    def __init__(self, moves: bytes, black: int, white: int):
+        """
+        Args:
+            moves: 1手1バイトのマス番号の列（パスは含まない）
+            black: 終局時の黒の石数
+            white: 終局時の白の石数
+        """
+        self._moves = moves
+        self._black = black
+        self._white = white
+    
+    def get_moves(self) -> bytes:
+        """マス番号の列を取得"""
+        return self._moves
+    
+    def get_black_discs(self) -> int:
+        """終局時の黒の石数を取得"""
+        return self._black
+    
+    def get_white_discs(self) -> int:
+        """終局時の白の石数を取得"""
+        return self._white
+    
+    def get_winner(self) -> int:
+        """勝った色を取得（引き分けは Disc.EMPTY）"""
+        if self._black > self._white:
+            return Disc.BLACK
+        if self._white > self._black:
+            return Disc.WHITE
+        return Disc.EMPTY
+    
+    def to_bytes(self) -> bytes:
+        """ヘッダーを付けたバイト列に変換"""
+        return GAME_HEADER.pack(len(self._moves), self._black, self._white) + self._moves
+
+
+class GameArchive:
+    """棋譜を追記していくファイル"""
+    
+    def __init__(self, path: str, size: int = 8):
+        """
+        既存のファイルの末尾に書き込み途中で止まった1局があれば、切り詰めてから追記する
+        （そのまま追記すると、それ以降の対局が正しく読み出せなくなるため）。
+        
+        Args:
+            path: 棋譜ファイルのパス（なければ作る）
+            size: ボードのサイズ（既存のファイルと違えばエラー）
+        """
+        self._size = size
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, "r+b") as f:
+                if read_file_header(f, path) != size:
+                    raise ValueError(f"ボードのサイズが棋譜ファイルと違います: {path}")
+                end = find_complete_end(f)
+                if end < os.path.getsize(path):
+                    f.truncate(end)
+        self._file = open(path, "ab")
+        if not exists:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION, size))
+    
+    def __enter__(self) -> "GameArchive":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def get_size(self) -> int:
+        """ボードのサイズを取得"""
+        return self._size
+    
+    def append(self, record: GameRecord) -> None:
+        """1局を追記"""
+        self._file.write(record.to_bytes())
+    
+    def flush(self) -> None:
+        """書き込みをファイルに反映"""
+        self._file.flush()
+    
+    def close(self) -> None:
+        """ファイルを閉じる"""
+        self._file.close()
+
+
+class GameRecorder:
+    """対局中の手を記録し、終局時に棋譜にするクラス（OthelloGame に渡して使う）"""
+    
+    def __init__(self, archive: Optional[GameArchive] = None):
+        """
+        Args:
+            archive: 終局した対局を追記する棋譜ファイル（省略時は追記しない）
+        """
+        self._archive = archive
+        self._moves = bytearray()
+    
+    def record_move(self, board: Board, row: int, col: int) -> None:
+        """打った手を記録"""
+        self._moves.append(row * board.get_size() + col)
+    
+    def finish(self, board: Board) -> GameRecord:
+        """終局した対局を棋譜にし、棋譜ファイルがあれば追記する"""
+        record = GameRecord(bytes(self._moves), board.count_discs(Disc.BLACK),
+                            board.count_discs(Disc.WHITE))
+        if self._archive is not None:
+            if board.get_size() != self._archive.get_size():
+                raise ValueError("ボードのサイズが棋譜ファイルと違います")
+            self._archive.append(record)
+        self._moves = bytearray()
+        return record
+
+
+def read_file_header(f: BinaryIO, path: str = "") -> int:
+    """ファイルヘッダーを読んでボードのサイズを返す"""
+    header = f.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size:
+        raise ValueError(f"棋譜ファイルの形式が正しくありません: {path}")
+    magic, version, size = FILE_HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"棋譜ファイルの形式が正しくありません: {path}")
+    return size
+
+
+def find_complete_end(f: BinaryIO) -> int:
+    """ファイルヘッダーの後ろから対局をたどり、最後の完全な1局の終わりの位置を返す"""
+    position = f.tell()
+    length = f.seek(0, os.SEEK_END)
+    header_size = GAME_HEADER.size
+    while position + header_size <= length:
+        f.seek(position)
+        end = position + header_size + f.read(header_size)[0]
+        if end > length:
+            break
+        position = end
+    return position
+
+
+def read_games(path: str) -> Iterator[GameRecord]:
+    """棋譜ファイルから1局ずつ読み出す
+    
+    書き込み途中で止まった最後の1局（ヘッダーか手が足りないもの）は読み飛ばす。
+    """
+    with open(path, "rb") as f:
+        read_file_header(f, path)
+        read = f.read
+        unpack = GAME_HEADER.unpack
+        header_size = GAME_HEADER.size
+        while True:
+            header = read(header_size)
+            if len(header) < header_size:
+                return
+            count, black, white = unpack(header)
+            moves = read(count)
+            if len(moves) < count:
+                return
+            yield GameRecord(moves, black, white)
+
+
+def replay(record: GameRecord, size: int = 8) -> Iterator[Tuple[Board, int, int]]:
+    """棋譜を初手から再生し、各手を打った後の (ボード, 打った色, マス番号) を返す
+    
+    ボードは1つを使い回すので、残しておきたい場合は copy() すること。
+    パスは手番の色だけを入れ替えて進める。
+    """
+    board = Board(size)
+    color = Disc.BLACK
+    for index in record.get_moves():
+        moves = board.get_valid_moves_mask(color)
+        if not moves:
+            color = Disc.WHITE if color == Disc.BLACK else Disc.BLACK
+            moves = board.get_valid_moves_mask(color)
+        if not moves >> index & 1:
+            raise ValueError(f"棋譜に不正な手があります: {square_name(index, size)}")
+        board.make_move(index // size, index % size, color)
+        yield board, color, index
+        color = Disc.WHITE if color == Disc.BLACK else Disc.BLACK
+
+
+def opening_stats(games: Iterator[GameRecord], plies: int) -> Dict[bytes, List[int]]:
+    """序盤の手順ごとに [対局数, 黒勝ち, 白勝ち, 引き分け] を集計する
+    
+    手順は棋譜の先頭 plies バイトをそのまま使うので、盤面は再生しない。
+    メモリは手順の種類の数に比例し、対局数にはよらない。
+    """
+    stats: Dict[bytes, List[int]] = {}
+    for record in games:
+        moves = record.get_moves()
+        if len(moves) < plies:
+            continue
+        key = moves[:plies]
+        entry = stats.get(key)
+        if entry is None:
+            entry = stats[key] = [0, 0, 0, 0]
+        entry[0] += 1
+        black, white = record.get_black_discs(), record.get_white_discs()
+        entry[1 if black > white else 2 if white > black else 3] += 1
+    return stats
+
+
+def random_game(rng: random.Random, size: int = 8) -> GameRecord:
+    """ランダムに打った1局の棋譜を作る"""
+    board = Board(size)
+    recorder = GameRecorder()
+    color = Disc.BLACK
+    opponent = Disc.WHITE
+    while True:
+        moves = board.get_valid_moves(color)
+        if not moves:
+            if not board.has_valid_moves(opponent):
+                break
+        else:
+            row, col = rng.choice(moves)
+            board.flip_discs(row, col, color)
+            recorder.record_move(board, row, col)
+        color, opponent = opponent, color
+    return recorder.finish(board)
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="オセロの棋譜ファイル")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    generate = subparsers.add_parser("generate", help="ランダムな対局の棋譜を追記する")
+    generate.add_argument("--games", type=int, default=10000, help="対局数")
+    generate.add_argument("--seed", type=int, default=0, help="乱数の種")
+    generate.add_argument("--output", default="games.rec", help="棋譜ファイル")
+    
+    stats = subparsers.add_parser("stats", help="序盤の手順ごとの勝率を集計する")
+    stats.add_argument("--archive", default="games.rec", help="棋譜ファイル")
+    stats.add_argument("--plies", type=int, default=2, help="序盤の手数")
+    stats.add_argument("--top", type=int, default=20, help="表示する手順の数")
+    
+    show = subparsers.add_parser("show", help="1局を再生して表示する")
+    show.add_argument("--archive", default="games.rec", help="棋譜ファイル")
+    show.add_argument("--index", type=int, default=0, help="何局目か（0から）")
+    
+    args = parser.parse_args()
+    start = time.perf_counter()
+    
+    if args.command == "generate":
+        rng = random.Random(args.seed)
+        with GameArchive(args.output) as archive:
+            for _ in range(args.games):
+                archive.append(random_game(rng))
+        print(f"{args.output} に {args.games} 局を追記しました。"
+              f"（{time.perf_counter() - start:.1f}秒）")
+    
+    elif args.command == "stats":
+        with open(args.archive, "rb") as f:
+            size = read_file_header(f, args.archive)
+        results = opening_stats(read_games(args.archive), args.plies)
+        total = sum(entry[0] for entry in results.values())
+        elapsed = time.perf_counter() - start
+        print(f"{total}局, {len(results)}通りの手順（{elapsed:.1f}秒, {total / elapsed:,.0f} 局/秒）")
+        print(f"{'手順':<{3 * args.plies}} {'対局数':>8} {'黒勝率':>7} {'白勝率':>7} {'引分':>6}")
+        ranked = sorted(results.items(), key=lambda item: -item[1][0])
+        for key, (games, black, white, draws) in ranked[:args.top]:
+            opening = " ".join(square_name(index, size) for index in key)
+            print(f"{opening:<{3 * args.plies}} {games:>8} {black / games:>7.1%} "
+                  f"{white / games:>7.1%} {draws:>6}")
+    
+    else:
+        with open(args.archive, "rb") as f:
+            size = read_file_header(f, args.archive)
+        for index, record in enumerate(read_games(args.archive)):
+            if index == args.index:
+                break
+        else:
+            raise SystemExit(f"{args.index}局目はありません")
+        names = []
+        for board, color, square in replay(record, size):
+            names.append(("●" if color == Disc.BLACK else "○") + square_name(square, size))
+        print(" ".join(names))
+        print(f"黒: {record.get_black_discs()}個, 白: {record.get_white_discs()}個")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+"""
+オセロの探索AI（ネガマックス法＋アルファベータ枝刈り＋反復深化）
+"""
+from typing import Dict, List, Optional, Tuple
+import sys
+import time
+
+from endgame import EndgameSolver
+from othello import Board, CPUPlayer, Disc, GameView, OthelloGame
+
+
+# 終局時の石差に掛ける倍率（評価関数の値より必ず大きくなるようにする）
+FINAL_SCORE_SCALE = 10000
+INFINITY = 1 << 30
+
+
+def opponent_of(color: int) -> int:
+    """相手の色を取得"""
+    return Disc.WHITE if color == Disc.BLACK else Disc.BLACK
+
+
+def popcount(bits: int) -> int:
+    """立っているビットの数を数える"""
+    return bin(bits).count("1")
+
+
+def square_weight(row: int, col: int, size: int) -> int:
+    """マスの位置による重み（角は高く、角の隣は低い）"""
+    last = size - 1
+    edge_row = row in (0, last)
+    edge_col = col in (0, last)
+    near_row = row in (1, last - 1)
+    near_col = col in (1, last - 1)
+    
+    if edge_row and edge_col:
+        return 100   # 角
+    if near_row and near_col:
+        return -50   # 角の斜め隣（X打ち）
+    if (edge_row and near_col) or (near_row and edge_col):
+        return -20   # 角の縦横隣（C打ち）
+    if edge_row or edge_col:
+        return 5     # 辺
+    if near_row or near_col:
+        return -2    # 辺の1つ内側
+    return -1        # 中央
+
+
+class WeightTableEvaluator:
+    """マスの重み表と着手可能数による静的評価関数"""
+    
+    # 葉の局面をまとめて評価した方が速いかどうか（1局面ずつ評価する）
+    PREFERS_BATCH = False
+    
+    def __init__(self, board: Board, mobility_weight: int = 10):
+        """
+        Args:
+            board: 盤面の大きさと合法手生成に使うボード
+            mobility_weight: 着手可能数の差に掛ける重み
+        """
+        self._board = board
+        self._mobility_weight = mobility_weight
+        size = board.get_size()
+        
+        # 同じ重みのマスを1つのマスクにまとめておく
+        masks: Dict[int, int] = {}
+        for row in range(size):
+            for col in range(size):
+                weight = square_weight(row, col, size)
+                masks[weight] = masks.get(weight, 0) | (1 << (row * size + col))
+        self._weight_masks: List[Tuple[int, int]] = sorted(masks.items(), reverse=True)
+    
+    def evaluate(self, own: int, opponent: int) -> int:
+        """手番側から見た評価値を計算"""
+        score = 0
+        for weight, mask in self._weight_masks:
+            score += weight * (popcount(own & mask) - popcount(opponent & mask))
+        
+        if self._mobility_weight:
+            own_moves = popcount(self._board.generate_moves(own, opponent))
+            opponent_moves = popcount(self._board.generate_moves(opponent, own))
+            score += self._mobility_weight * (own_moves - opponent_moves)
+        
+        return score
+    
+    def evaluate_batch(self, owns: List[int], opponents: List[int]) -> List[int]:
+        """複数の局面をまとめて評価"""
+        return [self.evaluate(own, opponent) for own, opponent in zip(owns, opponents)]
+    
+    def get_weight_masks(self) -> List[Tuple[int, int]]:
+        """（重み, マスク）の一覧を重みの大きい順に取得"""
+        return list(self._weight_masks)
+
+
+class TranspositionTable:
+    """探索済み局面を記録する固定サイズの置換表
+    
+    局面のハッシュ値の下位ビットでスロットを決め、1スロットに1局面を保持する。
+    同じスロットに別の局面を書き込むときは、より深く探索した結果を優先する。
+    """
+    
+    # 評価値の種類
+    EXACT = 0   # 正確な値
+    LOWER = 1   # 下限値（beta カットした）
+    UPPER = 2   # 上限値（alpha を超えなかった）
+    
+    def __init__(self, size: int = 1 << 18):
+        """
+        Args:
+            size: スロット数（2のべき乗に切り上げる）
+        """
+        capacity = 1
+        while capacity < size:
+            capacity <<= 1
+        self._mask = capacity - 1
+        # 各スロットは (ハッシュ値, 深さ, 評価値, 種類, 最善手, 世代) のタプル
+        self._entries: List[Optional[tuple]] = [None] * capacity
+        self._generation = 0
+        self._filled = 0
+        self.reset_stats()
+    
+    @classmethod
+    def for_memory(cls, megabytes: float) -> "TranspositionTable":
+        """メモリ使用量の目安（MB）からスロット数を決めて作成"""
+        slots = int(megabytes * 1024 * 1024 / cls.estimate_entry_bytes())
+        # 指定量を超えないよう、2のべき乗に切り捨てる
+        capacity = 1
+        while capacity * 2 <= slots:
+            capacity <<= 1
+        return cls(capacity)
+    
+    @staticmethod
+    def estimate_entry_bytes() -> int:
+        """1スロットが埋まったときのおおよそのメモリ使用量（バイト）"""
+        sample = ((1 << 64) - 1, 10, -12345, 0, 1 << 63, 1)
+        return (8 + sys.getsizeof(sample)
+                + sys.getsizeof(sample[0]) + sys.getsizeof(sample[2]) + sys.getsizeof(sample[4]))
+    
+    def new_search(self) -> None:
+        """新しい探索の開始を記録（古い世代の記録は上書きされやすくなる）"""
+        self._generation += 1
+    
+    def probe(self, key: int) -> Optional[tuple]:
+        """局面の記録を取得（なければNone）"""
+        entry = self._entries[key & self._mask]
+        if entry is None:
+            self._misses += 1
+            return None
+        if entry[0] != key:
+            self._misses += 1
+            self._collisions += 1
+            return None
+        self._hits += 1
+        return entry
+    
+    def store(self, key: int, depth: int, score: int, flag: int, move: Optional[int]) -> None:
+        """局面の探索結果を記録（深さ優先の置き換え）"""
+        index = key & self._mask
+        entry = self._entries[index]
+        if entry is not None and entry[0] != key:
+            if entry[5] == self._generation and entry[1] > depth:
+                self._rejected += 1
+                return
+            self._overwrites += 1
+        if entry is None:
+            self._filled += 1
+        self._stores += 1
+        self._entries[index] = (key, depth, score, flag, move, self._generation)
+    
+    def clear(self) -> None:
+        """記録と統計をすべて消去"""
+        self._entries = [None] * (self._mask + 1)
+        self._generation = 0
+        self._filled = 0
+        self.reset_stats()
+    
+    def reset_stats(self) -> None:
+        """統計カウンタをリセット（記録は残す）"""
+        self._hits = 0
+        self._misses = 0
+        self._collisions = 0
+        self._stores = 0
+        self._overwrites = 0
+        self._rejected = 0
+    
+    def get_size(self) -> int:
+        """スロット数を取得"""
+        return self._mask + 1
+    
+    def get_stats(self) -> Dict[str, float]:
+        """ヒット・ミス・衝突などの統計を取得"""
+        probes = self._hits + self._misses
+        return {
+            "size": self._mask + 1,
+            "hits": self._hits,
+            "misses": self._misses,
+            "collisions": self._collisions,
+            "stores": self._stores,
+            "overwrites": self._overwrites,
+            "rejected": self._rejected,
+            "hit_rate": self._hits / probes if probes else 0.0,
+            "fill_rate": self._filled / (self._mask + 1),
+            "estimated_bytes": self._filled * self.estimate_entry_bytes()
+                               + 8 * (self._mask + 1),
+        }
+
+
+class SearchAborted(Exception):
+    """時間またはノード数の上限に達したことを表す例外"""
+    pass
+
+
+class SearchResult:
+    """探索結果"""
+    
+    def __init__(self, move: Optional[Tuple[int, int]], score: int, depth: int,
+                 nodes: int, elapsed: float, pv: List[Optional[Tuple[int, int]]]):
+        """
+        Args:
+            move: 最善手（合法手がない場合はNone）
+            score: 手番側から見た評価値
+            depth: 探索を完了した深さ
+            nodes: 探索したノード数
+            elapsed: 探索にかかった秒数
+            pv: 読み筋（Noneはパス）
+        """
+        self._move = move
+        self._score = score
+        self._depth = depth
+        self._nodes = nodes
+        self._elapsed = elapsed
+        self._pv = pv
+    
+    def get_move(self) -> Optional[Tuple[int, int]]:
+        """最善手を取得"""
+        return self._move
+    
+    def get_score(self) -> int:
+        """評価値を取得"""
+        return self._score
+    
+    def get_depth(self) -> int:
+        """探索を完了した深さを取得"""
+        return self._depth
+    
+    def get_nodes(self) -> int:
+        """探索したノード数を取得"""
+        return self._nodes
+    
+    def get_elapsed(self) -> float:
+        """探索時間（秒）を取得"""
+        return self._elapsed
+    
+    def get_pv(self) -> List[Optional[Tuple[int, int]]]:
+        """読み筋を取得"""
+        return list(self._pv)
+
+
+class AlphaBetaSearch:
+    """ネガマックス法＋アルファベータ枝刈りによる反復深化探索"""
+    
+    # 何ノードごとに制限時間をチェックするか
+    CHECK_INTERVAL = 256
+    
+    def __init__(self, time_limit: Optional[float] = 1.0,
+                 node_limit: Optional[int] = None, max_depth: int = 60,
+                 table: Optional[TranspositionTable] = None, evaluator=None):
+        """
+        Args:
+            time_limit: 1手あたりの制限時間（秒）。Noneなら無制限
+            node_limit: 1手あたりの探索ノード数の上限。Noneなら無制限
+            max_depth: 反復深化の最大深さ
+            table: 置換表（省略時は既定サイズで作成）
+            evaluator: 評価関数（evaluate / evaluate_batch を持つオブジェクト）。
+                省略時は盤面の大きさに合わせた WeightTableEvaluator を使う
+        """
+        self._table = table if table is not None else TranspositionTable()
+        self._time_limit = time_limit
+        self._node_limit = node_limit
+        self._max_depth = max_depth
+        self._evaluator = evaluator
+        self._owns_evaluator = evaluator is None
+        self._nodes = 0
+        self._deadline = 0.0
+        self._size = 0
+        self._corners = 0
+        self._square_order: Dict[int, int] = {}
+        self._pv_table: List[List[Optional[int]]] = []
+        self._previous_pv: List[Optional[int]] = []
+    
+    def _prepare(self, board: Board) -> None:
+        """盤面の大きさに応じた評価関数と着手順序表を準備"""
+        size = board.get_size()
+        if self._size != size:
+            self._size = size
+            if self._owns_evaluator:
+                self._evaluator = WeightTableEvaluator(board)
+            last = size - 1
+            self._corners = 0
+            for row, col in [(0, 0), (0, last), (last, 0), (last, last)]:
+                self._corners |= 1 << (row * size + col)
+            self._square_order = {}
+            for row in range(size):
+                for col in range(size):
+                    self._square_order[1 << (row * size + col)] = square_weight(row, col, size)
+    
+    def search(self, board: Board, color: int) -> SearchResult:
+        """制限内で反復深化探索を行い、最後に完了した深さの結果を返す"""
+        self._prepare(board)
+        start = time.perf_counter()
+        self._nodes = 0
+        self._deadline = start + self._time_limit if self._time_limit is not None else 0.0
+        self._previous_pv = []
+        self._table.new_search()
+        # 打ち切り時に盤面が途中の状態で残らないよう、複製の上で探索する
+        board = board.copy()
+        
+        moves = board.get_valid_moves_mask(color)
+        if not moves:
+            return SearchResult(None, 0, 0, 0, 0.0, [])
+        
+        # 1手しかなければ探索しない
+        ordered = self._order_moves(moves, None)
+        best_move = ordered[0]
+        best_score = 0
+        completed_depth = 0
+        empties = board.count_discs(Disc.EMPTY)
+        
+        if moves & (moves - 1):
+            for depth in range(1, min(self._max_depth, empties) + 1):
+                self._pv_table = [[] for _ in range(depth + 2 * empties + 2)]
+                try:
+                    score = self._negamax(board, color, depth, -INFINITY, INFINITY, 0, True)
+                except SearchAborted:
+                    break
+                self._previous_pv = list(self._pv_table[0])
+                best_move = self._previous_pv[0]
+                best_score = score
+                completed_depth = depth
+        
+        elapsed = time.perf_counter() - start
+        size = board.get_size()
+        pv = [divmod(bit.bit_length() - 1, size) if bit else None
+              for bit in (self._previous_pv or [best_move])]
+        return SearchResult(divmod(best_move.bit_length() - 1, size), best_score,
+                            completed_depth, self._nodes, elapsed, pv)
+    
+    def _check_budget(self) -> None:
+        """制限時間・ノード数を超えていたら探索を打ち切る"""
+        if self._node_limit is not None and self._nodes >= self._node_limit:
+            raise SearchAborted()
+        if self._time_limit is not None and time.perf_counter() >= self._deadline:
+            raise SearchAborted()
+    
+    def _order_moves(self, moves: int, pv_move: Optional[int],
+                     table_move: Optional[int] = None) -> List[int]:
+        """着手順序を決める（角 → 前回の読み筋 → 置換表の最善手 → マスの重みが大きい順）"""
+        corners = []
+        others = []
+        while moves:
+            bit = moves & -moves
+            moves ^= bit
+            if bit & self._corners:
+                corners.append(bit)
+            elif bit != pv_move and bit != table_move:
+                others.append(bit)
+        
+        others.sort(key=self._square_order.__getitem__, reverse=True)
+        for hint in (pv_move, table_move):
+            if hint is not None and not hint & self._corners and hint not in corners:
+                corners.append(hint)
+        return corners + others
+    
+    def _negamax(self, board: Board, color: int, depth: int,
+                 alpha: int, beta: int, ply: int, on_pv: bool) -> int:
+        """ネガマックス法による探索（手番側から見た評価値を返す）"""
+        self._nodes += 1
+        if self._nodes % self.CHECK_INTERVAL == 0:
+            self._check_budget()
+        
+        self._pv_table[ply] = []
+        own, opponent = board.get_bitboards(color)
+        
+        if depth <= 0:
+            return self._evaluator.evaluate(own, opponent)
+        
+        # 置換表を引く（ルートでは読み筋を残すため打ち切らない）
+        key = board.get_hash()
+        if color == Disc.WHITE:
+            key ^= board.get_zobrist_keys().get_side_key()
+        entry = self._table.probe(key)
+        table_move = None
+        original_alpha, original_beta = alpha, beta
+        if entry is not None:
+            table_move = entry[4]
+            if ply > 0 and entry[1] >= depth:
+                flag = entry[3]
+                if flag == TranspositionTable.EXACT:
+                    return entry[2]
+                if flag == TranspositionTable.LOWER:
+                    alpha = max(alpha, entry[2])
+                else:
+                    beta = min(beta, entry[2])
+                if alpha >= beta:
+                    return entry[2]
+        
+        moves = board.generate_moves(own, opponent)
+        if not moves:
+            # 相手も打てなければ終局、打てればパス
+            if not board.generate_moves(opponent, own):
+                return (popcount(own) - popcount(opponent)) * FINAL_SCORE_SCALE
+            on_pv = on_pv and ply < len(self._previous_pv) and self._previous_pv[ply] is None
+            score = -self._negamax(board, opponent_of(color), depth,
+                                   -beta, -alpha, ply + 1, on_pv)
+            self._pv_table[ply] = [None] + self._pv_table[ply + 1]
+            return score
+        
+        pv_move = None
+        if on_pv and ply < len(self._previous_pv):
+            pv_move = self._previous_pv[ply]
+        
+        if pv_move is not None and not pv_move & moves:
+            pv_move = None
+        if table_move is not None and not table_move & moves:
+            table_move = None
+        
+        ordered = self._order_moves(moves, pv_move, table_move)
+        # 残り1手なら、子局面をまとめて評価関数に渡す
+        child_scores = None
+        if depth == 1 and self._evaluator.PREFERS_BATCH:
+            child_scores = self._evaluate_children(board, own, opponent, ordered)
+            self._pv_table[ply + 1] = []
+        
+        best_score = -INFINITY
+        best_move = None
+        for i, move in enumerate(ordered):
+            if child_scores is not None:
+                score = -child_scores[i]
+            else:
+                row, col = divmod(move.bit_length() - 1, self._size)
+                record = board.make_move(row, col, color)
+                score = -self._negamax(board, opponent_of(color), depth - 1,
+                                       -beta, -alpha, ply + 1, on_pv and move == pv_move)
+                board.unmake_move(record)
+            
+            if score > best_score:
+                best_score = score
+                best_move = move
+                self._pv_table[ply] = [move] + self._pv_table[ply + 1]
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        
+        if best_score <= original_alpha:
+            flag = TranspositionTable.UPPER
+        elif best_score >= original_beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self._table.store(key, depth, best_score, flag, best_move)
+        return best_score
+    
+    def _evaluate_children(self, board: Board, own: int, opponent: int,
+                           moves: List[int]) -> List[int]:
+        """すべての子局面を、相手の手番から見た評価値として一括で計算"""
+        child_owns = []
+        child_opponents = []
+        for move in moves:
+            flips = board.compute_flips(own, opponent, move)
+            child_owns.append(opponent & ~flips)
+            child_opponents.append(own | move | flips)
+        self._nodes += len(moves)
+        return self._evaluator.evaluate_batch(child_owns, child_opponents)
+    
+    def get_nodes(self) -> int:
+        """直前の探索のノード数を取得"""
+        return self._nodes
+    
+    def get_table(self) -> TranspositionTable:
+        """置換表を取得"""
+        return self._table
+
+
+class SearchPlayer(CPUPlayer):
+    """先読み探索で手を選ぶCPUプレイヤー"""
+    
+    def __init__(self, color: int, name: str, time_limit: Optional[float] = 1.0,
+                 node_limit: Optional[int] = None, max_depth: int = 60,
+                 table: Optional[TranspositionTable] = None,
+                 endgame_empties: Optional[int] = None, opening_book=None,
+                 evaluator=None):
+        """
+        Args:
+            color: プレイヤーの石の色
+            name: プレイヤー名
+            time_limit: 1手あたりの制限時間（秒）
+            node_limit: 1手あたりの探索ノード数の上限
+            max_depth: 反復深化の最大深さ
+            table: 置換表（省略時は既定サイズで作成）
+            endgame_empties: 空きマスがこの数以下になったら完全読みに切り替える
+            opening_book: 探索の前に参照する定石データベース
+            evaluator: 評価関数（省略時は WeightTableEvaluator）
+        """
+        solver = EndgameSolver(endgame_empties) if endgame_empties is not None else None
+        super().__init__(color, name, solver, opening_book)
+        self._search = AlphaBetaSearch(time_limit, node_limit, max_depth, table, evaluator)
+        self._last_result: Optional[SearchResult] = None
+    
+    def _choose_move(self, board: Board) -> Optional[Tuple[int, int]]:
+        """反復深化探索で最善手を選択"""
+        self._last_result = self._search.search(board, self._color)
+        return self._last_result.get_move()
+    
+    def get_last_result(self) -> Optional[SearchResult]:
+        """直前の探索結果を取得"""
+        return self._last_result
+    
+    def get_table(self) -> TranspositionTable:
+        """探索に使う置換表を取得"""
+        return self._search.get_table()
+
+
+def main():
+    """メイン関数"""
+    print("=" * 40)
+    print("オセロ探索AI 対 CPU")
+    print("=" * 40)
+    
+    player1 = SearchPlayer(Disc.BLACK, "探索AI（黒）", time_limit=0.5, endgame_empties=12)
+    player2 = CPUPlayer(Disc.WHITE, "CPU（白）")
+    
+    game = OthelloGame(player1, player2)
+    view = GameView(game)
+    game.play()
+    view.show_result()
+    
+    result = player1.get_last_result()
+    if result:
+        print(f"最後の探索: 深さ{result.get_depth()}, {result.get_nodes()}ノード, "
+              f"{result.get_elapsed():.2f}秒")
+    
+    stats = player1.get_table().get_stats()
+    print(f"置換表: ヒット{stats['hits']}, ミス{stats['misses']}, 衝突{stats['collisions']}, "
+          f"使用率{stats['fill_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+オセロの対局サーバー（asyncio による多数の対局の同時進行）
+
+1つのプロセスで多数の OthelloGame を同時に進める。クライアントとは1行1コマンドの
+テキストプロトコルでやり取りし、CPUの手はプロセスプールで計算するので、
+時間のかかる探索が他の対局の応答を止めることはない。
+
+クライアント → サーバー:
+    NEW [black|white]   新しい対局を始める（クライアントの色、既定は黒）
+    MOVE <行> <列>      石を置く
+    BOARD               現在の局面を送ってもらう
+    QUIT                接続を終える
+サーバー → クライアント:
+    GAME <対局番号> <black|white>
+    STATE <盤面（行優先の64文字: X=黒, O=白, -=空き）> <手番 X|O|-> <黒の数> <白の数>
+    TURN <行,列> ...    クライアントの手番（合法手の一覧）
+    CPU <行> <列>       CPUが打った手
+    PASS <X|O>          パスした色
+    END <黒の数> <白の数> <WIN|LOSE|DRAW>
+    ERR <理由>
+
+使い方:
+    python server.py serve --port 8765 --workers 4
+    python server.py loadtest --port 8765 --clients 1000 --games 2
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+
+from othello import Board, Disc, OthelloGame, Player
+from tournament import load_player_class
+
+
+logger = logging.getLogger(__name__)
+
+DISC_CHARS = {Disc.BLACK: "X", Disc.WHITE: "O", Disc.EMPTY: "-"}
+
+
+def format_board(board: Board) -> str:
+    """盤面を行優先の文字列（X=黒, O=白, -=空き）にする"""
+    size = board.get_size()
+    return "".join(DISC_CHARS[board.get_disc(row, col)]
+                   for row in range(size) for col in range(size))
+
+
+# ワーカープロセスごとに作ったCPUプレイヤーと、局面の受け渡しに使うボード
+_worker_players: Dict[Tuple[str, str, int], Player] = {}
+_worker_boards: Dict[int, Board] = {}
+
+
+def compute_move(spec: str, options: str, size: int, black: int, white: int,
+                 color: int) -> Optional[Tuple[int, int]]:
+    """CPUプレイヤーに手を選ばせる（ワーカープロセスで実行）
+    
+    プレイヤーは (クラス指定, 引数, 色) ごとに1度だけ作って使い回す。
+    """
+    key = (spec, options, color)
+    if key not in _worker_players:
+        _worker_players[key] = load_player_class(spec)(color, "CPU", **json.loads(options))
+    if size not in _worker_boards:
+        _worker_boards[size] = Board(size)
+    board = _worker_boards[size]
+    board.set_position(black, white)
+    return _worker_players[key].get_move(board)
+
+
+class SeatPlayer(Player):
+    """サーバーの対局の席を表すプレイヤー
+    
+    クライアントの手は MOVE コマンドで、CPUの手はプロセスプールで求めるので、
+    get_move で手を選ぶことはない。
+    """
+    
+    def get_move(self, board: Board) -> Optional[Tuple[int, int]]:
+        """手は GameSession が受け取る（ここでは選ばない）"""
+        return None
+
+
+class GameSession:
+    """1つの接続で進める対局"""
+    
+    def __init__(self, server: "GameServer", writer: asyncio.StreamWriter):
+        """
+        Args:
+            server: 対局サーバー
+            writer: クライアントへの送信に使うストリーム
+        """
+        self._server = server
+        self._writer = writer
+        self._game: Optional[OthelloGame] = None
+        self._remote: Optional[Player] = None
+    
+    def _send(self, *lines: str) -> None:
+        """クライアントに行を送る（まとめて書き込み、drain は呼び出し側で行う）"""
+        self._writer.write("".join(line + "\n" for line in lines).encode())
+    
+    async def handle(self, line: str) -> bool:
+        """1行のコマンドを処理し、接続を続けるかどうかを返す"""
+        command, *args = line.split() or [""]
+        command = command.upper()
+        if command == "NEW":
+            await self._new_game(args[0].lower() if args else "black")
+        elif command == "MOVE":
+            await self._move(args)
+        elif command == "BOARD":
+            if self._game is None:
+                self._send("ERR 対局が始まっていません")
+            else:
+                self._send(self._state())
+        elif command == "QUIT":
+            return False
+        else:
+            self._send(f"ERR 不明なコマンドです: {command}")
+        await self._writer.drain()
+        return True
+    
+    async def _new_game(self, color_name: str) -> None:
+        """新しい対局を始める"""
+        if color_name not in ("black", "white"):
+            self._send("ERR 色は black か white で指定してください")
+            return
+        if self._game is not None and not self._game.is_game_over():
+            self._server.finish_game()
+        if color_name == "black":
+            self._remote = SeatPlayer(Disc.BLACK, "クライアント")
+            self._game = OthelloGame(self._remote, SeatPlayer(Disc.WHITE, "CPU"))
+        else:
+            self._remote = SeatPlayer(Disc.WHITE, "クライアント")
+            self._game = OthelloGame(SeatPlayer(Disc.BLACK, "CPU"), self._remote)
+        self._send(f"GAME {self._server.start_game()} {color_name}")
+        await self._advance()
+    
+    async def _move(self, args: List[str]) -> None:
+        """クライアントの手を打ち、次にクライアントの手番になるまで進める"""
+        game = self._game
+        if game is None or game.is_game_over():
+            self._send("ERR 対局中ではありません")
+            return
+        if game.get_current_player() is not self._remote:
+            self._send("ERR クライアントの手番ではありません")
+            return
+        try:
+            row, col = int(args[0]), int(args[1])
+        except (ValueError, IndexError):
+            self._send("ERR MOVE <行> <列> の形式で指定してください")
+            return
+        
+        if not game.get_board().is_valid_position(row, col) or not game.make_move(row, col):
+            self._send(f"ERR その位置には置けません: {row} {col}")
+            return
+        game.switch_turn()
+        self._server.count_move()
+        await self._advance()
+    
+    async def _advance(self) -> None:
+        """CPUの手とパスを処理し、クライアントの手番か終局まで進める"""
+        game = self._game
+        board = game.get_board()
+        while not game.is_game_over():
+            current = game.get_current_player()
+            color = current.get_color()
+            if not board.has_valid_moves(color):
+                self._send(f"PASS {DISC_CHARS[color]}")
+                game.switch_turn()
+                continue
+            if current is self._remote:
+                moves = " ".join(f"{row},{col}" for row, col in board.get_valid_moves(color))
+                self._send(self._state(), f"TURN {moves}")
+                return
+            
+            move = await self._server.request_move(board, color)
+            if move is None or not game.make_move(*move):
+                raise RuntimeError(f"CPUが不正な手を返しました: {move}")
+            game.switch_turn()
+            self._server.count_move()
+            self._send(f"CPU {move[0]} {move[1]}")
+        
+        black = board.count_discs(Disc.BLACK)
+        white = board.count_discs(Disc.WHITE)
+        winner = game.get_winner()
+        result = "DRAW" if winner is None else "WIN" if winner is self._remote else "LOSE"
+        self._send(self._state(), f"END {black} {white} {result}")
+        self._server.finish_game()
+    
+    def _state(self) -> str:
+        """STATE 行を作る"""
+        game = self._game
+        board = game.get_board()
+        turn = "-" if game.is_game_over() else DISC_CHARS[game.get_current_player().get_color()]
+        return (f"STATE {format_board(board)} {turn} "
+                f"{board.count_discs(Disc.BLACK)} {board.count_discs(Disc.WHITE)}")
+    
+    def close(self) -> None:
+        """接続が切れたときに対局を片付ける"""
+        if self._game is not None and not self._game.is_game_over():
+            self._server.finish_game()
+        self._game = None
+
+
+class GameServer:
+    """多数の対局を1つのイベントループで進めるサーバー"""
+    
+    def __init__(self, cpu: str = "othello:CPUPlayer",
+                 cpu_options: Optional[Dict[str, Any]] = None, workers: Optional[int] = None):
+        """
+        Args:
+            cpu: CPUプレイヤー（モジュール名:クラス名）
+            cpu_options: CPUプレイヤーのコンストラクタに渡す追加引数
+            workers: CPUの手を計算するプロセス数（Noneならコア数、0ならイベントループ上で計算）
+        """
+        load_player_class(cpu)
+        self._cpu = cpu
+        self._cpu_options = json.dumps(cpu_options or {}, sort_keys=True)
+        self._workers = workers
+        self._executor: Optional[Executor] = None
+        self._game_ids = itertools.count(1)
+        self._active_games = 0
+        self._total_games = 0
+        self._moves = 0
+        self._connections = 0
+    
+    async def request_move(self, board: Board, color: int) -> Optional[Tuple[int, int]]:
+        """CPUの手を計算する（プロセスプールがあればそちらで）"""
+        black, white = board.get_bitboards(Disc.BLACK)
+        args = (self._cpu, self._cpu_options, board.get_size(), black, white, color)
+        if self._executor is None:
+            return compute_move(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, compute_move, *args)
+    
+    def start_game(self) -> int:
+        """対局の開始を記録し、対局番号を返す"""
+        self._active_games += 1
+        self._total_games += 1
+        return next(self._game_ids)
+    
+    def finish_game(self) -> None:
+        """対局の終了を記録"""
+        self._active_games -= 1
+    
+    def count_move(self) -> None:
+        """打たれた手を数える"""
+        self._moves += 1
+    
+    def get_stats(self) -> Dict[str, int]:
+        """接続数・対局数・手数を取得"""
+        return {
+            "connections": self._connections,
+            "active_games": self._active_games,
+            "total_games": self._total_games,
+            "moves": self._moves,
+        }
+    
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        """1つの接続を処理"""
+        self._connections += 1
+        session = GameSession(self, writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    # 改行のない最後の行（空なら接続が切れた）
+                    line = e.partial
+                except asyncio.LimitOverrunError:
+                    # 上限（64KB）を超える行は次の改行まで読み捨て、知らせて続ける
+                    await _skip_line(reader)
+                    logger.warning("長すぎる行を受け取りました")
+                    writer.write("ERR 行が長すぎます\n".encode())
+                    await writer.drain()
+                    continue
+                if not line:
+                    break
+                try:
+                    if not await session.handle(line.decode(errors="replace")):
+                        break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # 探索ワーカーの失敗などで対局を続けられないので、知らせて接続を閉じる
+                    logger.exception("コマンドの処理に失敗しました: %r", line)
+                    writer.write(f"ERR サーバーでエラーが発生しました: {type(e).__name__}\n".encode())
+                    await writer.drain()
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            session.close()
+            self._connections -= 1
+            writer.close()
+    
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765,
+                    ready: Optional[asyncio.Event] = None) -> None:
+        """サーバーを起動し、止められるまで接続を受け付ける"""
+        if self._workers != 0:
+            self._executor = ProcessPoolExecutor(self._workers)
+        server = await asyncio.start_server(self._handle_client, host, port, backlog=4096)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+async def _skip_line(reader: asyncio.StreamReader) -> None:
+    """次の改行までを読み捨てる（上限を超える分は、たまった分ずつ捨てながら待つ）"""
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+
+
+def percentile(sorted_values: List[float], rate: float) -> float:
+    """昇順に並んだ値の百分位数（最も近い順位の値）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(rate * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def _play_client(host: str, port: int, games: int, rng: random.Random,
+                       latencies: List[float]) -> int:
+    """ランダムに打つクライアント1つ分の対局を行い、終えた対局数を返す
+    
+    手を送ってから次に手番が戻る（または終局する）までの時間を latencies に加える。
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    finished = 0
+    sent_at: Optional[float] = None
+    try:
+        for game_index in range(games):
+            color = "black" if game_index % 2 == 0 else "white"
+            writer.write(f"NEW {color}\n".encode())
+            await writer.drain()
+            while True:
+                line = (await reader.readline()).decode()
+                if not line:
+                    raise ConnectionError("サーバーとの接続が切れました")
+                kind, _, rest = line.strip().partition(" ")
+                if kind == "ERR":
+                    raise RuntimeError(rest)
+                if kind in ("TURN", "END") and sent_at is not None:
+                    latencies.append(time.perf_counter() - sent_at)
+                    sent_at = None
+                if kind == "END":
+                    finished += 1
+                    break
+                if kind == "TURN":
+                    row, col = rng.choice(rest.split()).split(",")
+                    sent_at = time.perf_counter()
+                    writer.write(f"MOVE {row} {col}\n".encode())
+                    await writer.drain()
+        writer.write(b"QUIT\n")
+        await writer.drain()
+    finally:
+        writer.close()
+    return finished
+
+
+async def run_load_test(host: str, port: int, clients: int, games: int,
+                        seed: int = 0) -> Dict[str, Any]:
+    """多数のクライアントを同時に接続して対局させ、手の応答時間を集計する"""
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    start = time.perf_counter()
+    finished = await asyncio.gather(*[
+        _play_client(host, port, games, random.Random(rng.getrandbits(32)), latencies)
+        for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    
+    values = sorted(latencies)
+    return {
+        "clients": clients,
+        "games": sum(finished),
+        "moves": len(values),
+        "elapsed": round(elapsed, 3),
+        "moves_per_second": round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="オセロの対局サーバー")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    serve = subparsers.add_parser("serve", help="サーバーを起動")
+    serve.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    serve.add_argument("--port", type=int, default=8765, help="待ち受けるポート")
+    serve.add_argument("--cpu", default="othello:CPUPlayer", help="CPUプレイヤー（モジュール名:クラス名）")
+    serve.add_argument("--cpu-options", default="{}", help="CPUプレイヤーのコンストラクタ引数（JSON）")
+    serve.add_argument("--workers", type=int, default=None,
+                       help="CPUの手を計算するプロセス数（0ならイベントループ上で計算）")
+    
+    loadtest = subparsers.add_parser("loadtest", help="負荷試験のクライアントを実行")
+    loadtest.add_argument("--host", default="127.0.0.1", help="サーバーのアドレス")
+    loadtest.add_argument("--port", type=int, default=8765, help="サーバーのポート")
+    loadtest.add_argument("--clients", type=int, default=100, help="同時に接続するクライアント数")
+    loadtest.add_argument("--games", type=int, default=1, help="クライアントごとの対局数")
+    loadtest.add_argument("--seed", type=int, default=0, help="乱数の種")
+    loadtest.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    
+    args = parser.parse_args()
+    
+    if args.command == "serve":
+        server = GameServer(args.cpu, json.loads(args.cpu_options), args.workers)
+        print(f"{args.host}:{args.port} で待ち受けています。")
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return
+    
+    report = asyncio.run(run_load_test(args.host, args.port, args.clients, args.games, args.seed))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(f"{report['clients']}クライアント, {report['games']}局, {report['moves']}手, "
+              f"{report['elapsed']}秒 ({report['moves_per_second']:,.0f} 手/秒)")
+        print(f"応答時間: p50 {report['p50_ms']}ms, p99 {report['p99_ms']}ms, "
+              f"最大 {report['max_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+オセロのCPU対戦を並列に実行するトーナメント（画面表示なし）
+
+使い方:
+    python tournament.py --games 1000 --player1 search:SearchPlayer \
+        --player1-options '{"time_limit": 0.05}' --player2 othello:CPUPlayer \
+        --output results.jsonl --archive games.rec
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, Union
+import argparse
+import importlib
+import json
+import math
+import multiprocessing
+import random
+import time
+
+from othello import Board, Disc, Player
+from record import GameArchive, GameRecord
+
+
+PlayerSpec = Union[str, Type[Player]]
+
+
+def to_spec(player_class: PlayerSpec) -> str:
+    """プレイヤークラスを "モジュール名:クラス名" 形式の文字列に変換"""
+    if isinstance(player_class, str):
+        return player_class
+    return f"{player_class.__module__}:{player_class.__qualname__}"
+
+
+def load_player_class(spec: str) -> Type[Player]:
+    """ "モジュール名:クラス名" からプレイヤークラスを読み込む"""
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"プレイヤーの指定は モジュール名:クラス名 の形式です: {spec}")
+    player_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(player_class, type) and issubclass(player_class, Player)):
+        raise ValueError(f"Player のサブクラスではありません: {spec}")
+    return player_class
+
+
+class GameTask:
+    """ワーカープロセスに渡す1対局分の設定"""
+    
+    def __init__(self, game_index: int, seed: int,
+                 player1: Tuple[str, Dict[str, Any]], player2: Tuple[str, Dict[str, Any]],
+                 player1_is_black: bool):
+        """
+        Args:
+            game_index: 対局番号
+            seed: この対局で使う乱数の種
+            player1: プレイヤー1の（クラス指定, コンストラクタ引数）
+            player2: プレイヤー2の（クラス指定, コンストラクタ引数）
+            player1_is_black: プレイヤー1が黒番かどうか
+        """
+        self.game_index = game_index
+        self.seed = seed
+        self.player1 = player1
+        self.player2 = player2
+        self.player1_is_black = player1_is_black
+
+
+def play_game(task: GameTask) -> Dict[str, Any]:
+    """1局を最後まで対局し、結果を辞書で返す（ワーカープロセスで実行）"""
+    random.seed(task.seed)
+    
+    black_spec, white_spec = task.player1, task.player2
+    if not task.player1_is_black:
+        black_spec, white_spec = white_spec, black_spec
+    black = load_player_class(black_spec[0])(Disc.BLACK, "黒", **black_spec[1])
+    white = load_player_class(white_spec[0])(Disc.WHITE, "白", **white_spec[1])
+    
+    board = Board()
+    current, waiting = black, white
+    moves: List[Optional[List[int]]] = []
+    move_times: List[float] = []
+    passes = 0
+    
+    while passes < 2:
+        if not board.get_valid_moves_mask(current.get_color()):
+            moves.append(None)
+            move_times.append(0.0)
+            passes += 1
+        else:
+            passes = 0
+            start = time.perf_counter()
+            move = current.get_move(board)
+            move_times.append(time.perf_counter() - start)
+            if move is None or tuple(move) not in board.get_valid_moves(current.get_color()):
+                raise RuntimeError(f"{type(current).__name__} が不正な手を返しました: {move}")
+            board.flip_discs(move[0], move[1], current.get_color())
+            moves.append([move[0], move[1]])
+        current, waiting = waiting, current
+    
+    # 最後の2つのパスは終局の確認なので記録から除く
+    del moves[-2:]
+    del move_times[-2:]
+    
+    black_discs = board.count_discs(Disc.BLACK)
+    white_discs = board.count_discs(Disc.WHITE)
+    player1_discs, player2_discs = ((black_discs, white_discs) if task.player1_is_black
+                                    else (white_discs, black_discs))
+    if player1_discs > player2_discs:
+        winner = "player1"
+    elif player2_discs > player1_discs:
+        winner = "player2"
+    else:
+        winner = None
+    
+    return {
+        "game": task.game_index,
+        "seed": task.seed,
+        "player1_color": "black" if task.player1_is_black else "white",
+        "winner": winner,
+        "black_discs": black_discs,
+        "white_discs": white_discs,
+        "moves": moves,
+        "move_times": [round(t, 6) for t in move_times],
+    }
+
+
+class TournamentSummary:
+    """対局結果を集計し、勝率とレーティング差を計算するクラス"""
+    
+    # 信頼区間に使う正規分布の分位点（95%）
+    Z = 1.96
+    
+    def __init__(self):
+        self._wins = 0
+        self._losses = 0
+        self._draws = 0
+        self._player1_time = 0.0
+        self._player1_moves = 0
+        self._player2_time = 0.0
+        self._player2_moves = 0
+    
+    def add_result(self, result: Dict[str, Any]) -> None:
+        """1局分の結果を集計に加える"""
+        if result["winner"] == "player1":
+            self._wins += 1
+        elif result["winner"] == "player2":
+            self._losses += 1
+        else:
+            self._draws += 1
+        
+        # 黒番から交互に着手するので、パスも含めた手の順番で手番がわかる
+        player1_first = result["player1_color"] == "black"
+        for i, (move, seconds) in enumerate(zip(result["moves"], result["move_times"])):
+            if move is None:
+                continue
+            if (i % 2 == 0) == player1_first:
+                self._player1_time += seconds
+                self._player1_moves += 1
+            else:
+                self._player2_time += seconds
+                self._player2_moves += 1
+    
+    def get_games(self) -> int:
+        """対局数を取得"""
+        return self._wins + self._losses + self._draws
+    
+    def get_score_rate(self) -> float:
+        """プレイヤー1の得点率（勝ち1点・引き分け0.5点）を取得"""
+        games = self.get_games()
+        return (self._wins + 0.5 * self._draws) / games if games else 0.0
+    
+    def get_score_interval(self) -> Tuple[float, float]:
+        """得点率の95%信頼区間（Wilsonスコア区間）を取得"""
+        return self._wilson_interval(self.get_score_rate(), self.get_games())
+    
+    def get_win_rate_interval(self) -> Tuple[float, float]:
+        """勝率の95%信頼区間（Wilsonスコア区間）を取得"""
+        games = self.get_games()
+        return self._wilson_interval(self._wins / games if games else 0.0, games)
+    
+    def _wilson_interval(self, rate: float, games: int) -> Tuple[float, float]:
+        """割合の信頼区間を計算（全勝・全敗でも幅が0にならない）"""
+        if not games:
+            return 0.0, 1.0
+        z2 = self.Z ** 2
+        center = (rate + z2 / (2 * games)) / (1 + z2 / games)
+        margin = (self.Z * math.sqrt(rate * (1 - rate) / games + z2 / (4 * games ** 2))
+                  / (1 + z2 / games))
+        return max(0.0, center - margin), min(1.0, center + margin)
+    
+    @staticmethod
+    def score_to_elo(score: float) -> float:
+        """得点率をイロレーティングの差に変換"""
+        if score <= 0.0:
+            return -math.inf
+        if score >= 1.0:
+            return math.inf
+        return 400 * math.log10(score / (1 - score))
+    
+    def get_elo(self) -> Tuple[float, float, float]:
+        """プレイヤー1から見たレーティング差と、その95%信頼区間を取得"""
+        low, high = self.get_score_interval()
+        return (self.score_to_elo(self.get_score_rate()),
+                self.score_to_elo(low), self.score_to_elo(high))
+    
+    def format(self, player1: str, player2: str) -> str:
+        """集計結果を表示用の文字列に整形"""
+        games = self.get_games()
+        if not games:
+            return "対局がありません。"
+        win_low, win_high = self.get_win_rate_interval()
+        elo, elo_low, elo_high = self.get_elo()
+        lines = [
+            "=" * 50,
+            f"{player1} 対 {player2}（{games}局）",
+            "=" * 50,
+            f"勝ち: {self._wins}  負け: {self._losses}  引き分け: {self._draws}",
+            f"勝率: {self._wins / games:.1%} (95%信頼区間 {win_low:.1%} - {win_high:.1%})",
+            f"得点率: {self.get_score_rate():.1%}",
+            f"レーティング差: {elo:+.0f} (95%信頼区間 {elo_low:+.0f} - {elo_high:+.0f})",
+        ]
+        if self._player1_moves:
+            lines.append(f"{player1} の平均思考時間: "
+                         f"{self._player1_time / self._player1_moves * 1000:.2f}ms")
+        if self._player2_moves:
+            lines.append(f"{player2} の平均思考時間: "
+                         f"{self._player2_time / self._player2_moves * 1000:.2f}ms")
+        lines.append("=" * 50)
+        return "\n".join(lines)
+
+
+def make_tasks(player1: Tuple[str, Dict[str, Any]], player2: Tuple[str, Dict[str, Any]],
+               games: int, seed: int) -> Iterator[GameTask]:
+    """対局ごとの設定を作成（先後は1局ごとに入れ替える）"""
+    seeds = random.Random(seed)
+    for game_index in range(games):
+        yield GameTask(game_index, seeds.getrandbits(32), player1, player2,
+                       player1_is_black=(game_index % 2 == 0))
+
+
+def run_tournament(player1: PlayerSpec, player2: PlayerSpec, games: int,
+                   output: Optional[str] = None, processes: Optional[int] = None,
+                   seed: int = 0, player1_options: Optional[Dict[str, Any]] = None,
+                   player2_options: Optional[Dict[str, Any]] = None,
+                   archive: Optional[str] = None) -> TournamentSummary:
+    """2つのプレイヤーを対局させ、結果をJSONLに書き出しながら集計する
+    
+    Args:
+        player1, player2: プレイヤークラス、または "モジュール名:クラス名"
+        games: 対局数
+        output: 1局ごとの結果を書き出すJSONLファイル（Noneなら書き出さない）
+        processes: 並列に動かすプロセス数（Noneならコア数、1なら並列化しない）
+        seed: 各対局の乱数の種を作るための種
+        player1_options, player2_options: プレイヤーのコンストラクタに渡す追加引数
+        archive: 棋譜を追記するファイル（Noneなら記録しない）
+    """
+    spec1 = (to_spec(player1), player1_options or {})
+    spec2 = (to_spec(player2), player2_options or {})
+    # 子プロセスで読み込めない指定は、対局を始める前にここで検出する
+    load_player_class(spec1[0])
+    load_player_class(spec2[0])
+    
+    summary = TournamentSummary()
+    tasks = make_tasks(spec1, spec2, games, seed)
+    out = open(output, "w", encoding="utf-8") if output else None
+    records = GameArchive(archive) if archive else None
+    pool = None
+    
+    try:
+        if processes == 1:
+            results = map(play_game, tasks)
+        else:
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap_unordered(play_game, tasks, chunksize=4)
+        
+        for result in results:
+            summary.add_result(result)
+            if out:
+                result["player1"] = spec1[0]
+                result["player2"] = spec2[0]
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+            if records:
+                size = records.get_size()
+                moves = bytes(row * size + col for row, col in filter(None, result["moves"]))
+                records.append(GameRecord(moves, result["black_discs"], result["white_discs"]))
+        
+        if pool:
+            pool.close()
+            pool.join()
+    finally:
+        if pool:
+            # 途中で例外が起きたときも、ワーカーを残さない（正常終了後は何もしない）
+            pool.terminate()
+            pool.join()
+        if out:
+            out.close()
+        if records:
+            records.close()
+    
+    return summary
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="オセロのCPU対戦トーナメント")
+    parser.add_argument("--player1", default="search:SearchPlayer",
+                        help="プレイヤー1（モジュール名:クラス名）")
+    parser.add_argument("--player2", default="othello:CPUPlayer",
+                        help="プレイヤー2（モジュール名:クラス名）")
+    parser.add_argument("--player1-options", default='{"time_limit": 0.02}',
+                        help="プレイヤー1のコンストラクタ引数（JSON）")
+    parser.add_argument("--player2-options", default="{}",
+                        help="プレイヤー2のコンストラクタ引数（JSON）")
+    parser.add_argument("--games", type=int, default=100, help="対局数")
+    parser.add_argument("--processes", type=int, default=None, help="プロセス数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    parser.add_argument("--output", default=None, help="結果を書き出すJSONLファイル")
+    parser.add_argument("--archive", default=None, help="棋譜を追記するファイル")
+    args = parser.parse_args()
+    
+    player1_options = json.loads(args.player1_options)
+    player2_options = json.loads(args.player2_options)
+    
+    start = time.perf_counter()
+    summary = run_tournament(args.player1, args.player2, args.games, args.output,
+                             args.processes, args.seed, player1_options, player2_options,
+                             args.archive)
+    elapsed = time.perf_counter() - start
+    
+    print(summary.format(args.player1, args.player2))
+    print(f"所要時間: {elapsed:.1f}秒")
+
+
+if __name__ == "__main__":
+    main()